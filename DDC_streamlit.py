@@ -1,10 +1,45 @@
 import streamlit as st
-import PyPDF2
 import anthropic
-import httpx
-import json
+import asyncio
+import functools
+import io
+import os
 import streamlit.components.v1 as components
-import re
+import time
+import uuid
+
+from ddc.almacen import AlmacenResultados, exportar
+from ddc.cache import ExtractionCache, TextCache, cache_key, sha256_archivo
+from ddc.duplicados import IndiceDuplicados
+from ddc.enrutador import MODELOS_ENRUTADOS, registro_vigente, resumen_niveles
+from ddc.extractor import (
+    PROMPT_VERSION,
+    ExtractionError,
+    clean_nivel,
+    extract_pages_from_pdf,
+    extract_title_from_filename,
+    limpiar_orientacion,
+)
+from ddc.gobernador import contexto_api, gobernador
+from ddc.lectores import ErrorLectura, informe_lectores
+from ddc.lote import CONCURRENCIA_DEFAULT, procesar_lote
+from ddc.memoria import RegistroSesiones, borrar_temporal, volcar_a_disco
+from ddc.metricas import medir, registro
+from ddc.reduccion import VERSION_REDUCCION, reducir_paginas
+from ddc.reglas import resumen_origen
+from ddc.trabajos import FINALES, ColaTrabajos, PoolTrabajos, extraer_trabajo
+from ddc.vista import (
+    COLOR_ACCENT_1,
+    COLOR_ACCENT_2,
+    COLOR_INFO,
+    COLOR_SECONDARY,
+    COLOR_SUCCESS,
+    COLOR_TEXT,
+    COLOR_WARNING,
+    create_copy_button_simple,
+    markdown_simple_a_html,
+    render_resultados_html,
+)
 
 # ============================================
 # CONFIGURACIÓN - PEGA TU API KEY AQUÍ
@@ -22,263 +57,253 @@ except Exception as e:
     st.sidebar.error(f"❌ Error inesperado: {e}")
     st.stop()
 
-# ============================================
-# PALETA DE COLORES
-# ============================================
-COLOR_PRIMARY = "#1F0050"      # Morado oscuro - principal
-COLOR_SECONDARY = "#00E6DA"    # Cyan brillante - secundario
-COLOR_ACCENT_1 = "#00849D"     # Azul oscuro
-COLOR_ACCENT_2 = "#049A19"     # Verde oscuro
-COLOR_SUCCESS = "#6AE081"      # Verde claro - éxito
-COLOR_INFO = "#A23F97"         # Morado medio - info
-COLOR_WARNING = "#F39107"      # Naranja - advertencias
-COLOR_TEXT = "#FFFFFF"         # Blanco - texto sobre fondos oscuros
-
-def extract_text_from_pdf(pdf_file):
-    """Extrae todo el texto del PDF"""
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text()
-    return text
-
-def extract_title_from_filename(filename):
-    """Extrae el título del nombre del archivo PDF"""
-    name_without_ext = filename.replace('.pdf', '').replace('.PDF', '')
-    
-    if ' - ' in name_without_ext:
-        title = name_without_ext.split(' - ')[0].strip()
-    else:
-        title = name_without_ext.strip()
-    
-    title = title.replace('(¿)', '¿').replace('(?)', '?')
-    title = title.replace('(¡)', '¡').replace('(!)', '!')
-    
-    return title
-
-def clean_nivel(ciclo_text):
-    """Limpia el campo Nivel para mostrar solo Primaria o Secundaria"""
-    if not ciclo_text:
-        return "No encontrado"
-    
-    if "Primaria" in ciclo_text or "primaria" in ciclo_text:
-        return "Primaria"
-    elif "Secundaria" in ciclo_text or "secundaria" in ciclo_text:
-        return "Secundaria"
-    else:
-        return ciclo_text
-
-def limpiar_orientacion(texto):
-    """Elimina el texto introductorio estándar de Orientación de uso"""
-    if not texto:
-        return texto
-    
-    # Texto a eliminar
-    intro = "Estimado/a docente, usted es libre de utilizar este recurso educativo en los procesos pedagógicos y/o didácticos que usted considere pertinente, o siguiendo la siguiente propuesta:"
-    
-    # Si el texto comienza con la intro, eliminarlo
-    if texto.strip().startswith(intro):
-        texto_limpio = texto.replace(intro, "", 1).strip()
-        return texto_limpio
-    
-    return texto
-
-def markdown_simple_a_html(texto):
-    """Convierte Markdown simple a HTML para que se copie limpio"""
-    if not texto:
-        return texto
-    
-    # Convertir **texto** a <strong>texto</strong>
-    texto = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', texto)
-    
-    # Convertir saltos de línea a <br>
-    texto = texto.replace('\n', '<br>')
-    
-    # Convertir listas con * en viñetas (•)
-    texto = re.sub(r'<br>\* ', '<br>• ', texto)
-    texto = re.sub(r'^(\* )', r'• ', texto)
-    
-    return texto
-
-def extract_fields_with_ai(pdf_text, api_key):
-    """Extrae todos los campos usando Claude API"""
-    client = anthropic.Anthropic(
-        api_key=api_key,
-        http_client=httpx.Client(verify=False)
+@st.cache_resource
+def get_extraction_cache():
+    """Caché en disco compartida por todas las sesiones"""
+    return ExtractionCache()
+
+@st.cache_resource
+def get_text_cache():
+    """Texto ya extraído de los PDF, compartido entre reruns y sesiones (memoria acotada)"""
+    return TextCache()
+
+@st.cache_resource
+def get_almacen():
+    """Almacén SQLite de extracciones: búsqueda y recuperación instantánea de PDF ya procesados"""
+    return AlmacenResultados()
+
+@st.cache_resource
+def get_indice_duplicados():
+    """Índice de casi duplicados sobre las firmas del almacén, compartido por todas las sesiones"""
+    return IndiceDuplicados(get_almacen())
+
+@st.cache_resource
+def get_pool_trabajos():
+    """Hilos del proceso que ejecutan las extracciones encoladas por todas las sesiones"""
+    return PoolTrabajos(ColaTrabajos(), functools.partial(
+        extraer_trabajo, API_KEY, get_almacen(), get_extraction_cache(), get_indice_duplicados(), MODELOS_ENRUTADOS
+    ))
+
+INTERVALO_SONDEO = 1.0  # segundos entre consultas del estado de un trabajo en segundo plano
+
+LIMITE_BUSQUEDA = 50  # registros que se listan; la exportación incluye todos los que coinciden
+
+# Claves de resultados que se expulsan juntas cuando la sesión supera su presupuesto de memoria
+GRUPOS_RESULTADOS = {
+    "resultado": ("fields", "title", "origen", "uso", "fragmentos", "duplicado"),
+    "lote": ("lote",),
+}
+
+@st.cache_resource
+def get_registro_sesiones():
+    """Resultados de todas las sesiones, con presupuesto por sesión y caducidad por inactividad"""
+    return RegistroSesiones(grupos=GRUPOS_RESULTADOS)
+
+def resultados_de_sesion():
+    """Resultados de esta sesión; si el registro los expulsó, se olvida la clave para recargarlos de la caché"""
+    if 'sesion_id' not in st.session_state:
+        st.session_state['sesion_id'] = uuid.uuid4().hex
+    resultados = registro_sesiones.de_sesion(st.session_state['sesion_id'], st.session_state.get('resultados'))
+    st.session_state['resultados'] = resultados
+    if "resultado" in resultados.expulsados:
+        st.session_state.pop('cache_key', None)
+    resultados.expulsados.clear()
+    return resultados
+
+def pdf_de_sesion(uploaded_file):
+    """Copia en disco y hash del PDF subido, hechos una sola vez por archivo y sesión: devuelve (ruta, sha)"""
+    if st.session_state.get('pdf_file_id') != uploaded_file.file_id or not os.path.exists(st.session_state['pdf_ruta']):
+        borrar_temporal(st.session_state.get('pdf_ruta'))
+        st.session_state['pdf_file_id'] = uploaded_file.file_id
+        st.session_state['pdf_ruta'] = volcar_a_disco(uploaded_file)
+        st.session_state['pdf_sha'] = sha256_archivo(st.session_state['pdf_ruta'])
+    return st.session_state['pdf_ruta'], st.session_state['pdf_sha']
+
+def campos_conocidos(pdf_sha, nombre, key):
+    """Campos de un PDF ya procesado: (fields, "caché" | "almacén") o (None, None).
+
+    Manda la caché, cuya clave incluye versión del prompt, modelos y opciones; el almacén solo sirve si su
+    registro es de la misma versión del prompt y de unos modelos vigentes (los del lote por la Message
+    Batches API también valen). Lo que solo estaba en la caché se
+    copia al almacén para que aparezca en las búsquedas.
+    """
+    titulo = extract_title_from_filename(nombre)
+    fields = extraction_cache.get(key)
+    if fields:
+        guardado = almacen.obtener(pdf_sha, titulo)
+        if not guardado or not registro_vigente(guardado):
+            almacen.guardar(pdf_sha, titulo, fields, archivo=nombre, modelo=MODELOS_ENRUTADOS,
+                            prompt_version=PROMPT_VERSION)
+        return fields, "caché"
+    guardado = almacen.obtener(pdf_sha, titulo)
+    if guardado and registro_vigente(guardado):
+        return guardado["campos"], "almacén"
+    return None, None
+
+def clave_texto(pdf_sha, opcion_corte):
+    """Clave de la caché de textos: el texto depende del PDF, del corte y de las reglas de reducción"""
+    return f"{pdf_sha}:{opcion_corte}:{VERSION_REDUCCION}"
+
+def leer_y_reducir(pdf_ruta):
+    """Texto reducido del PDF; el reporte lleva en "lectura" el informe del lector de PDF"""
+    informe = {}
+    full_text, reporte_reduccion = reducir_paginas(
+        extract_pages_from_pdf(pdf_ruta, corte_temprano=corte_temprano, informe=informe)
     )
-    
-    prompt = f"""Analiza este texto de un PDF educativo y extrae EXACTAMENTE estos campos:
-
-CAMPOS A EXTRAER:
-1. Área
-2. Ciclo
-3. Grado
-4. Descripción
-5. Competencia
-6. Capacidad
-7. Desempeño
-8. Orientación de uso
-9. Tipo de recurso
-10. Tipo de actividad
-11. Idioma
-12. Etiquetas
-13. Duración
-14. URL
-15. Autor
-16. Proveedor
-17. Publicador
-18. Licencia
-
-REGLAS IMPORTANTES:
-- IGNORA completamente el texto que dice: "PIP Mejoramiento de las oportunidades..."
-- IGNORA números de código como "18107"
-
-FORMATO ESPECIAL PARA "Orientación de uso":
-Debes convertirlo a formato MARKDOWN con esta estructura:
-
-**Subsección principal**
-
-- Primer punto de lista
-- Segundo punto de lista
-  - Subpunto (con indentación de 2 espacios)
-  - Otro subpunto
-
-EJEMPLO de "Orientación de uso" en Markdown:
-"Estimado/a docente, usted es libre de utilizar este recurso educativo en los procesos pedagógicos y/o didácticos que usted considere pertinente, o siguiendo la siguiente propuesta:
-
-**Familiarización con el problema**
-
-- Presentar la siguiente situación problemática: "El carpintero..."
-- Plantear las siguientes preguntas para inducir el razonamiento y la acción:
-  - ¿Cuál es la suma fija de los ángulos internos de cualquier triángulo?
-  - ¿Qué pasa con los ángulos y lados de un triángulo si este es equilátero?
-
-**Búsqueda y ejecución de estrategias**
-
-- Visualizar el video: "Analizamos las propiedades..."
-- Usar el problema de la ventana..."
-
-FORMATO DE RESPUESTA:
-Responde ÚNICAMENTE con un JSON válido (sin markdown, sin ```json):
-{{
-    "Área": "valor extraído",
-    "Ciclo": "valor extraído",
-    "Grado": "valor extraído",
-    "Descripción": "valor extraído",
-    "Competencia": "valor extraído",
-    "Capacidad": "valor extraído",
-    "Desempeño": "valor extraído",
-    "Orientación de uso": "texto en formato MARKDOWN con **subsecciones** y - viñetas",
-    "Tipo de recurso": "valor extraído",
-    "Tipo de actividad": "valor extraído",
-    "Idioma": "valor extraído",
-    "Etiquetas": "valor extraído",
-    "Duración": "valor extraído",
-    "URL": "valor extraído",
-    "Autor": "valor extraído",
-    "Proveedor": "valor extraído",
-    "Publicador": "valor extraído",
-    "Licencia": "valor extraído"
-}}
-
-TEXTO DEL PDF:
-{pdf_text}
-"""
-    
+    reporte_reduccion["lectura"] = informe
+    return full_text, reporte_reduccion
+
+def preparar_texto_pdf(pdf_ruta, pdf_sha):
+    """Texto reducido del PDF (de la caché de textos si ya se extrajo) con sus avisos; devuelve (texto, reporte)"""
+    inicio = time.perf_counter()
     try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            messages=[{"role": "user", "content": prompt}]
+        (full_text, reporte_reduccion), texto_en_cache = text_cache.get_or_compute(
+            clave_texto(pdf_sha, opcion_corte), lambda: leer_y_reducir(pdf_ruta)
         )
-        
-        response_text = message.content[0].text.strip()
-        
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        fields = json.loads(response_text)
-        return fields
-        
-    except json.JSONDecodeError as e:
-        st.error(f"❌ Error al parsear JSON: {str(e)}")
+    except ErrorLectura as e:
+        st.error(f"❌ No se pudo leer el PDF con ningún lector: {e}")
+        st.stop()
+    ms_texto = (time.perf_counter() - inicio) * 1000
+    
+    st.info(f"📄 Caracteres extraídos: {reporte_reduccion['caracteres_antes']}")
+    lectura = reporte_reduccion.get("lectura", {})
+    if texto_en_cache:
+        st.caption(f"⚡ Texto reutilizado de la caché ({ms_texto:.1f} ms)")
+    else:
+        st.caption(f"📄 Texto extraído del PDF con {lectura.get('lector', 'pypdf2')} ({ms_texto:.0f} ms)")
+    if lectura.get("fallos"):
+        st.warning(
+            f"⚠️ {len(lectura['fallos'])} página(s) dieron error o superaron el tiempo límite; "
+            f"se leyeron con otro lector ({sum(lectura.get('respaldos', {}).values())} recuperadas)"
+        )
+    st.caption(
+        f"🧹 Texto para la IA: ~{reporte_reduccion['tokens_antes']} → ~{reporte_reduccion['tokens_despues']} tokens "
+        f"(-{reporte_reduccion['ahorro']:.0%})"
+    )
+    return full_text, reporte_reduccion
+
+def mostrar_error_trabajo(error):
+    """Muestra el error de un trabajo fallido: {"tipo", "mensaje", "respuesta"}"""
+    if error["tipo"] == ExtractionError.__name__:
+        st.error(f"❌ {error['mensaje']}")
         st.text("Respuesta de la API:")
-        st.code(response_text)
-        return None
-    except anthropic.AuthenticationError as e:
+        st.code(error["respuesta"])
+    elif error["tipo"] == anthropic.AuthenticationError.__name__:
         st.error(f"❌ Error de autenticación: Tu API Key no es válida")
-        return None
-    except Exception as e:
-        st.error(f"❌ Error en la API: {str(e)}")
-        return None
-
-def create_copy_button_simple(text, field_id):
-    """Botón con colores de la paleta y texto más grande"""
-    safe_text = text.replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n').replace('\r', '')
-    
-    html_code = f"""
-    <div style="margin-top: 5px; margin-bottom: 10px;">
-        <button onclick="copyText_{field_id}()" style="
-            background-color: {COLOR_SECONDARY};
-            color: {COLOR_PRIMARY};
-            border: none;
-            padding: 12px 24px;
-            border-radius: 8px;
-            cursor: pointer;
-            font-size: 16px;
-            font-weight: bold;
-            box-shadow: 0 3px 6px rgba(0,0,0,0.3);
-            transition: all 0.3s;
-        " onmouseover="this.style.backgroundColor='{COLOR_ACCENT_1}'; this.style.color='{COLOR_TEXT}';" 
-           onmouseout="this.style.backgroundColor='{COLOR_SECONDARY}'; this.style.color='{COLOR_PRIMARY}';">
-            📋 Copiar texto
-        </button>
-        
-        <span id="status_{field_id}" style="
-            margin-left: 15px;
-            color: {COLOR_SUCCESS};
-            font-size: 15px;
-            display: none;
-            font-weight: 600;
-        ">✅ ¡Copiado!</span>
-    </div>
-    
-    <script>
-    function copyText_{field_id}() {{
-        const text = '{safe_text}';
-        
-        const textarea = document.createElement('textarea');
-        textarea.value = text;
-        textarea.style.position = 'fixed';
-        textarea.style.opacity = '0';
-        document.body.appendChild(textarea);
-        textarea.select();
-        textarea.setSelectionRange(0, 99999);
-        
-        try {{
-            const success = document.execCommand('copy');
-            document.body.removeChild(textarea);
-            
-            if (success) {{
-                const status = document.getElementById('status_{field_id}');
-                status.style.display = 'inline';
-                setTimeout(() => {{
-                    status.style.display = 'none';
-                }}, 3000);
-            }} else {{
-                alert('No se pudo copiar. Intenta seleccionar manualmente.');
-            }}
-        }} catch (err) {{
-            document.body.removeChild(textarea);
-            alert('Error al copiar. Por favor, selecciona el texto manualmente.');
-        }}
-    }}
-    </script>
-    """
-    
-    return html_code
+    elif error["tipo"] == anthropic.RateLimitError.__name__:
+        st.error("❌ La API siguió rechazando solicitudes por límite de uso tras varios reintentos; "
+                 "vuelve a intentarlo en unos minutos")
+    else:
+        st.error(f"❌ Error en la API: {error['mensaje']}")
+
+def enganchar_trabajo(trabajo_id):
+    """Recuerda el trabajo en la sesión y en la URL, para volver a engancharse después de recargar la página"""
+    st.session_state['trabajo'] = trabajo_id
+    st.query_params["trabajo"] = trabajo_id
+
+def soltar_trabajo():
+    st.session_state.pop('trabajo', None)
+    if "trabajo" in st.query_params:
+        del st.query_params["trabajo"]
+
+def recoger_trabajo(trabajo_id):
+    """Estado del trabajo; si ya terminó, pasa su resultado a la sesión y lo suelta. None si no existe."""
+    trabajo = pool_trabajos.cola.obtener(trabajo_id)
+    if trabajo is None or trabajo["estado"] in FINALES:
+        soltar_trabajo()
+    if trabajo is None or trabajo["estado"] != "terminado":
+        return trabajo
+    resultado = trabajo["resultado"]
+    resultados['fields'] = resultado['fields']
+    resultados['title'] = trabajo["datos"]["titulo"]
+    for clave in ('origen', 'uso', 'fragmentos', 'duplicado'):
+        if resultado.get(clave):
+            resultados[clave] = resultado[clave]
+        else:
+            resultados.pop(clave, None)
+    st.session_state['cache_key'] = trabajo["datos"]["clave"]
+    st.session_state['from_cache'] = None
+    st.session_state['ms_recuperacion'] = 0.0
+    return trabajo
+
+def mostrar_trabajo_terminado(trabajo):
+    if trabajo["estado"] == "error":
+        mostrar_error_trabajo(trabajo["error"])
+        return
+    resultado = trabajo["resultado"]
+    duplicado = resultado.get("duplicado")
+    if duplicado:
+        st.info(
+            f"♻️ Casi duplicado de **{duplicado['titulo']}** (similitud {duplicado['similitud']:.0%}): "
+            f"se reutilizaron {len(duplicado['reutilizados'])} campos y se extrajeron los demás"
+        )
+    uso = resultado.get("uso") or {}
+    if 'segundos_primer_campo' in uso:
+        st.caption(
+            f"⏱️ Primer campo de la IA en {uso['segundos_primer_campo']:.1f} s · "
+            f"respuesta completa en {uso['segundos_total']:.1f} s"
+        )
+    st.success("✅ ¡Extracción completada con éxito!")
+
+@st.fragment(run_every=INTERVALO_SONDEO)
+def seguir_trabajo(trabajo_id):
+    """Consulta el trabajo cada INTERVALO_SONDEO y dibuja los campos que van llegando; al terminar, recarga la página"""
+    trabajo = pool_trabajos.cola.obtener(trabajo_id)
+    if trabajo is None or trabajo["estado"] in FINALES:
+        st.rerun()
+    datos = trabajo["datos"]
+    if trabajo["estado"] == "pendiente":
+        st.info(f"⏳ **{datos['archivo']}** en cola (posición {pool_trabajos.cola.posicion(trabajo_id)})")
+    else:
+        st.info(
+            f"🤖 Extrayendo **{datos['archivo']}** con Inteligencia Artificial... "
+            f"{time.time() - trabajo['iniciado']:.0f} s ⏳"
+        )
+        for llamada in (gobernador().en_espera(trabajo_id) if gobernador() else []):
+            st.caption(
+                f"🚦 Esperando turno en la API por los límites de uso: posición {llamada['posicion']} "
+                f"· ~{llamada['segundos_estimados']:.0f} s"
+            )
+    st.caption("La extracción sigue en segundo plano: puedes recargar la página sin perderla")
+    al_recibir_campo = crear_vista_en_vivo(datos["titulo"])
+    for campo, valor in pool_trabajos.progreso(trabajo_id).items():
+        al_recibir_campo(campo, valor)
+
+# Campos que se muestran en vivo mientras llega la respuesta: (bloque, [(etiqueta, campo)])
+BLOQUES_EN_VIVO = [
+    ("📑 Bloque 1", [("Enlace", "URL"), ("Tipo de contenido", "Tipo de recurso")]),
+    ("📋 Bloque 2: Información Básica", [("Nivel", "Ciclo"), ("Grado", "Grado"), ("Área", "Área"),
+                                         ("Descripción del recurso educativo curado", "Descripción")]),
+    ("📚 Bloque 3: Información Curricular", [("Competencia", "Competencia"), ("Capacidad", "Capacidad"),
+                                             ("Desempeño", "Desempeño")]),
+    ("📖 Bloque 4: Orientación Pedagógica", [("Orientación de uso", "Orientación de uso")]),
+    ("🏷️ Bloque 5: Información Técnica", [("Etiquetas", "Etiquetas"), ("Duración", "Duración")]),
+    ("👤 Bloque 6: Fuente", [("Autor", "Autor"), ("Proveedor", "Proveedor"), ("Publicador", "Publicador")]),
+]
+
+def crear_vista_en_vivo(title):
+    """Dibuja los Bloques con huecos vacíos y devuelve el callback que los rellena campo a campo"""
+    huecos = {}
+    st.markdown(f"**Título:** {title}")
+    for bloque, campos in BLOQUES_EN_VIVO:
+        st.markdown(f"#### {bloque}")
+        for etiqueta, campo in campos:
+            huecos[campo] = (etiqueta, st.empty())
+            huecos[campo][1].markdown(f"**{etiqueta}:** ⏳")
+    
+    def al_recibir_campo(campo, valor):
+        if campo not in huecos or not isinstance(valor, str):
+            return
+        etiqueta, hueco = huecos[campo]
+        if campo == "Ciclo":
+            valor = clean_nivel(valor)
+        elif campo == "Duración":
+            valor = valor.replace(":", ".")
+        elif campo == "Orientación de uso":
+            valor = "\n\n" + limpiar_orientacion(valor)
+        hueco.markdown(f"**{etiqueta}:** {valor or 'No encontrado'}")
+    
+    return al_recibir_campo
 
 def render_field(label, value, field_id, height=100):
     """Renderiza campo CON botón - texto más grande"""
@@ -397,88 +422,45 @@ def render_orientacion_markdown_con_descarga(label, value):
     
     st.caption("⬆️ Selecciona el texto y presiona Ctrl+C | O descarga el .txt")
 
-# ============================================
-# INTERFAZ STREAMLIT CON COLORES
-# ============================================
-
-st.set_page_config(
-    page_title="Extractor PDF con IA",
-    page_icon="🤖",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-st.markdown(
-    f"""
-    <style>
-    .stMarkdown p, .stMarkdown li {{
-        font-size: 17px !important;
-        line-height: 1.6 !important;
-    }}
-    
-    .stAlert p {{
-        font-size: 17px !important;
-    }}
-    
-    h3 {{
-        color: {COLOR_SECONDARY} !important;
-        font-size: 24px !important;
-    }}
-    
-    .stButton button {{
-        background-color: {COLOR_ACCENT_2} !important;
-        color: white !important;
-        font-size: 18px !important;
-        padding: 12px 30px !important;
-        border-radius: 8px !important;
-    }}
-    
-    .stButton button:hover {{
-        background-color: {COLOR_SUCCESS} !important;
-    }}
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-st.title("🤖 Extractor de PDF con Inteligencia Artificial")
-st.caption("Extrae campos de recursos educativos con precisión del 99% usando Claude AI")
-
-with st.expander("ℹ️ Instrucciones de uso"):
-    st.markdown("""
-    ### Cómo usar esta herramienta:
-    1. **Sube tu PDF** del recurso educativo
-    2. **Haz clic en "Extraer campos con IA"**
-    3. **Copia los campos** usando los botones donde estén disponibles
-    4. **Para "Orientación de uso"**: Selecciona manualmente o descarga el archivo
-    5. **Pega en tu encuesta web** con **Ctrl+V**
-    """)
-
-uploaded_file = st.file_uploader("📤 Sube el PDF del recurso educativo", type=['pdf'])
-
-if uploaded_file:
-    title = extract_title_from_filename(uploaded_file.name)
-    full_text = extract_text_from_pdf(uploaded_file)
-    
-    st.success(f"✅ PDF cargado: **{uploaded_file.name}**")
-    st.info(f"📄 Caracteres extraídos: {len(full_text)}")
-    
-    if st.button("🚀 Extraer campos con IA", type="primary", use_container_width=True):
-        with st.spinner("🤖 Extrayendo con Inteligencia Artificial... ⏳"):
-            fields = extract_fields_with_ai(full_text, API_KEY)
-        
-        if fields:
-            st.success("✅ ¡Extracción completada con éxito!")
-            st.session_state['fields'] = fields
-            st.session_state['title'] = title
+@st.fragment
+def render_resultados(fields, title, debug=None, vista_clasica=False):
+    """Renderiza los Bloques 1 a 6 de una extracción; debug añade secciones al expander de Debug.
 
-if 'fields' in st.session_state:
-    fields = st.session_state['fields']
-    title = st.session_state['title']
-    
+    Es un fragmento: las interacciones dentro de la vista solo vuelven a ejecutar esta función.
+    """
+    tiempos_vista = {}
     st.markdown("---")
     st.markdown("## 📊 Campos Extraídos")
     
+    with medir("render", tiempos_vista):
+        if vista_clasica:
+            render_resultados_clasica(fields, title)
+        else:
+            html, altura = render_resultados_html(fields, title)
+            components.html(html, height=altura, scrolling=True)
+            st.download_button(
+                label="📥 Descargar Orientación de uso (.txt)",
+                data=limpiar_orientacion(fields.get("Orientación de uso", "")) or "No encontrado",
+                file_name="orientacion_de_uso.txt",
+                mime="text/plain",
+                help="Descarga el texto con formato"
+            )
+    
+    ms_vista = tiempos_vista["segundos_render"] * 1000
+    st.caption(f"⏱️ Vista {'clásica' if vista_clasica else 'en un componente'} generada en {ms_vista:.0f} ms en el servidor")
+    
+    with st.expander("🔍 Debug"):
+        st.json(fields)
+        for nombre, datos in (debug or {}).items():
+            st.markdown(f"**{nombre}**")
+            st.json(datos)
+        st.markdown("**Métricas del proceso (segundos; coste en USD)**")
+        st.json(registro().resumen())
+        st.markdown("**Enrutamiento por niveles de modelo**")
+        st.json(resumen_niveles())
+
+def render_resultados_clasica(fields, title):
+    """Vista original: un iframe de botón por campo (se mantiene para comparar tiempos de pintado)"""
     # ============================================
     # BLOQUE 1
     # ============================================
@@ -584,11 +566,421 @@ if 'fields' in st.session_state:
         f"""<div style="background-color: {COLOR_ACCENT_2}; color: white; padding: 15px; border-radius: 8px; font-size: 17px;"><b>Dominio Público</b></div>""",
         unsafe_allow_html=True
     )
+
+def nombres_item(item):
+    """Nombre del documento de un lote y, si se subió más de una vez, los demás nombres"""
+    return " · ".join([item["nombre"], *item.get("otros_nombres", [])])
+
+def pagina_lote():
+    """Modo lote: varios PDF, parseo en paralelo y extracción concurrente"""
+    archivos = st.file_uploader(
+        "📤 Sube los PDF de los recursos educativos",
+        type=['pdf'],
+        accept_multiple_files=True
+    )
+    concurrencia = st.slider("⚙️ Llamadas simultáneas a la IA", 1, 16, CONCURRENCIA_DEFAULT)
+    forzar = st.checkbox("🔄 Forzar nueva extracción (ignorar caché)")
+    
+    if archivos and st.button("🚀 Extraer lote con IA", type="primary", use_container_width=True):
+        lote = {}
+        pendientes = []
+        rutas_temporales = []
+        for archivo in archivos:
+            ruta = volcar_a_disco(archivo)
+            rutas_temporales.append(ruta)
+            pdf_sha = sha256_archivo(ruta)
+            if pdf_sha in lote:
+                # Mismo contenido (repetido o con otro nombre): se extrae y se cobra una vez
+                lote[pdf_sha]["otros_nombres"].append(archivo.name)
+                continue
+            key = cache_key(pdf_sha, PROMPT_VERSION, MODELOS_ENRUTADOS, corte=opcion_corte, reduccion=VERSION_REDUCCION)
+            lote[pdf_sha] = {
+                "nombre": archivo.name,
+                "otros_nombres": [],
+                "titulo": extract_title_from_filename(archivo.name),
+                "key": key,
+                "fields": None if forzar else campos_conocidos(pdf_sha, archivo.name, key)[0],
+                "error": None,
+            }
+            lote[pdf_sha]["desde_cache"] = lote[pdf_sha]["fields"] is not None
+            if not lote[pdf_sha]["desde_cache"]:
+                preparado = text_cache.get(clave_texto(pdf_sha, opcion_corte))
+                lote[pdf_sha]["reduccion"] = preparado[1] if preparado else None
+                pendientes.append((pdf_sha, ruta, preparado))
+        
+        st.markdown("### ⏳ Progreso del lote")
+        barra = st.progress(0.0)
+        filas = {pdf_sha: st.empty() for pdf_sha in lote}
+        terminados = [len(lote) - len(pendientes)]
+        for pdf_sha, item in lote.items():
+            estado = "⚡ caché" if item["desde_cache"] else "⏳ en cola"
+            filas[pdf_sha].markdown(f"{estado} — **{nombres_item(item)}**")
+        barra.progress(terminados[0] / len(lote))
+        
+        etiquetas = {
+            "texto": "📄 texto extraído",
+            "extrayendo": "🤖 extrayendo con IA",
+            "campos": "✅ listo",
+            "error": "❌ error",
+        }
+        
+        def al_avanzar(pdf_sha, etapa, dato):
+            item = lote[pdf_sha]
+            if etapa == "origen":
+                item["origen"] = resumen_origen(dato)
+                return
+            if etapa == "uso":
+                item["uso"] = dato
+                return
+            if etapa == "duplicado":
+                item["duplicado"] = dato
+                return
+            if etapa == "fragmentos":
+                item["fragmentos"] = dato
+                return
+            if etapa == "texto":
+                text_cache.put(clave_texto(pdf_sha, opcion_corte), dato)
+                item["reduccion"] = dato[1]
+            elif etapa == "campos":
+                item["fields"] = dato
+                extraction_cache.put(item["key"], dato, archivo=item["nombre"], modelo=MODELOS_ENRUTADOS)
+                for nombre in [item["nombre"], *item["otros_nombres"]]:
+                    almacen.guardar(pdf_sha, extract_title_from_filename(nombre), dato, archivo=nombre,
+                                    modelo=MODELOS_ENRUTADOS, prompt_version=PROMPT_VERSION)
+            elif etapa == "error":
+                item["error"] = str(dato)
+            if etapa in ("campos", "error"):
+                terminados[0] += 1
+                barra.progress(terminados[0] / len(lote))
+            detalle = f" ({item['error']})" if etapa == "error" else ""
+            filas[pdf_sha].markdown(f"{etiquetas[etapa]} — **{nombres_item(item)}**{detalle}")
+        
+        inicio = time.perf_counter()
+        try:
+            if pendientes:
+                with contexto_api(cliente=st.session_state['sesion_id'], prioridad="lote"):
+                    procesados = asyncio.run(procesar_lote(
+                        pendientes, API_KEY, concurrencia=concurrencia, al_avanzar=al_avanzar,
+                        corte_temprano=corte_temprano, duplicados=None if forzar else indice_duplicados
+                    ))
+                for pdf_sha, (texto, fields, _) in procesados.items():
+                    if fields:
+                        almacen.guardar_firma(pdf_sha, texto)
+        finally:
+            for ruta in rutas_temporales:
+                borrar_temporal(ruta)
+        segundos = time.perf_counter() - inicio
+        
+        correctos = sum(1 for item in lote.values() if item["fields"])
+        st.success(f"✅ Lote completado: {correctos}/{len(lote)} documentos en {segundos:.1f} s")
+        resultados['lote'] = lote
     
-    with st.expander("🔍 Debug"):
-        st.json(fields)
+    lote = resultados.get('lote')
+    if lote:
+        resultados.tocar('lote')
+    if not lote:
+        st.info("👆 Sube varios PDF y haz clic en 'Extraer lote con IA' para comenzar")
+        return
+    
+    listos = {pdf_sha: item for pdf_sha, item in lote.items() if item["fields"]}
+    if not listos:
+        return
+    
+    st.markdown("---")
+    elegido = st.selectbox(
+        "📂 Ver resultados de",
+        list(listos),
+        format_func=lambda pdf_sha: nombres_item(listos[pdf_sha])
+    )
+    debug = {}
+    if listos[elegido].get("reduccion"):
+        debug["Reducción del texto"] = listos[elegido]["reduccion"]
+    if listos[elegido].get("origen"):
+        debug["Origen de los campos"] = listos[elegido]["origen"]
+    if listos[elegido].get("uso"):
+        debug["Uso de tokens y tiempos de la API"] = listos[elegido]["uso"]
+    if listos[elegido].get("fragmentos"):
+        debug["Extracción por fragmentos"] = listos[elegido]["fragmentos"]
+    if listos[elegido].get("duplicado"):
+        debug["Casi duplicado"] = listos[elegido]["duplicado"]
+    render_resultados(listos[elegido]["fields"], listos[elegido]["titulo"], debug, vista_clasica)
+
+def pagina_busqueda():
+    """Búsqueda en el almacén: texto completo en Descripción, Competencia y Orientación, y filtros curriculares"""
+    texto = st.text_input("🔎 Buscar en Descripción, Competencia y Orientación de uso",
+                          placeholder="proporcionalidad magnitudes")
+    columnas = st.columns(3)
+    filtros = {}
+    for columna, (clave, etiqueta) in zip(columnas, (("area", "Área"), ("grado", "Grado"), ("nivel", "Nivel"))):
+        with columna:
+            opciones = ["Todos"] + almacen.valores_distintos(clave)
+            elegido = st.selectbox(etiqueta, opciones)
+            filtros[clave] = None if elegido == "Todos" else elegido
+    
+    inicio = time.perf_counter()
+    encontrados = almacen.buscar(texto, limite=LIMITE_BUSQUEDA, **filtros)
+    ms_busqueda = (time.perf_counter() - inicio) * 1000
+    st.caption(
+        f"{len(encontrados)}{'+' if len(encontrados) == LIMITE_BUSQUEDA else ''} registro(s) "
+        f"de {almacen.contar()} en {ms_busqueda:.1f} ms"
+    )
+    if not encontrados:
+        st.info("No hay extracciones guardadas que coincidan con la búsqueda")
+        return
+    
+    if st.button("📦 Preparar exportación CSV de todos los resultados"):
+        salida = io.StringIO()
+        exportados = exportar(almacen.iter_registros(texto, **filtros), salida, "csv")
+        st.download_button(
+            label=f"📥 Descargar {exportados} registro(s) (.csv)",
+            data=salida.getvalue().encode("utf-8-sig"),
+            file_name="extracciones.csv",
+            mime="text/csv"
+        )
+    
+    st.markdown("---")
+    for posicion, encontrado in enumerate(encontrados):
+        st.markdown(
+            f"**{posicion + 1}. {encontrado['titulo']}** — {encontrado['area'] or 'Sin área'} · "
+            f"{encontrado['grado'] or 'Sin grado'} · {encontrado['nivel']}"
+        )
+        st.caption(encontrado["campos"].get("Descripción", "")[:300])
+    elegido = st.selectbox(
+        "📂 Ver registro",
+        range(len(encontrados)),
+        format_func=lambda posicion: f"{posicion + 1}. {encontrados[posicion]['titulo']}"
+    )
+    guardado = encontrados[elegido]
+    debug = {"Registro del almacén": {
+        "archivo": guardado["archivo"], "sha256": guardado["sha256"], "modelo": guardado["modelo"],
+        "prompt_version": guardado["prompt_version"],
+        "actualizado": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(guardado["actualizado"])),
+    }}
+    render_resultados(guardado["campos"], guardado["titulo"], debug, vista_clasica)
 
-else:
+# ============================================
+# INTERFAZ STREAMLIT CON COLORES
+# ============================================
+
+st.set_page_config(
+    page_title="Extractor PDF con IA",
+    page_icon="🤖",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+st.markdown(
+    f"""
+    <style>
+    .stMarkdown p, .stMarkdown li {{
+        font-size: 17px !important;
+        line-height: 1.6 !important;
+    }}
+    
+    .stAlert p {{
+        font-size: 17px !important;
+    }}
+    
+    h3 {{
+        color: {COLOR_SECONDARY} !important;
+        font-size: 24px !important;
+    }}
+    
+    .stButton button {{
+        background-color: {COLOR_ACCENT_2} !important;
+        color: white !important;
+        font-size: 18px !important;
+        padding: 12px 30px !important;
+        border-radius: 8px !important;
+    }}
+    
+    .stButton button:hover {{
+        background-color: {COLOR_SUCCESS} !important;
+    }}
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+st.title("🤖 Extractor de PDF con Inteligencia Artificial")
+st.caption("Extrae campos de recursos educativos con precisión del 99% usando Claude AI")
+
+with st.expander("ℹ️ Instrucciones de uso"):
+    st.markdown("""
+    ### Cómo usar esta herramienta:
+    1. **Sube tu PDF** del recurso educativo
+    2. **Haz clic en "Extraer campos con IA"**
+    3. **Copia los campos** usando los botones donde estén disponibles
+    4. **Para "Orientación de uso"**: Selecciona manualmente o descarga el archivo
+    5. **Pega en tu encuesta web** con **Ctrl+V**
+    
+    Para varios PDF a la vez elige **"📚 Lote de PDFs"** en la barra lateral; para consultar lo ya
+    extraído, **"🔎 Buscar extracciones"**.
+    """)
+
+extraction_cache = get_extraction_cache()
+text_cache = get_text_cache()
+almacen = get_almacen()
+indice_duplicados = get_indice_duplicados()
+pool_trabajos = get_pool_trabajos()
+registro_sesiones = get_registro_sesiones()
+registro_sesiones.purgar_inactivas()
+resultados = resultados_de_sesion()
+
+with st.sidebar:
+    st.markdown("### 🗄️ Caché de extracciones")
+    stats = extraction_cache.stats()
+    st.caption(
+        f"Entradas: {stats['entradas']} · Aciertos: {stats['hits']} · "
+        f"Fallos: {stats['misses']} · Tasa: {stats['tasa_aciertos']:.0%}"
+    )
+    stats_texto = text_cache.stats()
+    st.caption(
+        f"Textos en memoria: {stats_texto['entradas']} "
+        f"({stats_texto['caracteres'] / 1_000_000:.1f} M caracteres) · "
+        f"Aciertos: {stats_texto['hits']} · Fallos: {stats_texto['misses']}"
+    )
+    if st.button("🗑️ Vaciar caché"):
+        extraction_cache.clear()
+        st.rerun()
+    st.caption(f"Almacén de búsqueda: {almacen.contar()} registros")
+    trabajos = pool_trabajos.cola.contar()
+    st.caption(f"Trabajos en segundo plano: {trabajos.get('pendiente', 0)} en cola · "
+               f"{trabajos.get('en_curso', 0)} en curso")
+    if gobernador():
+        st.caption(f"Llamadas esperando turno en la API: {len(gobernador().en_espera())}")
+    
+    st.markdown("### 🧠 Memoria")
+    informe_memoria = registro_sesiones.informe()
+    propia = next((fila for fila in informe_memoria if fila["sesion"] == st.session_state['sesion_id']), None)
+    st.caption(
+        f"Esta sesión: {(propia['bytes'] if propia else 0) / 1024:.0f} KB "
+        f"de {registro_sesiones.limite_bytes / (1024 * 1024):.0f} MB · "
+        f"Sesiones: {len(informe_memoria)} ({sum(fila['bytes'] for fila in informe_memoria) / (1024 * 1024):.1f} MB)"
+    )
+    
+    st.markdown("### ⚙️ Lectura del PDF")
+    corte_temprano = st.checkbox(
+        "✂️ Omitir anexos (corte temprano)",
+        help="Deja de leer el PDF cuando ya aparecieron Competencia, Capacidad, Desempeño y Orientación"
+    )
+    opcion_corte = "corte" if corte_temprano else ""
+    lectura = informe_lectores()
+    st.caption("Lector de PDF: " + lectura["elegido"] + "".join(
+        f" · {nombre}: {datos['paginas']} págs, {datos['ms_p50']} ms/pág, {datos['fallos']} fallos"
+        for nombre, datos in lectura["lectores"].items() if datos["paginas"] or datos["fallos"]
+    ))
+    
+    st.markdown("### 🖥️ Vista de resultados")
+    vista_clasica = st.checkbox(
+        "Vista clásica (un iframe por botón)",
+        help="La vista por defecto dibuja todos los campos en un solo componente; la clásica sirve para comparar"
+    )
+    
+    st.markdown("### 📚 Modo")
+    modo = st.radio("Modo", ["📄 Un PDF", "📚 Lote de PDFs", "🔎 Buscar extracciones"],
+                    label_visibility="collapsed")
+
+if modo == "📚 Lote de PDFs":
+    pagina_lote()
+    registro_sesiones.aplicar_presupuesto(resultados, protegidos={"lote"})
+    st.stop()
+
+if modo == "🔎 Buscar extracciones":
+    pagina_busqueda()
+    st.stop()
+
+uploaded_file = st.file_uploader("📤 Sube el PDF del recurso educativo", type=['pdf'])
+
+if uploaded_file:
+    title = extract_title_from_filename(uploaded_file.name)
+    pdf_ruta, pdf_sha = pdf_de_sesion(uploaded_file)
+    key = cache_key(pdf_sha, PROMPT_VERSION, MODELOS_ENRUTADOS, corte=opcion_corte, reduccion=VERSION_REDUCCION)
+    st.success(f"✅ PDF cargado: **{uploaded_file.name}**")
+    
+    # Un PDF ya procesado se muestra desde el almacén (o la caché) sin parsearlo ni llamar a la API
+    full_text = reporte_reduccion = None
+    if st.session_state.get('cache_key') != key:
+        inicio = time.perf_counter()
+        cached_fields, origen_guardado = campos_conocidos(pdf_sha, uploaded_file.name, key)
+        st.session_state['ms_recuperacion'] = (time.perf_counter() - inicio) * 1000
+        st.session_state['cache_key'] = key
+        st.session_state['from_cache'] = origen_guardado
+        if cached_fields:
+            resultados['fields'] = cached_fields
+            resultados['title'] = title
+            resultados.pop('origen', None)
+            resultados.pop('uso', None)
+            resultados.pop('fragmentos', None)
+            resultados.pop('duplicado', None)
+        else:
+            resultados.pop('fields', None)
+    
+    if st.session_state.get('from_cache') and st.session_state.get('cache_key') == key:
+        st.info(
+            f"⚡ Resultado recuperado {'del almacén' if st.session_state['from_cache'] == 'almacén' else 'de la caché'} en "
+            f"{st.session_state['ms_recuperacion']:.1f} ms (sin llamar a la API)"
+        )
+    else:
+        full_text, reporte_reduccion = preparar_texto_pdf(pdf_ruta, pdf_sha)
+    
+    forzar = st.checkbox("🔄 Forzar nueva extracción (ignorar caché)")
+    
+    if st.button("🚀 Extraer campos con IA", type="primary", use_container_width=True):
+        cached_fields, origen_guardado = (None, None) if forzar else campos_conocidos(pdf_sha, uploaded_file.name, key)
+        if cached_fields:
+            fields = cached_fields
+            resultados.pop('origen', None)
+            resultados.pop('uso', None)
+            resultados.pop('fragmentos', None)
+            resultados.pop('duplicado', None)
+        else:
+            # La extracción va a la cola del proceso: sigue aunque se recargue la página, y si otra sesión
+            # ya está extrayendo este mismo PDF, se espera ese trabajo en vez de lanzar otro
+            if full_text is None:
+                full_text, reporte_reduccion = preparar_texto_pdf(pdf_ruta, pdf_sha)
+            trabajo_id, nuevo = pool_trabajos.enviar(key, full_text, {
+                "clave": key, "archivo": uploaded_file.name, "titulo": title, "sha256": pdf_sha, "forzar": forzar,
+                "sesion": st.session_state['sesion_id'],
+            })
+            enganchar_trabajo(trabajo_id)
+            if not nuevo:
+                st.info("👥 Este PDF ya se está extrayendo: se espera ese mismo trabajo")
+            fields = None
+        
+        if fields:
+            st.success("✅ ¡Extracción completada con éxito!")
+            resultados['fields'] = fields
+            resultados['title'] = title
+            st.session_state['cache_key'] = key
+            st.session_state['from_cache'] = origen_guardado
+            st.session_state['ms_recuperacion'] = 0.0
+
+trabajo_id = st.session_state.get('trabajo') or st.query_params.get("trabajo")
+if trabajo_id:
+    trabajo = recoger_trabajo(trabajo_id)
+    if trabajo is not None and trabajo["estado"] in FINALES:
+        mostrar_trabajo_terminado(trabajo)
+    elif trabajo is not None:
+        enganchar_trabajo(trabajo_id)
+        seguir_trabajo(trabajo_id)
+
+registro_sesiones.aplicar_presupuesto(resultados, protegidos={"resultado"})
+
+if 'fields' in resultados:
+    resultados.tocar('fields')
+    debug = {"Reducción del texto": reporte_reduccion} if uploaded_file and reporte_reduccion else {}
+    if 'origen' in resultados:
+        debug["Origen de los campos"] = resultados['origen']
+    if resultados.get('uso'):
+        debug["Uso de tokens y tiempos de la API"] = resultados['uso']
+    if resultados.get('fragmentos'):
+        debug["Extracción por fragmentos"] = resultados['fragmentos']
+    if resultados.get('duplicado'):
+        debug["Casi duplicado"] = resultados['duplicado']
+    render_resultados(resultados['fields'], resultados['title'], debug, vista_clasica)
+
+elif not st.session_state.get('trabajo'):
 
     st.info("👆 Sube un PDF y haz clic en 'Extraer campos con IA' para comenzar")
 
@@ -0,0 +1 @@
+"""Benchmarks del extractor: corpus sintético de PDF, micro-benchmarks y extremo a extremo contra la API simulada."""
@@ -0,0 +1,148 @@
+import os
+
+# ============================================
+# CORPUS SINTÉTICO DE PDF CURRICULARES
+# ============================================
+# PDF escritos a mano (sin dependencias) con la estructura de las fichas que procesa la herramienta:
+# cabecera y pie repetidos, etiquetas "Campo: valor", secciones del prompt y anexos al final.
+
+TAMANOS = (1, 10, 100, 500)
+
+CABECERA = "PIP Mejoramiento de las oportunidades de aprendizaje - Recurso educativo"
+LINEAS_POR_PAGINA = 48
+
+FICHA = [
+    "Resolvemos problemas de proporcionalidad en situaciones cotidianas",
+    "",
+    "Área: Matemática",
+    "Ciclo: VI - Secundaria",
+    "Grado: 1° de secundaria",
+    "Duración: 05:30",
+    "URL: https://ejemplo.org/recursos/proporcionalidad",
+    "Autor: Equipo pedagógico",
+    "Proveedor: Ministerio de Educación",
+    "Publicador: Dirección de Educación Secundaria",
+    "Licencia: Dominio público",
+    "Idioma: Español",
+    "",
+    "Descripción",
+    "Video que presenta situaciones de compra y venta para reconocer magnitudes",
+    "directamente proporcionales y resolver problemas con tablas y reglas de tres.",
+    "",
+    "Competencia",
+    "Resuelve problemas de regularidad, equivalencia y cambio.",
+    "",
+    "Capacidad",
+    "Traduce datos y condiciones a expresiones algebraicas y gráficas.",
+    "Usa estrategias y procedimientos para encontrar equivalencias y reglas generales.",
+    "",
+    "Desempeño",
+    "Establece relaciones entre datos y valores desconocidos de una regularidad,",
+    "y las transforma en expresiones que incluyen la proporcionalidad directa.",
+    "",
+    "Orientación de uso",
+    "Estimado/a docente, usted es libre de utilizar este recurso educativo en los procesos",
+    "pedagógicos y/o didácticos que usted considere pertinente, o siguiendo la siguiente propuesta:",
+    "Familiarización con el problema",
+    "- Presentar la situación problemática del video y preguntar qué magnitudes intervienen.",
+    "Búsqueda y ejecución de estrategias",
+    "- Organizar los datos en una tabla y comprobar si el cociente se mantiene constante.",
+    "Socializa sus representaciones",
+    "- Comparar las estrategias de los grupos y formalizar la noción de proporcionalidad.",
+]
+
+PARRAFO = [
+    "Actividad {n}: los estudiantes registran precios y cantidades en una tabla de doble entrada,",
+    "calculan el valor unitario y verifican si la relación entre las magnitudes es proporcional.",
+    "Se sugiere acompañar con preguntas de reflexión y una breve puesta en común del aula.",
+    "",
+]
+
+ANEXO = [
+    "Anexos",
+    "Ficha de trabajo {n}: completa la tabla con los datos de la tienda escolar.",
+    "Producto | Cantidad | Precio | Precio unitario",
+    "Arroz | {n} kg | {p} soles | 3,50 soles",
+    "",
+]
+
+
+def lineas_de_paginas(paginas):
+    """Texto de cada página (lista de listas de líneas) sin cabecera ni pie"""
+    cuerpo = list(FICHA)
+    n = 1
+    # Las dos primeras páginas completan la ficha con actividades; el resto son anexos
+    while len(cuerpo) < min(paginas, 2) * LINEAS_POR_PAGINA:
+        cuerpo += [linea.format(n=n) for linea in PARRAFO]
+        n += 1
+    while len(cuerpo) < paginas * LINEAS_POR_PAGINA:
+        cuerpo += [linea.format(n=n, p=n * 3.5) for linea in ANEXO]
+        n += 1
+    return [cuerpo[i:i + LINEAS_POR_PAGINA] for i in range(0, paginas * LINEAS_POR_PAGINA, LINEAS_POR_PAGINA)]
+
+
+def _cadena_pdf(texto):
+    """Literal de cadena PDF en WinAnsiEncoding"""
+    datos = texto.encode("cp1252", errors="replace")
+    return b"(" + datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _contenido_pagina(numero, total, lineas):
+    """Stream de contenido: cabecera, cuerpo y pie 'Página N de M'"""
+    partes = [b"BT /F1 9 Tf 50 810 Td ", _cadena_pdf(CABECERA), b" Tj ET\n", b"BT /F1 10 Tf 13 TL 50 780 Td\n"]
+    for linea in lineas:
+        partes += [_cadena_pdf(linea), b" Tj T*\n"]
+    partes += [b"ET\n", b"BT /F1 9 Tf 280 30 Td ", _cadena_pdf(f"Página {numero} de {total}"), b" Tj ET\n"]
+    return b"".join(partes)
+
+
+def generar_pdf(paginas):
+    """Bytes de un PDF sintético de `paginas` páginas"""
+    objetos = []  # cuerpo de cada objeto; el número de objeto es índice + 1
+
+    def nuevo(cuerpo=b""):
+        objetos.append(cuerpo)
+        return len(objetos)
+
+    catalogo = nuevo()
+    raiz_paginas = nuevo()
+    fuente = nuevo(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    hijos = []
+    for numero, lineas in enumerate(lineas_de_paginas(paginas), 1):
+        contenido = _contenido_pagina(numero, paginas, lineas)
+        flujo = nuevo(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+        hijos.append(nuevo(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (raiz_paginas, fuente, flujo)
+        ))
+    objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % raiz_paginas
+    objetos[raiz_paginas - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % hijo for hijo in hijos), len(hijos)
+    )
+
+    salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posiciones = []
+    for numero, cuerpo in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objetos) + 1, catalogo, inicio_xref
+    )
+    return bytes(salida)
+
+
+def generar_corpus(directorio, tamanos=TAMANOS):
+    """Escribe un PDF por tamaño en `directorio` (si no existe ya) y devuelve {paginas: ruta}"""
+    os.makedirs(directorio, exist_ok=True)
+    rutas = {}
+    for paginas in tamanos:
+        ruta = os.path.join(directorio, f"Recurso sintetico {paginas}p - Matematica.pdf")
+        if not os.path.exists(ruta):
+            with open(ruta, "wb") as f:
+                f.write(generar_pdf(paginas))
+        rutas[paginas] = ruta
+    return rutas
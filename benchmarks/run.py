@@ -0,0 +1,235 @@
+"""Benchmarks del extractor con salida JSON y umbrales de regresión.
+
+Uso:
+    python -m benchmarks.run [--salida resultados.json] [--base resultados_anteriores.json]
+                             [--latencia 0.3] [--latencia-por-token 0.002] [--sin-e2e]
+
+Genera (una sola vez) el corpus sintético de 1, 10, 100 y 500 páginas en .cache/benchmarks, mide los
+micro-benchmarks y la extracción completa contra ddc.mock_api, y compara cada mediana con:
+  - el máximo absoluto de benchmarks/umbrales.json (milisegundos), y
+  - si se indica --base, la mediana del resultado anterior más la --tolerancia relativa.
+  - si existe, la de su variante "/secuencial" más la --tolerancia (el reparto entre procesos debe compensar).
+Termina con código 1 si hay alguna regresión.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.corpus import TAMANOS, generar_corpus
+from ddc import lectores
+from ddc.extractor import extract_pages_from_pdf, extract_text_from_pdf, limpiar_orientacion
+from ddc.vista import create_copy_button_simple, markdown_simple_a_html, render_resultados_html
+
+DIRECTORIO_CORPUS = os.path.join(".cache", "benchmarks")
+UMBRALES_DEFAULT = os.path.join(os.path.dirname(__file__), "umbrales.json")
+TOLERANCIA_DEFAULT = 0.25
+SEGUNDOS_MINIMOS = 0.2  # por repetición, para que las funciones rápidas se midan en bucle
+
+ORIENTACION = (
+    "Estimado/a docente, usted es libre de utilizar este recurso educativo en los procesos pedagógicos y/o "
+    "didácticos que usted considere pertinente, o siguiendo la siguiente propuesta:\n\n"
+    + "\n\n".join(
+        f"**Momento {i}: familiarización con el problema**\n\n"
+        f"- Presentar la situación problemática {i} y preguntar qué magnitudes intervienen.\n"
+        f"- Organizar los datos en una tabla y comprobar si el cociente se mantiene constante."
+        for i in range(1, 7)
+    )
+)
+
+CAMPOS_EJEMPLO = {
+    "Área": "Matemática",
+    "Ciclo": "Ciclo VI - Secundaria",
+    "Grado": "1° de secundaria",
+    "Descripción": "Video que presenta situaciones de compra y venta para reconocer magnitudes proporcionales.",
+    "Competencia": "Resuelve problemas de regularidad, equivalencia y cambio.",
+    "Capacidad": "Traduce datos y condiciones a expresiones algebraicas y gráficas.",
+    "Desempeño": "Establece relaciones entre datos y valores desconocidos de una regularidad.",
+    "Orientación de uso": ORIENTACION,
+    "Tipo de recurso": "Video",
+    "Etiquetas": "proporcionalidad, magnitudes, tablas",
+    "Duración": "05:30",
+    "URL": "https://ejemplo.org/recurso",
+    "Autor": "Equipo pedagógico",
+    "Proveedor": "Ministerio de Educación",
+    "Publicador": "Dirección de Educación Secundaria",
+}
+
+
+def medir_funcion(funcion, repeticiones=5):
+    """Mediana y mínimo (ms por llamada) de `repeticiones` tandas; cada tanda dura al menos SEGUNDOS_MINIMOS"""
+    inicio = time.perf_counter()
+    funcion()
+    primera = time.perf_counter() - inicio
+    por_tanda = max(1, int(SEGUNDOS_MINIMOS / primera)) if primera > 0 else 1000
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(por_tanda):
+            funcion()
+        tiempos.append((time.perf_counter() - inicio) / por_tanda * 1000)
+    return {"mediana_ms": statistics.median(tiempos), "min_ms": min(tiempos), "llamadas": por_tanda * repeticiones}
+
+
+def micro_benchmarks(rutas, repeticiones):
+    """Parseo de PDF y funciones de la vista"""
+    resultados = {}
+    for paginas, ruta in sorted(rutas.items()):
+        with open(ruta, "rb") as f:
+            pdf_bytes = f.read()
+        resultados[f"extract_text_from_pdf/{paginas}p"] = medir_funcion(
+            lambda: extract_text_from_pdf(pdf_bytes), repeticiones if paginas < 100 else 3
+        )
+    with open(rutas[max(rutas)], "rb") as f:
+        mayor = f.read()
+    # Con paralelo=None los PDF grandes van al pool de procesos: la versión secuencial muestra si compensa
+    resultados[f"extract_text_from_pdf/{max(rutas)}p/secuencial"] = medir_funcion(
+        lambda: extract_text_from_pdf(mayor, paralelo=False), 3
+    )
+    resultados[f"extract_text_from_pdf/{max(rutas)}p/corte_temprano"] = medir_funcion(
+        lambda: extract_pages_from_pdf(mayor, corte_temprano=True), 3
+    )
+    # Cada lector instalado por separado (secuencial, con vigilante) y sin vigilante, para ver lo que cuesta
+    for nombre in lectores.disponibles():
+        resultados[f"extract_text_from_pdf/{max(rutas)}p/{nombre}"] = medir_funcion(
+            lambda: extract_text_from_pdf(mayor, paralelo=False, lector=nombre), 3
+        )
+    resultados[f"extract_text_from_pdf/{max(rutas)}p/{lectores.LECTOR_REFERENCIA}_sin_vigilante"] = medir_funcion(
+        lambda: list(lectores.iter_paginas(mayor, lector=lectores.LECTOR_REFERENCIA, timeout=0)), 3
+    )
+    resultados["markdown_simple_a_html"] = medir_funcion(lambda: markdown_simple_a_html(ORIENTACION), repeticiones)
+    resultados["limpiar_orientacion"] = medir_funcion(lambda: limpiar_orientacion(ORIENTACION), repeticiones)
+    resultados["create_copy_button_simple"] = medir_funcion(
+        lambda: create_copy_button_simple(CAMPOS_EJEMPLO["Descripción"], "descripcion"), repeticiones
+    )
+    resultados["render_resultados_html"] = medir_funcion(
+        lambda: render_resultados_html(CAMPOS_EJEMPLO, "Resolvemos problemas de proporcionalidad"), repeticiones
+    )
+    return resultados
+
+
+def benchmark_extremo_a_extremo(rutas, latencia, latencia_por_token, repeticiones):
+    """PDF → texto reducido → campos (reglas + API simulada en streaming) → HTML de resultados.
+
+    Se mide con el enrutamiento por niveles (modelo rápido primero) y, como referencia, solo con el modelo grande.
+    """
+    # Importaciones aquí: el SDK de anthropic solo hace falta para esta parte
+    from ddc import enrutador
+    from ddc.cliente import get_client
+    from ddc.mock_api import iniciar_servidor
+    from ddc.reduccion import reducir_paginas
+    from ddc.reglas import extraer_campos_hibrido
+
+    servidor = iniciar_servidor(latencia=latencia, latencia_por_token=latencia_por_token)
+    resultados = {}
+    enrutamiento = enrutador.ENRUTAMIENTO
+    try:
+        client = get_client("simulada", base_url=servidor.url)
+        for paginas, sufijo in ((1, ""), (10, ""), (1, "/modelo_grande"), (10, "/modelo_grande")):
+            enrutador.ENRUTAMIENTO = enrutamiento and not sufijo
+            with open(rutas[paginas], "rb") as f:
+                pdf_bytes = f.read()
+            totales = []
+            primeros = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                texto, _ = reducir_paginas(extract_pages_from_pdf(pdf_bytes))
+                primer_campo = []
+                fields, _ = extraer_campos_hibrido(
+                    texto, "simulada", client=client,
+                    al_recibir_campo=lambda campo, valor: primer_campo.append(time.perf_counter())
+                )
+                render_resultados_html(fields, "Recurso sintético")
+                totales.append((time.perf_counter() - inicio) * 1000)
+                primeros.append((primer_campo[0] - inicio) * 1000 if primer_campo else totales[-1])
+            resultados[f"extremo_a_extremo/{paginas}p{sufijo}"] = {
+                "mediana_ms": statistics.median(totales),
+                "min_ms": min(totales),
+                "primer_campo_mediana_ms": statistics.median(primeros),
+                "llamadas": repeticiones,
+            }
+    finally:
+        enrutador.ENRUTAMIENTO = enrutamiento
+        servidor.shutdown()
+    return resultados
+
+
+def comparar(resultados, umbrales, base, tolerancia):
+    """Lista de regresiones: medianas por encima del umbral absoluto o de la base más la tolerancia.
+
+    También cuenta como regresión que el camino por defecto sea más lento (más la tolerancia) que su
+    variante "/secuencial": el reparto entre procesos tiene que compensar o no activarse.
+    """
+    regresiones = []
+    for nombre, medida in resultados.items():
+        mediana = medida["mediana_ms"]
+        if nombre in umbrales and mediana > umbrales[nombre]:
+            regresiones.append({"benchmark": nombre, "mediana_ms": mediana, "limite_ms": umbrales[nombre],
+                                "motivo": "umbral"})
+        anterior = base.get(nombre, {}).get("mediana_ms")
+        if anterior and mediana > anterior * (1 + tolerancia):
+            regresiones.append({"benchmark": nombre, "mediana_ms": mediana, "limite_ms": anterior * (1 + tolerancia),
+                                "motivo": "base"})
+        secuencial = resultados.get(f"{nombre}/secuencial", {}).get("mediana_ms")
+        if secuencial and mediana > secuencial * (1 + tolerancia):
+            regresiones.append({"benchmark": nombre, "mediana_ms": mediana, "limite_ms": secuencial * (1 + tolerancia),
+                                "motivo": "secuencial"})
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del extractor con umbrales de regresión")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument("--umbrales", default=UMBRALES_DEFAULT, help="JSON {benchmark: mediana máxima en ms}")
+    parser.add_argument("--base", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_DEFAULT,
+                        help="Empeoramiento relativo admitido frente a --base (0.25 = 25%%)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--corpus", default=DIRECTORIO_CORPUS, help="Directorio del corpus sintético")
+    parser.add_argument("--latencia", type=float, default=0.3, help="Latencia simulada de la API (s)")
+    parser.add_argument("--latencia-por-token", type=float, default=0.002, help="Segundos por token de salida")
+    parser.add_argument("--sin-e2e", action="store_true", help="Solo micro-benchmarks")
+    args = parser.parse_args(argv)
+
+    rutas = generar_corpus(args.corpus, TAMANOS)
+    resultados = micro_benchmarks(rutas, args.repeticiones)
+    if not args.sin_e2e:
+        resultados.update(benchmark_extremo_a_extremo(rutas, args.latencia, args.latencia_por_token, 3))
+
+    umbrales = {}
+    if args.umbrales and os.path.exists(args.umbrales):
+        with open(args.umbrales, "r", encoding="utf-8") as f:
+            umbrales = json.load(f)
+    base = {}
+    if args.base:
+        with open(args.base, "r", encoding="utf-8") as f:
+            base = json.load(f)["resultados"]
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {"latencia": args.latencia, "latencia_por_token": args.latencia_por_token},
+        "resultados": resultados,
+        "regresiones": comparar(resultados, umbrales, base, args.tolerancia),
+    }
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    for regresion in informe["regresiones"]:
+        print(
+            f"❌ {regresion['benchmark']}: {regresion['mediana_ms']:.2f} ms > {regresion['limite_ms']:.2f} ms "
+            f"({regresion['motivo']})",
+            file=sys.stderr
+        )
+    return 1 if informe["regresiones"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Lógica reutilizable del extractor de PDF (sin dependencia de la interfaz Streamlit)"""
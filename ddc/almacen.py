@@ -0,0 +1,284 @@
+"""Almacén persistente de extracciones (SQLite) con búsqueda de texto completo.
+
+Uso:
+    python -m ddc.almacen buscar "proporcionalidad" [--area Matemática] [--grado ...] [--nivel Secundaria]
+    python -m ddc.almacen exportar --salida registros.csv [--area ...] [--grado ...] [--nivel ...]
+
+Cada registro se identifica por el SHA-256 del PDF y el título sacado del nombre del archivo. Área, Grado y
+Nivel están indexados; Descripción, Competencia y Orientación de uso tienen un índice FTS5 (sin tildes).
+La exportación recorre la tabla por bloques, sin cargar todos los registros en memoria.
+La tabla firmas guarda, por PDF, la firma MinHash y las huellas por campo de ddc.duplicados.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from ddc.duplicados import firma_minhash, huellas_por_campo
+from ddc.esquema import CAMPOS
+from ddc.extractor import clean_nivel, construir_registro, limpiar_orientacion
+
+ALMACEN_DEFAULT = os.environ.get("DDC_ALMACEN", os.path.join(".cache", "extracciones.sqlite3"))
+FILAS_POR_BLOQUE = 500
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    sha256 TEXT NOT NULL,
+    titulo TEXT NOT NULL,
+    archivo TEXT,
+    area TEXT,
+    grado TEXT,
+    nivel TEXT,
+    campos TEXT NOT NULL,
+    modelo TEXT,
+    prompt_version TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL,
+    PRIMARY KEY (sha256, titulo)
+);
+CREATE INDEX IF NOT EXISTS registros_area ON registros (area);
+CREATE INDEX IF NOT EXISTS registros_grado ON registros (grado);
+CREATE INDEX IF NOT EXISTS registros_nivel ON registros (nivel);
+CREATE INDEX IF NOT EXISTS registros_sha ON registros (sha256, actualizado);
+CREATE TABLE IF NOT EXISTS firmas (
+    sha256 TEXT PRIMARY KEY,
+    firma TEXT NOT NULL,
+    huellas TEXT NOT NULL
+);
+"""
+
+ESQUEMA_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS registros_fts USING fts5(
+    descripcion, competencia, orientacion, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+COLUMNAS_EXPORTACION = ["archivo", "sha256", "Título", "Nivel"] + CAMPOS + ["actualizado"]
+
+
+def _consulta_fts(texto):
+    """Convierte lo que escribe el usuario en una consulta FTS5 segura: todas las palabras, como prefijo"""
+    palabras = [palabra.replace('"', "") for palabra in texto.split()]
+    return " ".join(f'"{palabra}"*' for palabra in palabras if palabra)
+
+
+class AlmacenResultados:
+    """Registros de extracción en SQLite (una conexión compartida, serializada con un lock)"""
+
+    def __init__(self, ruta=ALMACEN_DEFAULT):
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self.ruta = ruta
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.row_factory = sqlite3.Row
+        with self.lock, self.conexion:
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.executescript(ESQUEMA)
+            try:
+                self.conexion.executescript(ESQUEMA_FTS)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False  # SQLite sin FTS5: la búsqueda usa LIKE
+
+    def guardar(self, sha, titulo, fields, archivo=None, modelo=None, prompt_version=None):
+        """Inserta o reemplaza el registro (sha, titulo) y su entrada en el índice de texto"""
+        ahora = time.time()
+        with self.lock, self.conexion:
+            fila = self.conexion.execute(
+                "SELECT rowid, creado FROM registros WHERE sha256 = ? AND titulo = ?", (sha, titulo)
+            ).fetchone()
+            valores = (archivo, fields.get("Área", ""), fields.get("Grado", ""), clean_nivel(fields.get("Ciclo", "")),
+                       json.dumps(fields, ensure_ascii=False), modelo, prompt_version)
+            if fila is None:
+                rowid = self.conexion.execute(
+                    "INSERT INTO registros (archivo, area, grado, nivel, campos, modelo, prompt_version, "
+                    "sha256, titulo, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    valores + (sha, titulo, ahora, ahora)
+                ).lastrowid
+            else:
+                rowid = fila["rowid"]
+                self.conexion.execute(
+                    "UPDATE registros SET archivo = ?, area = ?, grado = ?, nivel = ?, campos = ?, modelo = ?, "
+                    "prompt_version = ?, actualizado = ? WHERE rowid = ?",
+                    valores + (ahora, rowid)
+                )
+            if self.fts:
+                self.conexion.execute("DELETE FROM registros_fts WHERE rowid = ?", (rowid,))
+                self.conexion.execute(
+                    "INSERT INTO registros_fts (rowid, descripcion, competencia, orientacion) VALUES (?, ?, ?, ?)",
+                    (rowid, fields.get("Descripción", ""), fields.get("Competencia", ""),
+                     limpiar_orientacion(fields.get("Orientación de uso", "")))
+                )
+
+    def guardar_firma(self, sha, texto):
+        """Firma MinHash y huellas por campo del texto que se extrajo (para encontrar casi duplicados)"""
+        firma = json.dumps(firma_minhash(texto))
+        huellas = json.dumps(huellas_por_campo(texto), ensure_ascii=False)
+        with self.lock, self.conexion:
+            # REPLACE da un rowid nuevo: los índices en memoria lo ven como firma nueva
+            self.conexion.execute("INSERT OR REPLACE INTO firmas (sha256, firma, huellas) VALUES (?, ?, ?)",
+                                  (sha, firma, huellas))
+
+    def iter_firmas(self, desde_rowid=0):
+        """(rowid, sha, firma, huellas) de las firmas guardadas después de `desde_rowid`"""
+        with self.lock:
+            filas = self.conexion.execute(
+                "SELECT rowid, sha256, firma, huellas FROM firmas WHERE rowid > ? ORDER BY rowid", (desde_rowid,)
+            ).fetchall()
+        for rowid, sha, firma, huellas in filas:
+            yield rowid, sha, tuple(json.loads(firma)), json.loads(huellas)
+
+    def _registro(self, fila):
+        registro = dict(fila)
+        registro["campos"] = json.loads(registro["campos"])
+        return registro
+
+    def obtener(self, sha, titulo=None):
+        """Registro de ese PDF (con ese título, o el más reciente con cualquier título), o None"""
+        with self.lock:
+            if titulo is None:
+                fila = self.conexion.execute(
+                    "SELECT * FROM registros WHERE sha256 = ? ORDER BY actualizado DESC LIMIT 1", (sha,)
+                ).fetchone()
+            else:
+                fila = self.conexion.execute(
+                    "SELECT * FROM registros WHERE sha256 = ? AND titulo = ?", (sha, titulo)
+                ).fetchone()
+        return self._registro(fila) if fila else None
+
+    def _filtros(self, texto, area, grado, nivel):
+        """Cláusula WHERE y parámetros para los filtros indicados"""
+        condiciones = []
+        parametros = []
+        for columna, valor in (("area", area), ("grado", grado), ("nivel", nivel)):
+            if valor:
+                condiciones.append(f"r.{columna} = ?")
+                parametros.append(valor)
+        if texto and texto.strip():
+            if self.fts:
+                condiciones.append("r.rowid IN (SELECT rowid FROM registros_fts WHERE registros_fts MATCH ?)")
+                parametros.append(_consulta_fts(texto))
+            else:
+                for palabra in texto.split():
+                    condiciones.append("r.campos LIKE ?")
+                    parametros.append(f"%{palabra}%")
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def buscar(self, texto=None, area=None, grado=None, nivel=None, limite=50):
+        """Registros que cumplen los filtros y contienen todas las palabras (como prefijo), los más recientes primero"""
+        where, parametros = self._filtros(texto, area, grado, nivel)
+        with self.lock:
+            filas = self.conexion.execute(
+                f"SELECT r.* FROM registros r{where} ORDER BY r.actualizado DESC LIMIT ?", parametros + [limite]
+            ).fetchall()
+        return [self._registro(fila) for fila in filas]
+
+    def iter_registros(self, texto=None, area=None, grado=None, nivel=None, bloque=FILAS_POR_BLOQUE):
+        """Recorre los registros por bloques de rowid (sin mantener el lock entre bloques)"""
+        where, parametros = self._filtros(texto, area, grado, nivel)
+        desde_rowid = 0
+        conector = " AND " if where else " WHERE "
+        while True:
+            with self.lock:
+                filas = self.conexion.execute(
+                    f"SELECT r.rowid AS _rowid, r.* FROM registros r{where}{conector}r.rowid > ? "
+                    f"ORDER BY r.rowid LIMIT ?", parametros + [desde_rowid, bloque]
+                ).fetchall()
+            if not filas:
+                return
+            for fila in filas:
+                registro = self._registro(fila)
+                desde_rowid = registro.pop("_rowid")
+                yield registro
+
+    def valores_distintos(self, columna):
+        """Valores de area, grado o nivel presentes, para los filtros de la interfaz"""
+        if columna not in ("area", "grado", "nivel"):
+            raise ValueError(columna)
+        with self.lock:
+            filas = self.conexion.execute(
+                f"SELECT DISTINCT {columna} FROM registros WHERE {columna} != '' ORDER BY {columna}"
+            ).fetchall()
+        return [fila[0] for fila in filas]
+
+    def contar(self):
+        with self.lock:
+            return self.conexion.execute("SELECT COUNT(*) FROM registros").fetchone()[0]
+
+    def close(self):
+        self.conexion.close()
+
+
+def fila_exportacion(registro):
+    """Registro plano para exportar, con las mismas limpiezas que la interfaz"""
+    archivo = registro["archivo"] or registro["titulo"]
+    return {
+        "archivo": archivo,
+        "sha256": registro["sha256"],
+        **construir_registro(archivo, registro["campos"]),
+        "Título": registro["titulo"],
+        "actualizado": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(registro["actualizado"])),
+    }
+
+
+def exportar(registros, salida, formato):
+    """Escribe los registros según llegan (JSONL o CSV); devuelve cuántos se escribieron"""
+    escritos = 0
+    if formato == "csv":
+        escritor = csv.DictWriter(salida, fieldnames=COLUMNAS_EXPORTACION, extrasaction="ignore")
+        escritor.writeheader()
+    for registro in registros:
+        fila = fila_exportacion(registro)
+        if formato == "csv":
+            escritor.writerow(fila)
+        else:
+            salida.write(json.dumps(fila, ensure_ascii=False) + "\n")
+        escritos += 1
+    return escritos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca y exporta las extracciones guardadas")
+    parser.add_argument("--almacen", default=ALMACEN_DEFAULT, help="Base de datos SQLite del almacén")
+    subparsers = parser.add_subparsers(dest="orden", required=True)
+    for nombre, ayuda in (("buscar", "Busca registros"), ("exportar", "Exporta registros (JSONL o CSV)")):
+        sub = subparsers.add_parser(nombre, help=ayuda)
+        sub.add_argument("texto", nargs="?", help="Palabras a buscar en Descripción, Competencia y Orientación")
+        sub.add_argument("--area")
+        sub.add_argument("--grado")
+        sub.add_argument("--nivel", choices=["Primaria", "Secundaria"])
+        if nombre == "buscar":
+            sub.add_argument("--limite", type=int, default=20)
+        else:
+            sub.add_argument("--salida", required=True, help="Archivo de salida (.jsonl o .csv; - para la salida estándar)")
+            sub.add_argument("--formato", choices=["jsonl", "csv"], help="Por defecto según la extensión de --salida")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenResultados(args.almacen)
+    try:
+        if args.orden == "buscar":
+            for registro in almacen.buscar(args.texto, args.area, args.grado, args.nivel, args.limite):
+                campos = registro["campos"]
+                print(f"{registro['titulo']} · {registro['area']} · {registro['grado']} · {registro['nivel']}")
+                print(f"    {campos.get('Descripción', '')[:150]}")
+            return 0
+        formato = args.formato or ("csv" if args.salida.lower().endswith(".csv") else "jsonl")
+        registros = almacen.iter_registros(args.texto, args.area, args.grado, args.nivel)
+        if args.salida == "-":
+            escritos = exportar(registros, sys.stdout, formato)
+        else:
+            with open(args.salida, "w", encoding="utf-8", newline="") as f:
+                escritos = exportar(registros, f, formato)
+        print(f"Exportados: {escritos} registros", file=sys.stderr)
+        return 0
+    finally:
+        almacen.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ============================================
+# CACHÉ EN DISCO DE EXTRACCIONES
+# ============================================
+
+CACHE_DIR_DEFAULT = os.environ.get("DDC_CACHE_DIR", os.path.join(".cache", "extracciones"))
+
+
+def sha256_bytes(data):
+    """Devuelve el SHA-256 (hex) de unos bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_archivo(ruta, bloque=1024 * 1024):
+    """Devuelve el SHA-256 (hex) de un archivo leyéndolo por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def cache_key(pdf_sha, prompt_version, model, **opciones):
+    """Clave de caché: contenido del PDF + versión del prompt + modelo (+ opciones que cambian el texto enviado).
+
+    Las opciones van con nombre y se incluyen aunque estén vacías, para que dos combinaciones distintas no
+    den la misma clave (p. ej. corte="" frente a una opción posterior).
+    """
+    partes = {"pdf": pdf_sha, "prompt": prompt_version, "modelo": model,
+              **{nombre: str(valor) for nombre, valor in opciones.items()}}
+    return sha256_bytes(json.dumps(partes, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+class ExtractionCache:
+    """Caché persistente de campos extraídos, un JSON por clave, con expulsión LRU por tamaño y antigüedad.
+
+    El orden LRU se lleva con el mtime de cada archivo: cada acierto lo actualiza.
+    """
+
+    def __init__(self, directorio=CACHE_DIR_DEFAULT, max_entradas=1000,
+                 max_bytes=50 * 1024 * 1024, max_edad_segundos=30 * 24 * 3600):
+        self.directorio = directorio
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.max_edad_segundos = max_edad_segundos
+        self.hits = 0
+        self.misses = 0
+        self.expulsiones = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _ruta(self, key):
+        return os.path.join(self.directorio, f"{key}.json")
+
+    def get(self, key):
+        """Devuelve los campos guardados o None si no hay entrada válida"""
+        ruta = self._ruta(key)
+        with self._lock:
+            try:
+                edad = time.time() - os.path.getmtime(ruta)
+                if edad > self.max_edad_segundos:
+                    os.remove(ruta)
+                    self.expulsiones += 1
+                    self.misses += 1
+                    return None
+                with open(ruta, "r", encoding="utf-8") as f:
+                    entrada = json.load(f)
+                os.utime(ruta, None)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entrada["fields"]
+
+    def put(self, key, fields, **metadata):
+        """Guarda los campos de forma atómica y aplica la política de expulsión"""
+        entrada = {"fields": fields, "guardado": time.time(), **metadata}
+        ruta = self._ruta(key)
+        tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entrada, f, ensure_ascii=False)
+            os.replace(tmp, ruta)
+            self._evict()
+
+    def invalidate(self, key):
+        """Elimina una entrada (para forzar una nueva extracción)"""
+        with self._lock:
+            try:
+                os.remove(self._ruta(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Vacía la caché completa"""
+        with self._lock:
+            for _, ruta, _ in self._entradas():
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def _entradas(self):
+        """Lista (mtime, ruta, tamaño) de las entradas, de la más antigua a la más reciente"""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".json"):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                st_ = os.stat(ruta)
+            except OSError:
+                continue
+            entradas.append((st_.st_mtime, ruta, st_.st_size))
+        entradas.sort()
+        return entradas
+
+    def _evict(self):
+        entradas = self._entradas()
+        limite_edad = time.time() - self.max_edad_segundos
+        total = sum(tam for _, _, tam in entradas)
+        restantes = len(entradas)
+        for mtime, ruta, tam in entradas:
+            if mtime >= limite_edad and restantes <= self.max_entradas and total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            self.expulsiones += 1
+            restantes -= 1
+            total -= tam
+
+    def stats(self):
+        """Contadores de uso y ocupación actual"""
+        with self._lock:
+            entradas = self._entradas()
+            consultas = self.hits + self.misses
+            return {
+                "entradas": len(entradas),
+                "bytes": sum(tam for _, _, tam in entradas),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expulsiones": self.expulsiones,
+                "tasa_aciertos": self.hits / consultas if consultas else 0.0,
+            }
+
+
+# ============================================
+# CACHÉ EN MEMORIA DEL TEXTO DE LOS PDF
+# ============================================
+
+def _caracteres(valor):
+    """Caracteres de texto contenidos en un valor (str o listas/tuplas de str)"""
+    if isinstance(valor, str):
+        return len(valor)
+    if isinstance(valor, (list, tuple)):
+        return sum(_caracteres(v) for v in valor)
+    return 0
+
+
+class TextCache:
+    """LRU en memoria del texto extraído por hash de contenido, acotada por entradas y caracteres.
+
+    Los valores pueden ser texto o listas/tuplas de texto (páginas, texto reducido + reporte).
+    """
+
+    def __init__(self, max_entradas=32, max_caracteres=20_000_000):
+        self.max_entradas = max_entradas
+        self.max_caracteres = max_caracteres
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict()
+        self._caracteres = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Devuelve el texto guardado o None"""
+        with self._lock:
+            texto = self._datos.get(key)
+            if texto is None:
+                self.misses += 1
+                return None
+            self._datos.move_to_end(key)
+            self.hits += 1
+            return texto
+
+    def put(self, key, texto):
+        """Guarda el texto y expulsa las entradas menos usadas si se supera algún límite"""
+        with self._lock:
+            anterior = self._datos.pop(key, None)
+            if anterior is not None:
+                self._caracteres -= _caracteres(anterior)
+            tamano = _caracteres(texto)
+            if tamano > self.max_caracteres:
+                return
+            self._datos[key] = texto
+            self._caracteres += tamano
+            while len(self._datos) > self.max_entradas or self._caracteres > self.max_caracteres:
+                _, expulsado = self._datos.popitem(last=False)
+                self._caracteres -= _caracteres(expulsado)
+
+    def get_or_compute(self, key, calcular):
+        """Devuelve (texto, desde_cache); si no está, lo calcula con calcular() y lo guarda"""
+        texto = self.get(key)
+        if texto is not None:
+            return texto, True
+        texto = calcular()
+        self.put(key, texto)
+        return texto, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "caracteres": self._caracteres,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,247 @@
+"""Extracción sin interfaz para directorios completos de PDF.
+
+Uso:
+    python -m ddc.cli RUTA_PDFS --salida resultados.jsonl [--formato csv] [--concurrencia 8] [--procesos 4]
+
+La API key se toma de --api-key o de la variable de entorno ANTHROPIC_API_KEY.
+Cada archivo terminado se escribe en la salida en cuanto acaba y se anota en el checkpoint
+(<salida>.checkpoint); si la ejecución se interrumpe, el mismo comando continúa donde se quedó
+sin volver a parsear ni a facturar los archivos ya terminados.
+
+Cada resultado se guarda también en el almacén SQLite (ddc.almacen) para buscarlo y exportarlo después;
+de los casi duplicados de PDF ya guardados (misma plantilla) solo se piden los campos que cambian.
+
+Los tiempos por etapa, tokens y coste de cada documento se anotan en DDC_METRICS_LOG (JSONL) y,
+si se indican, en DDC_METRICS_FILE o en el endpoint DDC_METRICS_PORT (texto Prometheus); ver ddc.metricas.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from ddc.almacen import ALMACEN_DEFAULT, AlmacenResultados
+from ddc.cache import CACHE_DIR_DEFAULT, ExtractionCache, cache_key, sha256_archivo
+from ddc.extractor import CAMPOS, PROMPT_VERSION, construir_registro
+from ddc.cliente import crear_cliente_async
+from ddc.duplicados import IndiceDuplicados
+from ddc.enrutador import MODELOS_ENRUTADOS, resumen_niveles
+from ddc.lote import CONCURRENCIA_DEFAULT, crear_pool_procesos, procesar_documento
+from ddc.metricas import registro
+from ddc.reduccion import VERSION_REDUCCION
+from ddc.reglas import resumen_origen
+
+COLUMNAS = ["archivo", "sha256", "Título", "Nivel"] + CAMPOS + ["desde_cache"]
+
+
+def listar_pdfs(raiz):
+    """Recorre el directorio en orden estable y devuelve las rutas de los PDF"""
+    for carpeta, subcarpetas, archivos in os.walk(raiz):
+        subcarpetas.sort()
+        for nombre in sorted(archivos):
+            if nombre.lower().endswith(".pdf"):
+                yield os.path.join(carpeta, nombre)
+
+
+class Checkpoint:
+    """Registro de archivos terminados, una línea JSON por archivo, sincronizado a disco en cada escritura"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.hechos = set()
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        self.hechos.add(json.loads(linea)["archivo"])
+                    except (ValueError, KeyError):
+                        continue  # línea truncada por una interrupción
+        self._f = open(ruta, "a", encoding="utf-8")
+
+    def hecho(self, archivo):
+        return archivo in self.hechos
+
+    def marcar(self, archivo, sha):
+        self._f.write(json.dumps({"archivo": archivo, "sha256": sha}, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.hechos.add(archivo)
+
+    def close(self):
+        self._f.close()
+
+
+class EscritorSalida:
+    """Escribe un registro por archivo en JSONL o CSV, vaciando el buffer tras cada uno"""
+
+    def __init__(self, ruta, formato):
+        nuevo = not os.path.exists(ruta) or os.path.getsize(ruta) == 0
+        self.formato = formato
+        self._f = open(ruta, "a", encoding="utf-8", newline="")
+        if formato == "csv":
+            self._csv = csv.DictWriter(self._f, fieldnames=COLUMNAS, extrasaction="ignore")
+            if nuevo:
+                self._csv.writeheader()
+
+    def escribir(self, registro):
+        if self.formato == "csv":
+            self._csv.writerow(registro)
+        else:
+            self._f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+async def ejecutar(args):
+    """Procesa todos los PDF pendientes y devuelve (correctos, errores)"""
+    cache = None if args.sin_cache else ExtractionCache(args.cache_dir)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.salida}.checkpoint")
+    escritor = EscritorSalida(args.salida, args.formato)
+    almacen = None if args.sin_almacen else AlmacenResultados(args.almacen)
+    duplicados = IndiceDuplicados(almacen) if almacen else None
+    semaforo = asyncio.Semaphore(args.concurrencia)
+    # Limita los documentos en curso para no acumular textos en memoria mientras esperan a la API
+    max_en_vuelo = args.concurrencia * 2 + (args.procesos or os.cpu_count() or 1)
+    loop = asyncio.get_running_loop()
+    correctos = errores = 0
+    tokens = {"antes": 0, "despues": 0}
+    inicio = time.perf_counter()
+
+    por_reglas = {}
+    reutilizados = {}
+    uso = {}
+
+    def al_avanzar(archivo, etapa, dato):
+        if etapa == "texto":
+            reporte = dato[1]
+            tokens["antes"] += reporte["tokens_antes"]
+            tokens["despues"] += reporte["tokens_despues"]
+        elif etapa == "origen":
+            resumen = resumen_origen(dato)
+            por_reglas[archivo] = len(resumen["reglas"])
+            reutilizados[archivo] = len(resumen["reutilizado"])
+        elif etapa == "uso":
+            for nombre, valor in dato.items():
+                uso[nombre] = uso.get(nombre, 0) + valor
+
+    async def procesar(ruta, client, pool):
+        archivo = os.path.relpath(ruta, args.ruta)
+        try:
+            sha = await loop.run_in_executor(None, sha256_archivo, ruta)
+        except OSError as e:
+            return archivo, None, None, False, e
+        key = cache_key(sha, PROMPT_VERSION, MODELOS_ENRUTADOS, corte="corte" if args.corte_temprano else "",
+                        reduccion=VERSION_REDUCCION)
+        fields = cache.get(key) if cache else None
+        if fields is not None:
+            return archivo, sha, fields, True, None
+        _, texto, fields, error = await procesar_documento(
+            archivo, ruta, client, pool, semaforo, al_avanzar, corte_temprano=args.corte_temprano,
+            duplicados=duplicados, sha=sha
+        )
+        if fields and cache:
+            cache.put(key, fields, archivo=archivo, modelo=MODELOS_ENRUTADOS)
+        if fields and almacen:
+            almacen.guardar_firma(sha, texto)
+        return archivo, sha, fields, False, error
+
+    def registrar(resultado):
+        nonlocal correctos, errores
+        archivo, sha, fields, desde_cache, error = resultado
+        if error is not None or not fields:
+            errores += 1
+            print(f"❌ {archivo}: {error}", file=sys.stderr)
+            return
+        registro = {"archivo": archivo, "sha256": sha, **construir_registro(archivo, fields), "desde_cache": desde_cache}
+        escritor.escribir(registro)
+        if almacen:
+            almacen.guardar(sha, registro["Título"], fields, archivo=archivo, modelo=MODELOS_ENRUTADOS,
+                            prompt_version=PROMPT_VERSION)
+        checkpoint.marcar(archivo, sha)
+        correctos += 1
+        origen = "caché" if desde_cache else f"API, {por_reglas.pop(archivo, 0)}/{len(CAMPOS)} campos por reglas"
+        if reutilizados.get(archivo):
+            origen += f", {reutilizados.pop(archivo)} de un casi duplicado"
+        print(f"✅ [{correctos + errores}] {archivo} ({origen}, {time.perf_counter() - inicio:.0f} s)", file=sys.stderr)
+
+    pendientes = (
+        ruta for ruta in listar_pdfs(args.ruta)
+        if not checkpoint.hecho(os.path.relpath(ruta, args.ruta))
+    )
+    try:
+        async with crear_cliente_async(args.api_key) as client:
+            with crear_pool_procesos(args.procesos) as pool:
+                en_vuelo = set()
+                for ruta in pendientes:
+                    if len(en_vuelo) >= max_en_vuelo:
+                        hechos, en_vuelo = await asyncio.wait(en_vuelo, return_when=asyncio.FIRST_COMPLETED)
+                        for tarea in hechos:
+                            registrar(tarea.result())
+                    en_vuelo.add(asyncio.ensure_future(procesar(ruta, client, pool)))
+                while en_vuelo:
+                    hechos, en_vuelo = await asyncio.wait(en_vuelo, return_when=asyncio.FIRST_COMPLETED)
+                    for tarea in hechos:
+                        registrar(tarea.result())
+    finally:
+        escritor.close()
+        checkpoint.close()
+        if almacen:
+            almacen.close()
+    if tokens["antes"]:
+        ahorro = 1 - tokens["despues"] / tokens["antes"]
+        print(f"Tokens estimados del texto: {tokens['antes']} → {tokens['despues']} (-{ahorro:.0%})", file=sys.stderr)
+    if uso:
+        print(
+            f"Tokens de la API: entrada {uso.get('input_tokens', 0)}, salida {uso.get('output_tokens', 0)}, "
+            f"caché escrita {uso.get('cache_creation_input_tokens', 0)}, "
+            f"caché leída {uso.get('cache_read_input_tokens', 0)}",
+            file=sys.stderr
+        )
+    for serie, valores in registro().resumen().items():
+        unidad = "USD" if serie == "coste_documento" else "s"
+        print(f"{serie}: p50 {valores['p50']:.4f} {unidad}, p95 {valores['p95']:.4f} {unidad} (n={valores['n']})",
+              file=sys.stderr)
+    for nivel, datos in resumen_niveles().items():
+        if datos["documentos"] or datos["reintentos"]:
+            print(
+                f"Nivel {nivel}: {datos['documentos']} documentos, {datos['escalados']} escalados "
+                f"({datos['tasa_escalado']:.0%}; {datos['escalados_documento']} enteros, "
+                f"{datos['campos_escalados']} campos), {datos['reintentos']} reintentos",
+                file=sys.stderr
+            )
+    return correctos, errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extrae los campos de todos los PDF de un directorio con Claude")
+    parser.add_argument("ruta", help="Directorio con los PDF (se recorre recursivamente)")
+    parser.add_argument("--salida", required=True, help="Archivo de resultados (.jsonl o .csv)")
+    parser.add_argument("--formato", choices=["jsonl", "csv"], help="Por defecto según la extensión de --salida")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA_DEFAULT, help="Llamadas simultáneas a la API")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para parsear PDF (por defecto, núcleos)")
+    parser.add_argument("--checkpoint", help="Archivo de checkpoint (por defecto <salida>.checkpoint)")
+    parser.add_argument("--corte-temprano", action="store_true",
+                        help="Deja de leer cada PDF cuando ya aparecieron las secciones del prompt (omite anexos)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR_DEFAULT, help="Directorio de la caché de extracciones")
+    parser.add_argument("--sin-cache", action="store_true", help="No leer ni escribir la caché de extracciones")
+    parser.add_argument("--almacen", default=ALMACEN_DEFAULT, help="Base de datos SQLite del almacén de búsqueda")
+    parser.add_argument("--sin-almacen", action="store_true", help="No guardar los resultados en el almacén")
+    parser.add_argument("--api-key", default=os.environ.get("ANTHROPIC_API_KEY", ""))
+    args = parser.parse_args(argv)
+
+    if not args.formato:
+        args.formato = "csv" if args.salida.lower().endswith(".csv") else "jsonl"
+    if not args.api_key:
+        parser.error("falta la API key (--api-key o ANTHROPIC_API_KEY)")
+
+    correctos, errores = asyncio.run(ejecutar(args))
+    print(f"Terminado: {correctos} correctos, {errores} con error", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+import asyncio
+import atexit
+import email.utils
+import functools
+import os
+import random
+import re
+import threading
+import time
+
+import anthropic
+import httpx
+
+from ddc.gobernador import coste_solicitud, gobernador
+
+# ============================================
+# CLIENTE HTTP/ANTHROPIC COMPARTIDO
+# ============================================
+# Configuración por variables de entorno:
+#   DDC_TLS_VERIFY           1 (por defecto), 0 para desactivar, o ruta a un bundle de CA
+#   DDC_MAX_CONEXIONES       conexiones simultáneas del pool (20)
+#   DDC_MAX_KEEPALIVE        conexiones ociosas que se mantienen abiertas (10)
+#   DDC_KEEPALIVE_SEGUNDOS   tiempo que se conserva una conexión ociosa (60)
+#   DDC_TIMEOUT_CONEXION     segundos para conectar (10)
+#   DDC_TIMEOUT_LECTURA      segundos de lectura (180; la respuesta completa puede tardar)
+#   DDC_MAX_REINTENTOS       reintentos ante 429/529/5xx o errores de red (4)
+# Las llamadas a messages esperan turno en el gobernador de límites del proceso (ddc.gobernador).
+
+CODIGOS_REINTENTABLES = {408, 409, 429, 500, 502, 503, 504, 529}
+ERRORES_REINTENTABLES = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError)
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 60.0
+# Tokens de salida en el cuerpo de messages (JSON) o en el message_delta final del streaming
+OUTPUT_TOKENS_RE = re.compile(rb'"output_tokens"\s*:\s*(\d+)')
+
+
+def _entorno(nombre, defecto, tipo=int):
+    valor = os.environ.get(nombre)
+    return tipo(valor) if valor not in (None, "") else defecto
+
+
+def verificacion_tls():
+    """Valor de verify para httpx según DDC_TLS_VERIFY"""
+    valor = os.environ.get("DDC_TLS_VERIFY", "1").strip()
+    if valor.lower() in ("0", "false", "no"):
+        return False
+    if valor.lower() in ("1", "true", "si", "sí", "yes"):
+        return True
+    return valor
+
+
+def http2_disponible():
+    """HTTP/2 requiere el paquete opcional h2 (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configuracion():
+    """Parámetros del pool a partir del entorno"""
+    return {
+        "verify": verificacion_tls(),
+        "http2": http2_disponible(),
+        "limits": httpx.Limits(
+            max_connections=_entorno("DDC_MAX_CONEXIONES", 20),
+            max_keepalive_connections=_entorno("DDC_MAX_KEEPALIVE", 10),
+            keepalive_expiry=_entorno("DDC_KEEPALIVE_SEGUNDOS", 60.0, float),
+        ),
+        "timeout": httpx.Timeout(
+            _entorno("DDC_TIMEOUT_LECTURA", 180.0, float),
+            connect=_entorno("DDC_TIMEOUT_CONEXION", 10.0, float),
+        ),
+        "max_reintentos": _entorno("DDC_MAX_REINTENTOS", 4),
+    }
+
+
+def calcular_espera(intento, response=None):
+    """Segundos antes del siguiente intento: retry-after si la API lo indica, si no backoff exponencial con jitter"""
+    if response is not None:
+        espera_ms = response.headers.get("retry-after-ms")
+        if espera_ms:
+            try:
+                return min(float(espera_ms) / 1000, ESPERA_MAXIMA)
+            except ValueError:
+                pass
+        espera = response.headers.get("retry-after")
+        if espera:
+            try:
+                return min(float(espera), ESPERA_MAXIMA)
+            except ValueError:
+                try:
+                    fecha = email.utils.parsedate_to_datetime(espera)
+                    return min(max(fecha.timestamp() - time.time(), 0.0), ESPERA_MAXIMA)
+                except (TypeError, ValueError):
+                    pass
+    return random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento))
+
+
+def _gobernar(request, gobernador_api):
+    """(gobernador, modelo, coste) si la llamada pasa por el gobernador, o None"""
+    coste = coste_solicitud(request) if gobernador_api is not None else None
+    return (gobernador_api,) + coste if coste else None
+
+
+def _informar(gobernado, response, espera=None):
+    """Pasa al gobernador las cabeceras de límites y, si fue un 429, la pausa de retry-after.
+
+    Si las cabeceras no traen el saldo de salida, la reserva se liquida al terminar de leer el cuerpo
+    (o entera si la llamada falló).
+    """
+    if gobernado is None:
+        return
+    gobernador_api, modelo, coste = gobernado
+    gobernador_api.actualizar(modelo, response.headers)
+    if response.status_code == 429 and espera is not None:
+        gobernador_api.pausar(espera)
+    if "anthropic-ratelimit-output-tokens-remaining" in response.headers:
+        return
+    liquidar = functools.partial(gobernador_api.liquidar, modelo, coste["salida"])
+    if response.status_code >= 400:
+        liquidar(0)
+    elif isinstance(response.stream, httpx.AsyncByteStream):
+        response.stream = _FlujoLiquidadoAsync(response.stream, liquidar)
+    else:
+        response.stream = _FlujoLiquidado(response.stream, liquidar)
+
+
+def _devolver(gobernado):
+    """Devuelve entera la reserva de salida de un intento que no llegó a tener respuesta"""
+    if gobernado is not None:
+        gobernado[0].liquidar(gobernado[1], gobernado[2]["salida"], 0)
+
+
+class _Liquidacion:
+    """Anota los output_tokens del cuerpo a medida que se lee y liquida la reserva al cerrarse"""
+
+    def __init__(self, flujo, liquidar):
+        self._flujo = flujo
+        self._liquidar = liquidar
+        self._cola = b""
+        self.usados = None
+
+    def _anotar(self, trozo):
+        # La cola cubre una coincidencia partida entre dos trozos
+        texto = self._cola + trozo
+        coincidencias = OUTPUT_TOKENS_RE.findall(texto)
+        if coincidencias:
+            self.usados = int(coincidencias[-1])
+        self._cola = texto[-64:]
+
+    def _cerrado(self):
+        # Sin usage (cuerpo cortado), la reserva se da por gastada
+        if self._liquidar is not None and self.usados is not None:
+            self._liquidar(self.usados)
+        self._liquidar = None
+
+
+class _FlujoLiquidado(_Liquidacion, httpx.SyncByteStream):
+    def __iter__(self):
+        for trozo in self._flujo:
+            self._anotar(trozo)
+            yield trozo
+
+    def close(self):
+        try:
+            self._flujo.close()
+        finally:
+            self._cerrado()
+
+
+class _FlujoLiquidadoAsync(_Liquidacion, httpx.AsyncByteStream):
+    async def __aiter__(self):
+        async for trozo in self._flujo:
+            self._anotar(trozo)
+            yield trozo
+
+    async def aclose(self):
+        try:
+            await self._flujo.aclose()
+        finally:
+            self._cerrado()
+
+
+class TransporteConReintentos(httpx.BaseTransport):
+    """Transporte httpx que reintenta las respuestas 429/529/5xx y los errores de red.
+
+    Con gobernador, cada intento espera su turno y su saldo antes de salir.
+    """
+
+    def __init__(self, transporte, max_reintentos, gobernador_api=None):
+        self._transporte = transporte
+        self.max_reintentos = max_reintentos
+        self.gobernador = gobernador_api
+
+    def handle_request(self, request):
+        gobernado = _gobernar(request, self.gobernador)
+        for intento in range(self.max_reintentos + 1):
+            ultimo = intento == self.max_reintentos
+            if gobernado:
+                gobernado[0].adquirir(gobernado[1], gobernado[2])
+            try:
+                response = self._transporte.handle_request(request)
+            except ERRORES_REINTENTABLES:
+                _devolver(gobernado)
+                if ultimo:
+                    raise
+                time.sleep(calcular_espera(intento))
+                continue
+            if response.status_code not in CODIGOS_REINTENTABLES or ultimo:
+                _informar(gobernado, response)
+                return response
+            espera = calcular_espera(intento, response)
+            _informar(gobernado, response, espera)
+            response.close()
+            if not gobernado or response.status_code != 429:
+                time.sleep(espera)  # tras un 429 con gobernador, la pausa la respeta adquirir en el siguiente intento
+
+    def close(self):
+        self._transporte.close()
+
+
+class TransporteConReintentosAsync(httpx.AsyncBaseTransport):
+    """Versión asíncrona de TransporteConReintentos"""
+
+    def __init__(self, transporte, max_reintentos, gobernador_api=None):
+        self._transporte = transporte
+        self.max_reintentos = max_reintentos
+        self.gobernador = gobernador_api
+
+    async def handle_async_request(self, request):
+        gobernado = _gobernar(request, self.gobernador)
+        for intento in range(self.max_reintentos + 1):
+            ultimo = intento == self.max_reintentos
+            if gobernado:
+                await gobernado[0].adquirir_async(gobernado[1], gobernado[2])
+            try:
+                response = await self._transporte.handle_async_request(request)
+            except ERRORES_REINTENTABLES:
+                _devolver(gobernado)
+                if ultimo:
+                    raise
+                await asyncio.sleep(calcular_espera(intento))
+                continue
+            if response.status_code not in CODIGOS_REINTENTABLES or ultimo:
+                _informar(gobernado, response)
+                return response
+            espera = calcular_espera(intento, response)
+            _informar(gobernado, response, espera)
+            await response.aclose()
+            if not gobernado or response.status_code != 429:
+                await asyncio.sleep(espera)
+
+    async def aclose(self):
+        await self._transporte.aclose()
+
+
+def crear_http_client(config=None):
+    """httpx.Client con pool, keep-alive, HTTP/2 si está disponible, timeouts y reintentos"""
+    config = config or configuracion()
+    transporte = httpx.HTTPTransport(verify=config["verify"], http2=config["http2"], limits=config["limits"])
+    return httpx.Client(
+        transport=TransporteConReintentos(transporte, config["max_reintentos"], gobernador()),
+        timeout=config["timeout"],
+    )
+
+
+def crear_http_client_async(config=None):
+    """Como crear_http_client, para AsyncAnthropic"""
+    config = config or configuracion()
+    transporte = httpx.AsyncHTTPTransport(verify=config["verify"], http2=config["http2"], limits=config["limits"])
+    return httpx.AsyncClient(
+        transport=TransporteConReintentosAsync(transporte, config["max_reintentos"], gobernador()),
+        timeout=config["timeout"],
+    )
+
+
+_clientes = {}
+_lock = threading.Lock()
+
+
+def get_client(api_key, base_url=None):
+    """Cliente anthropic.Anthropic único por proceso (y por API key), reutilizado entre llamadas y sesiones"""
+    clave = (api_key, base_url)
+    with _lock:
+        client = _clientes.get(clave)
+        if client is None:
+            # Los reintentos los hace el transporte; el SDK no debe repetirlos
+            client = anthropic.Anthropic(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=crear_http_client(),
+                max_retries=0,
+            )
+            _clientes[clave] = client
+        return client
+
+
+def crear_cliente_async(api_key, base_url=None):
+    """Cliente asíncrono con el mismo pool y reintentos.
+
+    Un AsyncClient queda ligado a su bucle de eventos, por eso se crea uno por lote
+    (compartido por todas las llamadas del lote) en lugar de uno por proceso.
+    """
+    return anthropic.AsyncAnthropic(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=crear_http_client_async(),
+        max_retries=0,
+    )
+
+
+@atexit.register
+def cerrar_clientes():
+    """Cierra las conexiones del pool al terminar el proceso"""
+    with _lock:
+        for client in _clientes.values():
+            client.close()
+        _clientes.clear()
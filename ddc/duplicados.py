@@ -0,0 +1,158 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+from ddc.enrutador import registro_vigente
+from ddc.esquema import CAMPOS, validar_campos
+from ddc.fragmentos import puntuar
+from ddc.reduccion import SECCION_RELEVANTE
+
+# ============================================
+# CASI DUPLICADOS (PDF HECHOS CON LA MISMA PLANTILLA)
+# ============================================
+# Cada texto tiene una firma MinHash (una permutación con NUM_CUBETAS cubetas) y una huella por campo:
+# el hash de las secciones donde aparecen las pistas de ese campo. Un índice LSH por bandas encuentra
+# los candidatos sin recorrer todos los documentos; del más parecido se reutilizan los campos cuya
+# huella no cambió y se vuelven a extraer los demás.
+# Configuración por variables de entorno:
+#   DDC_SIMILITUD_DUPLICADO   similitud mínima (Jaccard estimado) para reutilizar campos (0.7)
+# La similitud solo elige el documento de referencia: lo que decide qué campo se reutiliza es su huella.
+# Solo sirven de referencia los registros vigentes: versión del prompt actual y modelos que valen ahora.
+
+PALABRAS_POR_TEJA = 5
+NUM_CUBETAS = 64
+FILAS_POR_BANDA = 4  # 16 bandas: un par con similitud 0.7 es candidato con probabilidad ~0.99
+SIMILITUD_MINIMA = float(os.environ.get("DDC_SIMILITUD_DUPLICADO", 0.7))
+MASCARA_64 = (1 << 64) - 1
+
+PALABRA_RE = re.compile(r"\w+")
+
+
+def _hash64(texto):
+    return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def firma_minhash(texto):
+    """Firma MinHash de las tejas de PALABRAS_POR_TEJA palabras (una permutación, cubetas densificadas)"""
+    palabras = PALABRA_RE.findall(texto.lower())
+    tejas = {" ".join(palabras[i:i + PALABRAS_POR_TEJA]) for i in range(max(1, len(palabras) - PALABRAS_POR_TEJA + 1))}
+    minimos = [None] * NUM_CUBETAS
+    for teja in tejas:
+        valor = _hash64(teja)
+        cubeta, resto = valor % NUM_CUBETAS, valor // NUM_CUBETAS
+        if minimos[cubeta] is None or resto < minimos[cubeta]:
+            minimos[cubeta] = resto
+    # Las cubetas vacías toman el valor de la siguiente no vacía (desplazado) para que sigan siendo comparables
+    if any(valor is not None for valor in minimos):
+        for cubeta in range(NUM_CUBETAS):
+            distancia = 1
+            while minimos[cubeta] is None:
+                siguiente = minimos[(cubeta + distancia) % NUM_CUBETAS]
+                if siguiente is not None:
+                    minimos[cubeta] = (siguiente + distancia * 0x9E3779B97F4A7C15) & MASCARA_64
+                distancia += 1
+    return tuple(valor or 0 for valor in minimos)
+
+
+def similitud(firma_a, firma_b):
+    """Jaccard estimado: fracción de cubetas con el mismo mínimo"""
+    return sum(1 for a, b in zip(firma_a, firma_b) if a == b) / NUM_CUBETAS
+
+
+def dividir_en_secciones(texto):
+    """Secciones del texto cortadas en los encabezados relevantes (la primera es la portada)"""
+    secciones = [[]]
+    for linea in texto.splitlines():
+        if SECCION_RELEVANTE.match(linea.strip()) and secciones[-1]:
+            secciones.append([])
+        secciones[-1].append(linea)
+    return ["\n".join(lineas) for lineas in secciones]
+
+
+def huellas_por_campo(texto):
+    """{campo: hash} de las secciones de las que sale cada campo; sin secciones propias, el del texto completo"""
+    secciones = dividir_en_secciones(texto)
+    hashes = [hashlib.sha1(" ".join(PALABRA_RE.findall(seccion.lower())).encode("utf-8")).hexdigest()
+              for seccion in secciones]
+    puntajes = [puntuar(seccion, indice) for indice, seccion in enumerate(secciones)]
+    huellas = {}
+    for campo in CAMPOS:
+        fuentes = [hashes[indice] for indice in range(len(secciones)) if puntajes[indice][campo] > 0] or hashes
+        huellas[campo] = hashlib.sha1("|".join(fuentes).encode("utf-8")).hexdigest()[:16]
+    return huellas
+
+
+def bandas(firma):
+    return [(inicio, firma[inicio:inicio + FILAS_POR_BANDA]) for inicio in range(0, NUM_CUBETAS, FILAS_POR_BANDA)]
+
+
+class IndiceDuplicados:
+    """Índice LSH en memoria sobre las firmas del almacén; se pone al día con las firmas nuevas en cada búsqueda"""
+
+    def __init__(self, almacen, similitud_minima=SIMILITUD_MINIMA):
+        self.almacen = almacen
+        self.similitud_minima = similitud_minima
+        self.firmas = {}   # sha -> (firma, huellas)
+        self.cubetas = {}  # banda -> {sha}
+        self.ultimo_rowid = 0
+        self.lock = threading.Lock()
+
+    def _sincronizar(self):
+        for rowid, sha, firma, huellas in self.almacen.iter_firmas(self.ultimo_rowid):
+            anterior = self.firmas.get(sha)
+            if anterior:
+                for banda in bandas(anterior[0]):
+                    self.cubetas.get(banda, set()).discard(sha)
+            self.firmas[sha] = (firma, huellas)
+            for banda in bandas(firma):
+                self.cubetas.setdefault(banda, set()).add(sha)
+            self.ultimo_rowid = rowid
+
+    def parecidos(self, firma, excluir=None):
+        """[(similitud, sha)] de los documentos indexados por encima del mínimo, del más parecido al menos"""
+        with self.lock:
+            self._sincronizar()
+            candidatos = set()
+            for banda in bandas(firma):
+                candidatos |= self.cubetas.get(banda, set())
+            candidatos.discard(excluir)
+            puntuados = [(similitud(firma, self.firmas[sha][0]), sha) for sha in candidatos]
+        return sorted(((valor, sha) for valor, sha in puntuados if valor >= self.similitud_minima), reverse=True)
+
+    def buscar(self, texto, excluir=None):
+        """Casi duplicado ya extraído de `texto` y los campos que se pueden reutilizar, o None.
+
+        Devuelve {"sha256", "titulo", "similitud", "reutilizados", "reextraer", "ms_busqueda", "campos"},
+        con "campos" = {campo: valor} de los reutilizados. excluir: sha del propio PDF.
+        """
+        firma = firma_minhash(texto)
+        inicio = time.perf_counter()
+        for valor, sha in self.parecidos(firma, excluir):
+            guardado = self.almacen.obtener(sha)
+            # Un registro de otro prompt u otros modelos no se copia en los resultados nuevos
+            if guardado and registro_vigente(guardado):
+                break
+        else:
+            return None
+        ms_busqueda = (time.perf_counter() - inicio) * 1000
+        huellas = huellas_por_campo(texto)
+        anteriores = self.firmas[sha][1]
+        invalidos = validar_campos(guardado["campos"])
+        reutilizados = [campo for campo in CAMPOS
+                        if huellas[campo] == anteriores.get(campo) and campo not in invalidos]
+        return {
+            "sha256": sha,
+            "titulo": guardado["titulo"],
+            "similitud": round(valor, 3),
+            "reutilizados": reutilizados,
+            "reextraer": [campo for campo in CAMPOS if campo not in reutilizados],
+            "ms_busqueda": round(ms_busqueda, 3),
+            "campos": {campo: guardado["campos"][campo] for campo in reutilizados},
+        }
+
+
+def resumen_duplicado(coincidencia):
+    """La coincidencia sin los valores reutilizados, para la vista de Debug"""
+    return {clave: valor for clave, valor in coincidencia.items() if clave != "campos"}
@@ -0,0 +1,107 @@
+import os
+
+from ddc.extractor import MODEL_NAME, PROMPT_VERSION
+from ddc.metricas import TIPOS_TOKEN, registro
+
+# ============================================
+# ENRUTAMIENTO POR NIVELES DE MODELO
+# ============================================
+# Cada documento va primero al modelo rápido; los campos que no pasan la validación (o el documento
+# entero, si fallan muchos) se piden otra vez al modelo grande. Los textos largos van directos al grande.
+# Los opcionales que el modelo deja vacíos (ausentes en el PDF) son válidos: no se escalan ni cuentan.
+# Configuración por variables de entorno:
+#   DDC_ENRUTAMIENTO             0 para usar siempre el modelo grande (1)
+#   DDC_MODELO_RAPIDO            modelo del primer nivel (claude-3-5-haiku-20241022)
+#   DDC_MAX_CARACTERES_RAPIDO    textos más largos van directos al modelo grande (40000)
+#   DDC_MAX_INVALIDOS_PARCIAL    con más campos inválidos se escala el documento entero (5)
+
+MODELO_GRANDE = MODEL_NAME
+MODELO_RAPIDO = os.environ.get("DDC_MODELO_RAPIDO", "claude-3-5-haiku-20241022")
+ENRUTAMIENTO = os.environ.get("DDC_ENRUTAMIENTO", "1") != "0"
+MAX_CARACTERES_RAPIDO = int(os.environ.get("DDC_MAX_CARACTERES_RAPIDO", 40_000))
+MAX_INVALIDOS_PARCIAL = int(os.environ.get("DDC_MAX_INVALIDOS_PARCIAL", 5))
+
+NIVELES = {MODELO_RAPIDO: "rapido", MODELO_GRANDE: "grande"}
+
+# Identifica la configuración en las claves de caché y en el registro de métricas
+MODELOS_ENRUTADOS = f"{MODELO_RAPIDO}>{MODELO_GRANDE}" if ENRUTAMIENTO else MODELO_GRANDE
+# Modelos cuyos registros del almacén valen para esta configuración: los suyos y el grande solo (la
+# Message Batches API y DDC_ENRUTAMIENTO=0 lo extraen todo con él, sin pasar por el rápido)
+MODELOS_VIGENTES = (MODELOS_ENRUTADOS, MODELO_GRANDE)
+
+
+def nivel(modelo):
+    return NIVELES.get(modelo, modelo)
+
+
+def registro_vigente(guardado):
+    """Si un registro del almacén es de la versión del prompt actual y de unos modelos que valen ahora"""
+    return guardado["prompt_version"] == PROMPT_VERSION and guardado["modelo"] in MODELOS_VIGENTES
+
+
+def modelo_inicial(pdf_text):
+    """Modelo de la primera llamada del documento"""
+    if ENRUTAMIENTO and len(pdf_text) <= MAX_CARACTERES_RAPIDO:
+        return MODELO_RAPIDO
+    return MODELO_GRANDE
+
+
+def plan_escalado(modelo, invalidos, pedidos):
+    """Segunda llamada tras una validación fallida: devuelve (modelo, campos, motivo).
+
+    motivo: "reintento" (mismo modelo, solo los inválidos), "campos" (modelo grande, solo los inválidos)
+    o "documento" (modelo grande, todos los campos pedidos, porque el rápido falló en demasiados).
+    """
+    if modelo == MODELO_GRANDE:
+        registro().sumar("reintentos", nivel=nivel(modelo))
+        return MODELO_GRANDE, list(invalidos), "reintento"
+    registro().sumar("escalados", nivel=nivel(modelo))
+    if len(invalidos) > MAX_INVALIDOS_PARCIAL:
+        registro().sumar("escalados_documento", nivel=nivel(modelo))
+        return MODELO_GRANDE, list(pedidos), "documento"
+    registro().sumar("campos_escalados", len(invalidos), nivel=nivel(modelo))
+    return MODELO_GRANDE, list(invalidos), "campos"
+
+
+def registrar_llamada(modelo, parcial, segundos, metricas, inicial=False):
+    """Anota una llamada de un nivel: latencia y tokens por nivel, y la suma en `metricas` del documento.
+
+    Los tokens se suman en los contadores normales y, para el coste, en "<tipo>@<modelo>".
+    """
+    etiqueta = nivel(modelo)
+    registro().observar(f"nivel_{etiqueta}", segundos)
+    if inicial:
+        registro().sumar("documentos_nivel", nivel=etiqueta)
+    for tipo in TIPOS_TOKEN:
+        if parcial.get(tipo):
+            registro().sumar("tokens_nivel", parcial[tipo], nivel=etiqueta, tipo=tipo)
+    if metricas is None:
+        return
+    for nombre, valor in parcial.items():
+        if nombre.endswith("_tokens"):
+            metricas[nombre] = metricas.get(nombre, 0) + valor
+            metricas[f"{nombre}@{modelo}"] = metricas.get(f"{nombre}@{modelo}", 0) + valor
+        elif nombre in ("segundos_total", "llamadas_fragmentos"):
+            metricas[nombre] = metricas.get(nombre, 0) + valor
+        else:
+            metricas.setdefault(nombre, valor)  # primer token, primer campo, prompt: los de la primera llamada
+    metricas[f"segundos_nivel_{etiqueta}"] = metricas.get(f"segundos_nivel_{etiqueta}", 0.0) + segundos
+
+
+def resumen_niveles():
+    """Documentos por nivel inicial, tasa de escalado y tokens por nivel, para ajustar los umbrales"""
+    metricas = registro()
+    resumen = {}
+    for etiqueta in NIVELES.values():
+        documentos = metricas.contador("documentos_nivel", nivel=etiqueta)
+        escalados = metricas.contador("escalados", nivel=etiqueta)
+        resumen[etiqueta] = {
+            "documentos": documentos,
+            "escalados": escalados,
+            "tasa_escalado": escalados / documentos if documentos else 0.0,
+            "escalados_documento": metricas.contador("escalados_documento", nivel=etiqueta),
+            "campos_escalados": metricas.contador("campos_escalados", nivel=etiqueta),
+            "reintentos": metricas.contador("reintentos", nivel=etiqueta),
+            "tokens": {tipo: metricas.contador("tokens_nivel", nivel=etiqueta, tipo=tipo) for tipo in TIPOS_TOKEN},
+        }
+    return resumen
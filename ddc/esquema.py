@@ -0,0 +1,91 @@
+import re
+
+# ============================================
+# ESQUEMA DE LOS 18 CAMPOS
+# ============================================
+# Única definición de los campos: el prompt, la herramienta de salida estructurada,
+# el validador y las exportaciones se construyen a partir de aquí.
+
+# Campos que devuelve el modelo, en el orden del prompt, con su descripción para el esquema
+DESCRIPCIONES = {
+    "Área": "Área curricular (por ejemplo, Matemática, Comunicación)",
+    "Ciclo": "Ciclo y nivel educativo tal como aparece en el PDF (debe indicar Primaria o Secundaria)",
+    "Grado": "Grado o grados a los que va dirigido",
+    "Descripción": "Descripción del recurso educativo",
+    "Competencia": "Competencia curricular",
+    "Capacidad": "Capacidad o capacidades",
+    "Desempeño": "Desempeño o desempeños",
+    "Orientación de uso": "Texto en formato MARKDOWN con **subsecciones** y - viñetas",
+    "Tipo de recurso": "Tipo de recurso (video, PDF, audio...)",
+    "Tipo de actividad": "Tipo de actividad",
+    "Idioma": "Idioma del recurso",
+    "Etiquetas": "Palabras clave separadas por comas",
+    "Duración": "Duración del recurso en formato mm:ss o hh:mm:ss (cadena vacía si no aparece en el PDF)",
+    "URL": "Enlace http(s) al recurso (cadena vacía si no aparece en el PDF)",
+    "Autor": "Autor del recurso (cadena vacía si no aparece en el PDF)",
+    "Proveedor": "Proveedor del recurso",
+    "Publicador": "Publicador del recurso",
+    "Licencia": "Licencia del recurso (cadena vacía si no aparece en el PDF)",
+}
+CAMPOS = list(DESCRIPCIONES)
+
+# Datos que muchos recursos no traen: vacíos significan "no aparece en el PDF", no un fallo del modelo
+OPCIONALES = ("Duración", "URL", "Autor", "Licencia")
+
+NOMBRE_HERRAMIENTA = "registrar_campos"
+
+DURACION_RE = re.compile(r"^(\d{1,2}[:.]\d{2}([:.]\d{2})?|\d+\s*(min(utos)?|h(oras?)?|seg(undos)?)\.?)$", re.IGNORECASE)
+URL_RE = re.compile(r"^https?://[^\s/$.?#][^\s]*$", re.IGNORECASE)
+VALORES_DE_RELLENO = {"valor extraído", "no encontrado", "n/a", "-"}
+VACIO = "vacío"  # motivo de un obligatorio sin valor; los demás motivos son fallos de forma
+
+
+def construir_herramienta():
+    """Herramienta con la que el modelo devuelve los campos (siempre la misma, para no romper la caché de prompt)"""
+    return {
+        "name": NOMBRE_HERRAMIENTA,
+        "description": "Registra los campos extraídos del PDF. Usa cadena vacía para los campos que no se pidan o no aparezcan.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                campo: {"type": "string", "description": descripcion}
+                for campo, descripcion in DESCRIPCIONES.items()
+            },
+            "required": CAMPOS,
+        },
+    }
+
+
+def validar_campos(fields, campos=None):
+    """Revisa los campos indicados (por defecto, todos) y devuelve {campo: motivo} de los no válidos.
+
+    Un opcional vacío es la respuesta "no aparece en el PDF" y es válido; de los demás valores solo se
+    revisa la forma.
+    """
+    invalidos = {}
+    for campo in campos or CAMPOS:
+        valor = fields.get(campo)
+        if not isinstance(valor, str):
+            invalidos[campo] = "falta o no es texto"
+            continue
+        valor = valor.strip()
+        if not valor and campo in OPCIONALES:
+            continue
+        if not valor:
+            invalidos[campo] = VACIO
+        elif valor.lower() in VALORES_DE_RELLENO:
+            invalidos[campo] = "valor de relleno en lugar de cadena vacía" if campo in OPCIONALES else VACIO
+        elif campo == "URL" and not URL_RE.match(valor):
+            invalidos[campo] = "no es una URL http(s)"
+        elif campo == "Duración" and not DURACION_RE.match(valor):
+            invalidos[campo] = "no tiene formato mm:ss o hh:mm:ss"
+    return invalidos
+
+
+def errores_de_forma(invalidos):
+    """{campo: motivo} de los inválidos que tenían un valor con mala forma (no los obligatorios vacíos), o None.
+
+    Son los que se piden como corrección; un obligatorio vacío se vuelve a pedir sin más, porque no hay
+    valor anterior que corregir.
+    """
+    return {campo: motivo for campo, motivo in invalidos.items() if motivo != VACIO} or None
@@ -0,0 +1,426 @@
+import atexit
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from ddc import lectores
+from ddc.cliente import get_client
+from ddc.esquema import CAMPOS, NOMBRE_HERRAMIENTA, OPCIONALES, construir_herramienta
+from ddc.metricas import medir, registro
+from ddc.stream_json import ParserJSONIncremental
+
+# ============================================
+# MODELO Y VERSIÓN DEL PROMPT
+# ============================================
+# Cambia PROMPT_VERSION cada vez que se modifique el prompt: invalida la caché de extracciones
+MODEL_NAME = "claude-sonnet-4-20250514"
+PROMPT_VERSION = "v5"
+MAX_TOKENS = 4096
+
+
+class ExtractionError(Exception):
+    """La respuesta de la API no se pudo convertir en campos"""
+
+    def __init__(self, mensaje, respuesta=""):
+        super().__init__(mensaje)
+        self.respuesta = respuesta
+
+
+# ============================================
+# LECTURA DEL PDF
+# ============================================
+# El texto de cada página lo saca el lector elegido en ddc.lectores (PyPDF2 por defecto), en un proceso
+# trabajador con tiempo límite por página y respaldo con otro lector.
+# A partir de este número de páginas se reparte el parseo entre procesos
+UMBRAL_PAGINAS_PARALELO = 40
+PAGINAS_POR_TAREA = 8
+
+# Secciones que necesita el prompt: con el corte temprano, una vez vistas todas
+# se leen PAGINAS_MARGEN páginas más y se descarta el resto (anexos, bibliografía...)
+SECCIONES_REQUERIDAS = [
+    re.compile(r"competencia", re.IGNORECASE),
+    re.compile(r"capacidad", re.IGNORECASE),
+    re.compile(r"desempe[ñn]o", re.IGNORECASE),
+    re.compile(r"orientaci[oó]n", re.IGNORECASE),
+]
+PAGINAS_MARGEN = 1
+ANEXO_RE = re.compile(r"^\s*(ANEXOS?|Anexos?|REFERENCIAS|Referencias|BIBLIOGRAF[IÍ]A|Bibliograf[ií]a)\b")
+
+_pool_paginas = None
+
+def _get_pool_paginas():
+    """Pool compartido para el parseo por páginas (se crea al primer uso).
+
+    Con vigilante, cada bloque ya se lee en un proceso trabajador y basta con hilos que esperen sus
+    resultados; sin vigilante (DDC_TIMEOUT_PAGINA=0), el pool es de procesos.
+    """
+    global _pool_paginas
+    if _pool_paginas is None:
+        if lectores.TIMEOUT_PAGINA > 0:
+            _pool_paginas = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="ddc-paginas")
+        else:
+            _pool_paginas = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_pool_paginas.shutdown, cancel_futures=True)
+    return _pool_paginas
+
+def contar_paginas(pdf_file, lector=lectores.LECTOR_REFERENCIA):
+    return lectores.contar_paginas(pdf_file, lector)
+
+def iter_page_texts(pdf_file, inicio=0, fin=None, lector=None, informe=None):
+    """Genera el texto de cada página en orden, sin acumularlo ni conservar las páginas ya parseadas"""
+    return lectores.iter_paginas(pdf_file, inicio, fin, lector=lector, informe=informe)
+
+def _extraer_rango(pdf_file, inicio, fin, lector):
+    """(textos, informe) de las páginas [inicio, fin) (se ejecuta en un hilo o un proceso del pool)"""
+    informe = {}
+    return list(iter_page_texts(pdf_file, inicio, fin, lector=lector, informe=informe)), informe
+
+def _iter_page_texts_paralelo(pdf_file, num_paginas, lector, informe):
+    """Como iter_page_texts, repartiendo bloques de páginas entre procesos y entregándolos en orden.
+
+    Con una ruta, cada proceso abre el archivo por su cuenta en lugar de recibir una copia de los bytes.
+    """
+    pool = _get_pool_paginas()
+    futuros = [
+        pool.submit(_extraer_rango, pdf_file, inicio, inicio + PAGINAS_POR_TAREA, lector)
+        for inicio in range(0, num_paginas, PAGINAS_POR_TAREA)
+    ]
+    try:
+        for futuro in futuros:
+            textos, parcial = futuro.result()
+            lectores.sumar_informes(informe, parcial)
+            yield from textos
+    finally:
+        # Si el consumidor corta antes (corte temprano), no se parsean los bloques pendientes
+        for futuro in futuros:
+            futuro.cancel()
+
+def _cortar_tras_secciones(paginas):
+    """Deja de consumir páginas cuando ya se vieron todas las secciones requeridas"""
+    pendientes = list(SECCIONES_REQUERIDAS)
+    margen = None
+    for texto in paginas:
+        if margen is not None:
+            if margen == 0 or ANEXO_RE.match(texto):
+                return
+            margen -= 1
+        yield texto
+        pendientes = [patron for patron in pendientes if not patron.search(texto)]
+        if not pendientes and margen is None:
+            margen = PAGINAS_MARGEN
+
+def extract_pages_from_pdf(pdf_file, paralelo=None, corte_temprano=False, lector=None, informe=None):
+    """Devuelve la lista con el texto de cada página.
+
+    pdf_file: ruta (preferible: se lee mapeada en memoria), bytes o archivo abierto.
+    paralelo=None decide según el número de páginas (UMBRAL_PAGINAS_PARALELO), solo si hay más de un núcleo.
+    corte_temprano=True deja de parsear cuando ya aparecieron las secciones del prompt.
+    lector: uno de ddc.lectores.LECTORES (por defecto, el elegido). informe: dict opcional que se rellena
+    con el lector usado, los milisegundos por lector y las páginas que fallaron.
+    """
+    informe = {} if informe is None else informe
+    with medir("parseo_pdf"):
+        # Los trabajadores reciben la ruta o, si no la hay, los bytes
+        if not lectores.es_ruta(pdf_file):
+            pdf_file = lectores.leer_bytes(pdf_file)
+        lector = lector or lectores.lector_elegido()
+        if paralelo is None and (os.cpu_count() or 1) < 2:
+            # Con un solo núcleo los bloques no se solapan: repartirlos solo añade procesos y copias
+            paralelo = False
+        if paralelo is None or paralelo:
+            num_paginas = contar_paginas(pdf_file, lector)
+            if paralelo is None:
+                paralelo = num_paginas >= UMBRAL_PAGINAS_PARALELO
+        
+        if paralelo:
+            informe["lector"] = lector
+            origen = _iter_page_texts_paralelo(pdf_file, num_paginas, lector, informe)
+        else:
+            origen = iter_page_texts(pdf_file, lector=lector, informe=informe)
+        
+        paginas = _cortar_tras_secciones(origen) if corte_temprano else origen
+        
+        try:
+            return list(paginas)
+        finally:
+            origen.close()
+
+def extract_text_from_pdf(pdf_file, paralelo=None, corte_temprano=False, lector=None, informe=None):
+    """Extrae todo el texto del PDF"""
+    return "".join(extract_pages_from_pdf(pdf_file, paralelo=paralelo, corte_temprano=corte_temprano,
+                                          lector=lector, informe=informe))
+
+def extract_title_from_filename(filename):
+    """Extrae el título del nombre del archivo PDF"""
+    name_without_ext = filename.replace('.pdf', '').replace('.PDF', '')
+    
+    if ' - ' in name_without_ext:
+        title = name_without_ext.split(' - ')[0].strip()
+    else:
+        title = name_without_ext.strip()
+    
+    title = title.replace('(¿)', '¿').replace('(?)', '?')
+    title = title.replace('(¡)', '¡').replace('(!)', '!')
+    
+    return title
+
+def clean_nivel(ciclo_text):
+    """Limpia el campo Nivel para mostrar solo Primaria o Secundaria"""
+    if not ciclo_text:
+        return "No encontrado"
+    
+    if "Primaria" in ciclo_text or "primaria" in ciclo_text:
+        return "Primaria"
+    elif "Secundaria" in ciclo_text or "secundaria" in ciclo_text:
+        return "Secundaria"
+    else:
+        return ciclo_text
+
+def limpiar_orientacion(texto):
+    """Elimina el texto introductorio estándar de Orientación de uso"""
+    if not texto:
+        return texto
+    
+    # Texto a eliminar
+    intro = "Estimado/a docente, usted es libre de utilizar este recurso educativo en los procesos pedagógicos y/o didácticos que usted considere pertinente, o siguiendo la siguiente propuesta:"
+    
+    # Si el texto comienza con la intro, eliminarlo
+    if texto.strip().startswith(intro):
+        texto_limpio = texto.replace(intro, "", 1).strip()
+        return texto_limpio
+    
+    return texto
+
+def construir_registro(nombre_archivo, fields):
+    """Registro plano de una extracción con las mismas limpiezas que la interfaz"""
+    registro = {
+        "Título": extract_title_from_filename(os.path.basename(nombre_archivo)),
+        "Nivel": clean_nivel(fields.get("Ciclo", "")),
+    }
+    for campo in CAMPOS:
+        registro[campo] = fields.get(campo, "")
+    registro["Orientación de uso"] = limpiar_orientacion(registro["Orientación de uso"])
+    return registro
+
+# ============================================
+# PROMPT
+# ============================================
+# Las instrucciones son idénticas en todas las llamadas y van en un bloque de sistema
+# cacheado (prompt caching); el texto del PDF va en el turno del usuario.
+PROMPT_CABECERA = """Analiza el texto de un PDF educativo que recibirás en el mensaje del usuario y extrae EXACTAMENTE estos campos:
+
+CAMPOS A EXTRAER:
+{lista_campos}
+
+REGLAS IMPORTANTES:
+- IGNORA completamente el texto que dice: "PIP Mejoramiento de las oportunidades..."
+- IGNORA números de código como "18107"
+- Si {opcionales} no aparecen en el texto, déjalos como cadena vacía: no los inventes ni escribas "No encontrado"
+
+"""
+
+PROMPT_ORIENTACION = """FORMATO ESPECIAL PARA "Orientación de uso":
+Debes convertirlo a formato MARKDOWN con esta estructura:
+
+**Subsección principal**
+
+- Primer punto de lista
+- Segundo punto de lista
+  - Subpunto (con indentación de 2 espacios)
+  - Otro subpunto
+
+EJEMPLO de "Orientación de uso" en Markdown:
+"Estimado/a docente, usted es libre de utilizar este recurso educativo en los procesos pedagógicos y/o didácticos que usted considere pertinente, o siguiendo la siguiente propuesta:
+
+**Familiarización con el problema**
+
+- Presentar la siguiente situación problemática: "El carpintero..."
+- Plantear las siguientes preguntas para inducir el razonamiento y la acción:
+  - ¿Cuál es la suma fija de los ángulos internos de cualquier triángulo?
+  - ¿Qué pasa con los ángulos y lados de un triángulo si este es equilátero?
+
+**Búsqueda y ejecución de estrategias**
+
+- Visualizar el video: "Analizamos las propiedades..."
+- Usar el problema de la ventana..."
+
+"""
+
+PROMPT_RESPUESTA = """FORMATO DE RESPUESTA:
+Registra los campos con la herramienta {herramienta}: un texto por campo, con esta forma:
+{{
+{esqueleto}
+}}
+"""
+
+PROMPT_SUBCONJUNTO = """En esta petición extrae SOLO estos campos (los demás ya se conocen; déjalos como cadena vacía):
+{lista_campos}
+
+"""
+
+PROMPT_CORRECCIONES = """Los valores anteriores de estos campos no fueron válidos; vuelve a extraerlos del texto:
+{lista_motivos}
+
+"""
+
+PROMPT_USUARIO = """{subconjunto}{correcciones}TEXTO DEL PDF:
+{pdf_text}
+"""
+
+VALOR_EJEMPLO = {
+    "Orientación de uso": "texto en formato MARKDOWN con **subsecciones** y - viñetas",
+}
+
+def build_system_prompt():
+    """Instrucciones fijas de extracción: lista de campos, reglas, ejemplo de Orientación y esqueleto JSON"""
+    lista_campos = "\n".join(f"{i}. {campo}" for i, campo in enumerate(CAMPOS, 1))
+    esqueleto = ",\n".join(
+        f'    "{campo}": "{VALOR_EJEMPLO.get(campo, "valor extraído")}"' for campo in CAMPOS
+    )
+    return (
+        PROMPT_CABECERA.format(lista_campos=lista_campos, opcionales=", ".join(OPCIONALES))
+        + PROMPT_ORIENTACION
+        + PROMPT_RESPUESTA.format(herramienta=NOMBRE_HERRAMIENTA, esqueleto=esqueleto)
+    )
+
+SYSTEM_PROMPT = build_system_prompt()
+
+def build_user_prompt(pdf_text, campos=None, correcciones=None):
+    """Turno del usuario: el texto del PDF y, si se pide un subconjunto, la lista de campos.
+
+    correcciones: {campo: motivo} de un intento anterior, para pedir solo esos campos otra vez.
+    """
+    subconjunto = ""
+    if campos and list(campos) != CAMPOS:
+        subconjunto = PROMPT_SUBCONJUNTO.format(lista_campos="\n".join(f"- {campo}" for campo in campos))
+    texto_correcciones = ""
+    if correcciones:
+        texto_correcciones = PROMPT_CORRECCIONES.format(
+            lista_motivos="\n".join(f"- {campo}: {motivo}" for campo, motivo in correcciones.items())
+        )
+    return PROMPT_USUARIO.format(subconjunto=subconjunto, correcciones=texto_correcciones, pdf_text=pdf_text)
+
+HERRAMIENTA = construir_herramienta()
+
+def build_request(pdf_text, campos=None, model=MODEL_NAME, max_tokens=MAX_TOKENS, correcciones=None):
+    """Parámetros de messages.create: salida forzada por la herramienta del esquema y bloque de sistema cacheado"""
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "tools": [HERRAMIENTA],
+        "tool_choice": {"type": "tool", "name": NOMBRE_HERRAMIENTA},
+        "system": [
+            {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+        ],
+        "messages": [{"role": "user", "content": build_user_prompt(pdf_text, campos, correcciones)}],
+    }
+
+def registrar_uso(usage, metricas):
+    """Copia los contadores de tokens de la respuesta (incluida la caché de prompt) en `metricas`"""
+    if metricas is None or usage is None:
+        return
+    for nombre in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+        metricas[nombre] = metricas.get(nombre, 0) + (getattr(usage, nombre, None) or 0)
+
+def parse_fields_response(response_text):
+    """Convierte la respuesta del modelo en el diccionario de campos"""
+    response_text = response_text.strip()
+    
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+    
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        raise ExtractionError(f"Error al parsear JSON: {e}", response_text) from e
+
+def campos_de_respuesta(message):
+    """Campos de la llamada a la herramienta del esquema; si el modelo respondió con texto, se parsea el JSON"""
+    for bloque in message.content:
+        if bloque.type == "tool_use" and bloque.name == NOMBRE_HERRAMIENTA:
+            if not isinstance(bloque.input, dict):
+                raise ExtractionError("La herramienta no devolvió un objeto", json.dumps(bloque.input, ensure_ascii=False))
+            return dict(bloque.input)
+    texto = "".join(bloque.text for bloque in message.content if bloque.type == "text")
+    return parse_fields_response(texto)
+
+def _fragmento_de_evento(event):
+    """Texto o JSON parcial que trae un evento del flujo (None si el evento no trae contenido)"""
+    if event.type != "content_block_delta":
+        return None
+    if event.delta.type == "text_delta":
+        return event.delta.text
+    if event.delta.type == "input_json_delta":
+        return event.delta.partial_json
+    return None
+
+def extract_fields_with_ai(pdf_text, api_key, campos=None, metricas=None, client=None, al_recibir_campo=None,
+                           correcciones=None, modelo=MODEL_NAME):
+    """Extrae todos los campos (o solo `campos`) usando Claude API.
+
+    metricas: dict opcional donde se acumulan los tokens usados (entrada, salida y caché de prompt)
+    y los tiempos (construcción del prompt, primer token, primer campo y total, en segundos).
+    client: cliente anthropic.Anthropic ya creado (por defecto, el cliente compartido del proceso;
+    puede apuntar a un servidor simulado).
+    al_recibir_campo(campo, valor): si se indica, la respuesta se pide en streaming y se llama
+    por cada campo en cuanto su valor se cierra en el flujo.
+    correcciones: {campo: motivo} para volver a pedir campos que no pasaron la validación.
+    modelo: modelo de la llamada (ver ddc.enrutador).
+    """
+    if client is None:
+        client = get_client(api_key)
+    
+    with medir("prompt", metricas):
+        request = build_request(pdf_text, campos, model=modelo, correcciones=correcciones)
+    inicio = time.perf_counter()
+    if al_recibir_campo is None:
+        message = client.messages.create(**request)
+    else:
+        message = _stream_fields(client, request, al_recibir_campo, metricas, inicio)
+    _registrar_tiempo_api(time.perf_counter() - inicio, metricas)
+    registrar_uso(message.usage, metricas)
+    
+    return campos_de_respuesta(message)
+
+def _stream_fields(client, request, al_recibir_campo, metricas, inicio):
+    """Consume la respuesta en streaming entregando cada campo al cerrarse; devuelve el mensaje final"""
+    parser = ParserJSONIncremental()
+    tiempos = {}
+    with client.messages.stream(**request) as stream:
+        for event in stream:
+            fragmento = _fragmento_de_evento(event)
+            if not fragmento:
+                continue
+            tiempos.setdefault("segundos_primer_token", time.perf_counter() - inicio)
+            for campo, valor in parser.feed(fragmento):
+                tiempos.setdefault("segundos_primer_campo", time.perf_counter() - inicio)
+                al_recibir_campo(campo, valor)
+        message = stream.get_final_message()
+    if "segundos_primer_token" in tiempos:
+        registro().observar("api_primer_token", tiempos["segundos_primer_token"])
+    if metricas is not None:
+        metricas.update(tiempos)
+    return message
+
+def _registrar_tiempo_api(segundos, metricas):
+    """Observa la latencia de la llamada y la suma al total del documento (puede haber un reintento)"""
+    registro().observar("api", segundos)
+    if metricas is not None:
+        metricas["segundos_total"] = metricas.get("segundos_total", 0.0) + segundos
+
+async def extract_fields_with_ai_async(pdf_text, client, campos=None, metricas=None, correcciones=None,
+                                      modelo=MODEL_NAME):
+    """Igual que extract_fields_with_ai, con un cliente anthropic.AsyncAnthropic compartido"""
+    with medir("prompt", metricas):
+        request = build_request(pdf_text, campos, model=modelo, correcciones=correcciones)
+    inicio = time.perf_counter()
+    message = await client.messages.create(**request)
+    _registrar_tiempo_api(time.perf_counter() - inicio, metricas)
+    registrar_uso(message.usage, metricas)
+    
+    return campos_de_respuesta(message)
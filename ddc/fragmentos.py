@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ddc.esquema import CAMPOS, validar_campos
+from ddc.extractor import MODEL_NAME, ExtractionError, extract_fields_with_ai, extract_fields_with_ai_async
+from ddc.reduccion import SECCION_RELEVANTE
+
+# ============================================
+# EXTRACCIÓN POR FRAGMENTOS (MAP-REDUCE) PARA PDF MUY LARGOS
+# ============================================
+# El texto se corta por secciones en fragmentos de tamaño acotado; a cada campo se le asignan los
+# fragmentos más relevantes y se hace una llamada por fragmento (en paralelo) con solo esos campos.
+# Como todos los fragmentos tienen un tamaño máximo, la latencia no crece con el largo del documento.
+
+UMBRAL_FRAGMENTOS = 60_000       # caracteres del texto reducido a partir de los que se fragmenta (~17k tokens)
+MAX_CARACTERES_FRAGMENTO = 24_000
+MIN_CARACTERES_FRAGMENTO = 4_000  # no se abre un fragmento nuevo en un encabezado si el actual es más corto
+FRAGMENTOS_POR_CAMPO = 2         # el segundo solo si puntúa al menos la mitad que el mejor
+MAX_LLAMADAS_SIMULTANEAS = 8
+PESO_ENCABEZADO = 5
+MAX_COINCIDENCIAS = 10           # por campo y fragmento, para que un anexo repetitivo no gane por volumen
+
+# Pistas de relevancia de cada campo en el texto
+PISTAS = {
+    "Área": r"\b(área|matemática|comunicación|ciencia y tecnología|personal social|arte y cultura|educación física|inglés)\b",
+    "Ciclo": r"\b(ciclo|primaria|secundaria|nivel)\b",
+    "Grado": r"\bgrados?\b|\d\s*[°º]",
+    "Descripción": r"\b(descripci[óo]n|presenta|prop[óo]sito)\b",
+    "Competencia": r"\bcompetencias?\b",
+    "Capacidad": r"\bcapacidad(es)?\b",
+    "Desempeño": r"\bdesempeños?\b",
+    "Orientación de uso": r"\b(orientaci[óo]n|propuesta|momentos?|secuencia did[áa]ctica|docente)\b",
+    "Tipo de recurso": r"\b(video|audio|pdf|infograf[íi]a|ficha|podcast)\b",
+    "Tipo de actividad": r"\b(actividad(es)?|observa|escucha|lee|reflexiona)\b",
+    "Idioma": r"\b(idioma|lengua|español|quechua|aimara)\b",
+    "Etiquetas": r"\b(etiquetas|palabras clave)\b",
+    "Duración": r"\bduraci[óo]n\b|\b\d{1,2}:\d{2}\b|\bminutos\b",
+    "URL": r"https?://|\burl\b|\benlace\b",
+    "Autor": r"\bautor(es|a)?\b",
+    "Proveedor": r"\bproveedor\b",
+    "Publicador": r"\b(publicador|editorial)\b",
+    "Licencia": r"\b(licencia|creative commons|dominio p[úu]blico)\b",
+}
+PATRONES_PISTA = {campo: re.compile(pista, re.IGNORECASE) for campo, pista in PISTAS.items()}
+
+# Campos de ficha técnica: suelen estar al principio, así que el primer fragmento tiene un punto extra
+CAMPOS_DE_PORTADA = {
+    "Área", "Ciclo", "Grado", "Descripción", "Tipo de recurso", "Idioma", "Etiquetas",
+    "Duración", "URL", "Autor", "Proveedor", "Publicador", "Licencia",
+}
+
+
+def usar_fragmentos(texto):
+    """El modo por fragmentos se activa solo con textos que no caben cómodamente en una llamada"""
+    return len(texto) > UMBRAL_FRAGMENTOS
+
+
+def dividir_en_fragmentos(texto, max_caracteres=MAX_CARACTERES_FRAGMENTO, min_caracteres=MIN_CARACTERES_FRAGMENTO):
+    """Corta el texto en fragmentos de como máximo max_caracteres, preferentemente en encabezados de sección"""
+    fragmentos = []
+    actual = []
+    largo = 0
+    for linea in texto.splitlines(keepends=True):
+        encabezado = SECCION_RELEVANTE.match(linea.strip()) is not None
+        if actual and (largo + len(linea) > max_caracteres or (encabezado and largo >= min_caracteres)):
+            fragmentos.append("".join(actual))
+            actual, largo = [], 0
+        # Una línea más larga que el máximo se parte sin mirar palabras
+        while len(linea) > max_caracteres:
+            fragmentos.append(linea[:max_caracteres])
+            linea = linea[max_caracteres:]
+        actual.append(linea)
+        largo += len(linea)
+    if actual:
+        fragmentos.append("".join(actual))
+    return fragmentos
+
+
+def puntuar(fragmento, indice):
+    """Relevancia del fragmento para cada campo: coincidencias de sus pistas, con más peso en encabezados"""
+    puntajes = {}
+    encabezados = [linea for linea in fragmento.splitlines() if SECCION_RELEVANTE.match(linea.strip())]
+    for campo, patron in PATRONES_PISTA.items():
+        puntaje = min(len(patron.findall(fragmento)), MAX_COINCIDENCIAS)
+        puntaje += PESO_ENCABEZADO * sum(1 for linea in encabezados if patron.match(linea.strip()))
+        if indice == 0 and campo in CAMPOS_DE_PORTADA:
+            puntaje += 1
+        puntajes[campo] = puntaje
+    return puntajes
+
+
+def planificar(fragmentos, campos):
+    """Asigna a cada campo sus fragmentos más relevantes: devuelve ({indice: [campos]}, puntajes por fragmento)"""
+    puntajes = [puntuar(fragmento, indice) for indice, fragmento in enumerate(fragmentos)]
+    plan = {}
+    for campo in campos:
+        # Orden estable: mayor puntaje y, a igualdad, el fragmento anterior
+        orden = sorted(range(len(fragmentos)), key=lambda i: (-puntajes[i][campo], i))
+        mejor = puntajes[orden[0]][campo]
+        elegidos = [orden[0]]
+        for indice in orden[1:FRAGMENTOS_POR_CAMPO]:
+            if mejor and puntajes[indice][campo] * 2 >= mejor:
+                elegidos.append(indice)
+        for indice in elegidos:
+            plan.setdefault(indice, []).append(campo)
+    return dict(sorted(plan.items())), puntajes
+
+
+def combinar_respuestas(respuestas, campos, puntajes, detalle=None):
+    """Une las respuestas por fragmento de forma determinista.
+
+    Por campo gana el valor válido del fragmento con mayor puntaje para ese campo; a igualdad, el del
+    fragmento anterior. Un opcional vacío es válido, pero solo gana si ningún fragmento lo encontró.
+    Los valores distintos que pierden se anotan en detalle["conflictos"].
+    """
+    fields = {}
+    for campo in campos:
+        candidatos = [
+            (not validar_campos({campo: valores.get(campo)}, [campo]), bool((valores.get(campo) or "").strip()),
+             puntajes[indice][campo], -indice, valores.get(campo) or "")
+            for indice, valores in sorted(respuestas.items()) if campo in valores
+        ]
+        if not candidatos:
+            fields[campo] = ""
+            continue
+        candidatos.sort(reverse=True)
+        fields[campo] = candidatos[0][-1]
+        distintos = sorted({candidato[-1].strip() for candidato in candidatos if candidato[-1].strip()})
+        if detalle is not None and len(distintos) > 1:
+            detalle.setdefault("conflictos", {})[campo] = {"elegido": fields[campo], "descartados": [
+                valor for valor in distintos if valor != fields[campo].strip()
+            ]}
+    return fields
+
+
+def _sumar_uso(metricas, parciales, segundos):
+    """Suma los contadores de cada llamada; el tiempo es el de reloj de todo el map-reduce"""
+    if metricas is None:
+        return
+    for parcial in parciales:
+        for nombre, valor in parcial.items():
+            if nombre.endswith("_tokens"):
+                metricas[nombre] = metricas.get(nombre, 0) + valor
+    metricas["segundos_total"] = metricas.get("segundos_total", 0.0) + segundos
+    metricas["llamadas_fragmentos"] = metricas.get("llamadas_fragmentos", 0) + len(parciales)
+
+
+def _anotar_plan(detalle, fragmentos, plan):
+    if detalle is not None:
+        detalle["fragmentos"] = len(fragmentos)
+        detalle["caracteres_por_fragmento"] = [len(fragmento) for fragmento in fragmentos]
+        detalle["plan"] = {f"fragmento {indice + 1}": campos for indice, campos in plan.items()}
+
+
+def _recoger(resultados, plan):
+    """Respuestas de cada fragmento limitadas a sus campos; si fallaron todas las llamadas, se relanza el primer error"""
+    respuestas = {
+        indice: {campo: valores.get(campo, "") for campo in plan[indice]}
+        for indice, valores in resultados.items() if not isinstance(valores, Exception)
+    }
+    if not respuestas and resultados:
+        raise next(iter(resultados.values()))
+    return respuestas
+
+
+def extraer_por_fragmentos(pdf_text, api_key, campos=None, metricas=None, client=None, correcciones=None,
+                           detalle=None, modelo=MODEL_NAME):
+    """Extrae `campos` (por defecto, todos) con una llamada concurrente por fragmento relevante.
+
+    detalle: dict opcional donde se describen el plan y los conflictos resueltos al combinar.
+    """
+    campos = list(campos or CAMPOS)
+    fragmentos = dividir_en_fragmentos(pdf_text)
+    plan, puntajes = planificar(fragmentos, campos)
+    _anotar_plan(detalle, fragmentos, plan)
+    parciales = {indice: {} for indice in plan}
+
+    def llamar(indice):
+        try:
+            return extract_fields_with_ai(
+                fragmentos[indice], api_key, plan[indice], metricas=parciales[indice], client=client,
+                correcciones={c: m for c, m in (correcciones or {}).items() if c in plan[indice]} or None,
+                modelo=modelo
+            )
+        except ExtractionError as e:
+            return e
+
+    # Los hilos del pool no heredan el contexto (prioridad y sesión para ddc.gobernador): se copia
+    contexto = contextvars.copy_context()
+
+    def llamar_en_contexto(indice):
+        return contexto.copy().run(llamar, indice)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(MAX_LLAMADAS_SIMULTANEAS, len(plan))) as pool:
+        resultados = dict(zip(plan, pool.map(llamar_en_contexto, plan)))
+    _sumar_uso(metricas, parciales.values(), time.perf_counter() - inicio)
+    return combinar_respuestas(_recoger(resultados, plan), campos, puntajes, detalle)
+
+
+async def extraer_por_fragmentos_async(pdf_text, client, campos=None, metricas=None, correcciones=None,
+                                       detalle=None, modelo=MODEL_NAME):
+    """Versión asíncrona de extraer_por_fragmentos con un cliente AsyncAnthropic compartido"""
+    campos = list(campos or CAMPOS)
+    fragmentos = dividir_en_fragmentos(pdf_text)
+    plan, puntajes = planificar(fragmentos, campos)
+    _anotar_plan(detalle, fragmentos, plan)
+    parciales = {indice: {} for indice in plan}
+    semaforo = asyncio.Semaphore(MAX_LLAMADAS_SIMULTANEAS)
+
+    async def llamar(indice):
+        async with semaforo:
+            try:
+                return await extract_fields_with_ai_async(
+                    fragmentos[indice], client, plan[indice], metricas=parciales[indice],
+                    correcciones={c: m for c, m in (correcciones or {}).items() if c in plan[indice]} or None,
+                    modelo=modelo
+                )
+            except ExtractionError as e:
+                return e
+
+    inicio = time.perf_counter()
+    resultados = dict(zip(plan, await asyncio.gather(*(llamar(indice) for indice in plan))))
+    _sumar_uso(metricas, parciales.values(), time.perf_counter() - inicio)
+    return combinar_respuestas(_recoger(resultados, plan), campos, puntajes, detalle)
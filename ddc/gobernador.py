@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ddc.metricas import registro
+from ddc.reduccion import estimar_tokens
+
+# ============================================
+# GOBERNADOR DE LÍMITES DE LA API (CUBETAS DE TOKENS)
+# ============================================
+# Todas las llamadas a /v1/messages del proceso pasan por aquí antes de salir: cada modelo tiene una
+# cubeta de solicitudes por minuto, otra de tokens de entrada y otra de tokens de salida. Una llamada
+# sale cuando es la primera de su cola y su modelo tiene saldo; si no, espera en lugar de recibir un 429.
+# La cola da prioridad a las llamadas interactivas sobre las de lote y, dentro de cada prioridad, al
+# cliente (sesión) atendido hace más tiempo. Las cabeceras anthropic-ratelimit-* de cada respuesta
+# corrigen los límites y el saldo, y un 429 pausa a todas las llamadas el tiempo de retry-after.
+# Cada llamada reserva SALIDA_ESTIMADA tokens de salida; al terminar se devuelve lo que no usó (el
+# usage.output_tokens de la respuesta), salvo que las cabeceras ya hayan puesto el saldo real.
+# Configuración por variables de entorno:
+#   DDC_GOBERNADOR           0 para desactivarlo (1)
+#   DDC_LIMITE_RPM           solicitudes por minuto y modelo hasta que las cabeceras digan otra cosa (50)
+#   DDC_LIMITE_ITPM          tokens de entrada por minuto y modelo (40000)
+#   DDC_LIMITE_OTPM          tokens de salida por minuto y modelo (8000)
+#   DDC_SALIDA_ESTIMADA      tokens de salida que se reservan por llamada (2000, o max_tokens si es menor)
+
+ACTIVO = os.environ.get("DDC_GOBERNADOR", "1") != "0"
+LIMITES = {
+    "solicitudes": float(os.environ.get("DDC_LIMITE_RPM", 50)),
+    "entrada": float(os.environ.get("DDC_LIMITE_ITPM", 40_000)),
+    "salida": float(os.environ.get("DDC_LIMITE_OTPM", 8_000)),
+}
+SALIDA_ESTIMADA = int(os.environ.get("DDC_SALIDA_ESTIMADA", 2000))
+SONDEO = 0.25  # segundos máximos entre comprobaciones de una llamada en espera
+
+# Sufijo de las cabeceras anthropic-ratelimit-<sufijo>-{limit,remaining} -> cubeta
+CABECERAS = {"requests": "solicitudes", "input-tokens": "entrada", "output-tokens": "salida"}
+PRIORIDADES = {"interactiva": 0, "lote": 1}
+
+_contexto = contextvars.ContextVar("ddc_gobernador", default={"cliente": "", "etiqueta": "", "prioridad": "lote"})
+
+
+@contextmanager
+def contexto_api(cliente="", etiqueta="", prioridad="lote"):
+    """Quién hace las llamadas de este bloque: cliente (sesión) para el reparto justo, etiqueta para
+    encontrarlas en la cola (p. ej. el id del trabajo) y prioridad "interactiva" o "lote"."""
+    token = _contexto.set({"cliente": cliente, "etiqueta": etiqueta, "prioridad": prioridad})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+def _textos(valor):
+    if isinstance(valor, str):
+        yield valor
+    elif isinstance(valor, dict):
+        for elemento in valor.values():
+            yield from _textos(elemento)
+    elif isinstance(valor, list):
+        for elemento in valor:
+            yield from _textos(elemento)
+
+
+def coste_solicitud(request):
+    """(modelo, {cubeta: cantidad}) de una llamada a messages, o None si no se gobierna.
+
+    La entrada se estima con el texto del system y los mensajes (el texto del PDF), sin llamar a la API.
+    """
+    if request.method != "POST" or not request.url.path.endswith("/messages"):
+        return None
+    try:
+        cuerpo = json.loads(request.content)
+    except ValueError:
+        return None
+    entrada = sum(estimar_tokens(texto) for texto in _textos([cuerpo.get("system", ""), cuerpo.get("messages", [])]))
+    salida = min(cuerpo.get("max_tokens", SALIDA_ESTIMADA), SALIDA_ESTIMADA)
+    return cuerpo.get("model", ""), {"solicitudes": 1, "entrada": entrada, "salida": salida}
+
+
+class Cubeta:
+    """Cubeta de tokens que se rellena de forma continua hasta `capacidad` por minuto"""
+
+    def __init__(self, capacidad):
+        self.capacidad = float(capacidad)
+        self.nivel = float(capacidad)
+        self.actualizado = time.monotonic()
+
+    def recargar(self, ahora):
+        self.nivel = min(self.capacidad, self.nivel + (ahora - self.actualizado) * self.capacidad / 60)
+        self.actualizado = ahora
+
+    def segundos_para(self, cantidad):
+        """Segundos hasta tener `cantidad` (lo que supera la capacidad espera a la cubeta llena)"""
+        return max(0.0, min(cantidad, self.capacidad) - self.nivel) * 60 / self.capacidad
+
+
+class Gobernador:
+    """Colas justas por modelo delante de las cubetas de solicitudes y tokens, compartidas por el proceso"""
+
+    def __init__(self, limites=None):
+        self.limites = dict(limites or LIMITES)
+        self.cubetas = {}  # modelo -> {cubeta: Cubeta}
+        self.espera = []   # llamadas esperando turno
+        self.ultimo_servicio = {}  # cliente -> instante de su última llamada admitida
+        self.pausa_hasta = 0.0
+        self.cond = threading.Condition()
+        self._orden = itertools.count()
+
+    def _cubetas(self, modelo):
+        if modelo not in self.cubetas:
+            self.cubetas[modelo] = {nombre: Cubeta(limite) for nombre, limite in self.limites.items()}
+        return self.cubetas[modelo]
+
+    def _cola(self, modelo):
+        """Llamadas de ese modelo en el orden en que saldrán: prioridad, cliente menos atendido, llegada"""
+        return sorted(
+            (ticket for ticket in self.espera if ticket["modelo"] == modelo),
+            key=lambda ticket: (PRIORIDADES.get(ticket["prioridad"], 1),
+                                self.ultimo_servicio.get(ticket["cliente"], 0.0), ticket["orden"])
+        )
+
+    def _registrar(self, modelo, coste):
+        ticket = {**_contexto.get(), "modelo": modelo, "coste": coste, "orden": next(self._orden),
+                  "llegada": time.monotonic()}
+        with self.cond:
+            self.espera.append(ticket)
+        return ticket
+
+    def _intentar(self, ticket):
+        """Admite la llamada si le toca y hay saldo (devuelve 0); si no, los segundos que conviene esperar"""
+        ahora = time.monotonic()
+        if ahora < self.pausa_hasta:
+            return self.pausa_hasta - ahora
+        if self._cola(ticket["modelo"])[0] is not ticket:
+            return SONDEO
+        cubetas = self._cubetas(ticket["modelo"])
+        for cubeta in cubetas.values():
+            cubeta.recargar(ahora)
+        espera = max(cubetas[nombre].segundos_para(cantidad) for nombre, cantidad in ticket["coste"].items())
+        if espera > 0:
+            return espera
+        for nombre, cantidad in ticket["coste"].items():
+            cubetas[nombre].nivel -= min(cantidad, cubetas[nombre].capacidad)
+        self.espera.remove(ticket)
+        self.ultimo_servicio[ticket["cliente"]] = ahora
+        self.cond.notify_all()
+        return 0.0
+
+    def _admitida(self, ticket):
+        espera = time.monotonic() - ticket["llegada"]
+        registro().observar("espera_gobernador", espera)
+        if espera >= SONDEO:
+            registro().sumar("llamadas_retenidas", prioridad=ticket["prioridad"])
+
+    def _retirar(self, ticket):
+        with self.cond:
+            if ticket in self.espera:
+                self.espera.remove(ticket)
+                self.cond.notify_all()
+
+    def adquirir(self, modelo, coste):
+        """Bloquea el hilo hasta que la llamada puede salir"""
+        ticket = self._registrar(modelo, coste)
+        try:
+            with self.cond:
+                while True:
+                    espera = self._intentar(ticket)
+                    if not espera:
+                        break
+                    self.cond.wait(min(espera, SONDEO))
+        finally:
+            self._retirar(ticket)
+        self._admitida(ticket)
+
+    async def adquirir_async(self, modelo, coste):
+        """Como adquirir, sin bloquear el bucle de eventos"""
+        ticket = self._registrar(modelo, coste)
+        try:
+            while True:
+                with self.cond:
+                    espera = self._intentar(ticket)
+                if not espera:
+                    break
+                await asyncio.sleep(min(espera, SONDEO))
+        finally:
+            self._retirar(ticket)
+        self._admitida(ticket)
+
+    def actualizar(self, modelo, cabeceras):
+        """Ajusta límites y saldo del modelo con las cabeceras anthropic-ratelimit-* de una respuesta"""
+        with self.cond:
+            cubetas = self._cubetas(modelo)
+            ahora = time.monotonic()
+            for sufijo, nombre in CABECERAS.items():
+                limite = cabeceras.get(f"anthropic-ratelimit-{sufijo}-limit")
+                restante = cabeceras.get(f"anthropic-ratelimit-{sufijo}-remaining")
+                try:
+                    if limite:
+                        cubetas[nombre].capacidad = max(float(limite), 1.0)
+                    if restante:
+                        cubetas[nombre].recargar(ahora)
+                        cubetas[nombre].nivel = min(float(restante), cubetas[nombre].capacidad)
+                except ValueError:
+                    continue
+
+    def liquidar(self, modelo, reservados, usados):
+        """Devuelve a la cubeta de salida la parte de la reserva que la llamada no usó"""
+        with self.cond:
+            cubeta = self._cubetas(modelo)["salida"]
+            cubeta.recargar(time.monotonic())
+            cubeta.nivel = min(cubeta.capacidad, cubeta.nivel + max(0.0, min(reservados, cubeta.capacidad) - usados))
+            self.cond.notify_all()
+
+    def pausar(self, segundos):
+        """Tras un 429, ninguna llamada sale durante `segundos` (el retry-after de la API)"""
+        registro().sumar("limites_api")
+        with self.cond:
+            self.pausa_hasta = max(self.pausa_hasta, time.monotonic() + segundos)
+
+    def en_espera(self, etiqueta=None):
+        """Llamadas esperando turno: [{etiqueta, cliente, prioridad, modelo, posicion, segundos_estimados}].
+
+        La estimación acumula el coste de las que van delante frente al ritmo de recarga de cada cubeta.
+        """
+        with self.cond:
+            ahora = time.monotonic()
+            pausa = max(0.0, self.pausa_hasta - ahora)
+            filas = []
+            for modelo in {ticket["modelo"] for ticket in self.espera}:
+                cubetas = self._cubetas(modelo)
+                for cubeta in cubetas.values():
+                    cubeta.recargar(ahora)
+                acumulado = dict.fromkeys(cubetas, 0.0)
+                for posicion, ticket in enumerate(self._cola(modelo), start=1):
+                    for nombre, cantidad in ticket["coste"].items():
+                        acumulado[nombre] += cantidad
+                    segundos = max(max(0.0, acumulado[nombre] - cubeta.nivel) * 60 / cubeta.capacidad
+                                   for nombre, cubeta in cubetas.items())
+                    if etiqueta is None or ticket["etiqueta"] == etiqueta:
+                        filas.append({"etiqueta": ticket["etiqueta"], "cliente": ticket["cliente"],
+                                      "prioridad": ticket["prioridad"], "modelo": modelo, "posicion": posicion,
+                                      "segundos_estimados": round(pausa + segundos, 1)})
+        return filas
+
+
+_gobernador = None
+_gobernador_lock = threading.Lock()
+
+
+def gobernador():
+    """Gobernador del proceso (se crea al primer uso), o None si está desactivado"""
+    global _gobernador
+    if not ACTIVO:
+        return None
+    with _gobernador_lock:
+        if _gobernador is None:
+            _gobernador = Gobernador()
+    return _gobernador
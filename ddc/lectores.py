@@ -0,0 +1,662 @@
+"""Lectores de texto de PDF intercambiables, con vigilante por página en un proceso aparte.
+
+Uso:
+    python -m ddc.lectores disponibles
+    python -m ddc.lectores calibrar muestra1.pdf [muestra2.pdf ...] [--guardar]
+
+Lectores: pypdf2 (por defecto, siempre disponible), pdfium (pypdfium2), pymupdf y pypdf, si están instalados.
+"calibrar" mide los disponibles con unas páginas de las muestras y elige el más rápido que saca al menos
+CALIDAD_MINIMA de las palabras del de referencia; con --guardar, la elección se guarda junto con las
+versiones de los lectores. Con DDC_LECTOR_PDF=auto se usa esa calibración mientras las versiones no
+cambien; sin ella, el de referencia. Nunca se calibra al leer un PDF: la muestra la elige quien calibra.
+
+Cada página se lee en un proceso trabajador: si tarda más de DDC_TIMEOUT_PAGINA segundos (contenido
+malformado) o el lector falla o se cae, se mata el trabajador, esa página se lee con el siguiente lector
+y el resto sigue con el elegido. Los tiempos y fallos por lector van al registro de métricas.
+
+Configuración por variables de entorno:
+    DDC_LECTOR_PDF           auto, pypdf2, pdfium, pymupdf o pypdf (auto)
+    DDC_TIMEOUT_PAGINA       segundos por página; 0 lee en el propio proceso, sin vigilante (20)
+    DDC_CALIBRACION_LECTOR   archivo con la calibración guardada (.cache/lector_pdf.json)
+"""
+import abc
+import argparse
+import atexit
+import importlib.metadata
+import importlib.util
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from ddc.metricas import registro
+
+LECTOR_PDF = os.environ.get("DDC_LECTOR_PDF", "auto")
+TIMEOUT_PAGINA = float(os.environ.get("DDC_TIMEOUT_PAGINA", 20))
+CALIBRACION_DEFAULT = os.environ.get("DDC_CALIBRACION_LECTOR", os.path.join(".cache", "lector_pdf.json"))
+LECTOR_REFERENCIA = "pypdf2"
+PAGINAS_CALIBRACION = 5
+CALIDAD_MINIMA = 0.9  # fracción de las palabras del lector de referencia
+# Cada cuántas páginas se sueltan los objetos ya resueltos por PyPDF2/pypdf (contenidos de páginas leídas)
+PAGINAS_POR_LIBERACION = 16
+MAX_VIGILANTES_LIBRES = os.cpu_count() or 2
+ESPERA_CANCELACION = 5.0  # segundos para que un trabajador deje a medias una lectura antes de matarlo
+
+PALABRA_RE = re.compile(r"\w+")
+
+
+class ErrorLectura(Exception):
+    """Ningún lector pudo abrir el PDF"""
+
+
+def es_ruta(pdf_file):
+    return isinstance(pdf_file, (str, os.PathLike))
+
+
+def leer_bytes(pdf_file):
+    """Bytes de un PDF dado como ruta, bytes o archivo abierto"""
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return pdf_file
+    if es_ruta(pdf_file):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+@contextmanager
+def _fuente(pdf_file):
+    """Objeto legible para los lectores de Python puro; la ruta se lee mapeada en memoria y se cierra al salir"""
+    if es_ruta(pdf_file):
+        with open(pdf_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield mapa
+        return
+    if isinstance(pdf_file, (bytes, bytearray)):
+        pdf_file = io.BytesIO(pdf_file)
+    yield pdf_file
+
+
+# ============================================
+# LECTORES
+# ============================================
+
+class LectorPDF(abc.ABC):
+    """Un motor de texto: abrir(pdf_file) da un documento con `paginas` y `texto(indice)`"""
+
+    nombre = ""
+    modulo = ""
+    distribucion = ""
+
+    def disponible(self):
+        return importlib.util.find_spec(self.modulo) is not None
+
+    def version(self):
+        try:
+            return importlib.metadata.version(self.distribucion)
+        except importlib.metadata.PackageNotFoundError:
+            return None
+
+    @abc.abstractmethod
+    def abrir(self, pdf_file):
+        """Context manager que da el documento abierto y lo cierra al salir"""
+
+
+class _DocumentoPyPDF:
+    def __init__(self, reader):
+        self.reader = reader
+        self.paginas = len(reader.pages)
+        self.leidas = 0
+
+    def texto(self, indice):
+        texto = self.reader.pages[indice].extract_text()
+        self.leidas += 1
+        if self.leidas % PAGINAS_POR_LIBERACION == 0:
+            # Los objetos se vuelven a leer del archivo si otra página los necesita
+            self.reader.resolved_objects.clear()
+        return texto
+
+
+class LectorPyPDF2(LectorPDF):
+    nombre = "pypdf2"
+    modulo = "PyPDF2"
+    distribucion = "PyPDF2"
+
+    @contextmanager
+    def abrir(self, pdf_file):
+        import PyPDF2
+        with _fuente(pdf_file) as fuente:
+            yield _DocumentoPyPDF(PyPDF2.PdfReader(fuente))
+
+
+class LectorPypdf(LectorPDF):
+    nombre = "pypdf"
+    modulo = "pypdf"
+    distribucion = "pypdf"
+
+    @contextmanager
+    def abrir(self, pdf_file):
+        import pypdf
+        with _fuente(pdf_file) as fuente:
+            yield _DocumentoPyPDF(pypdf.PdfReader(fuente))
+
+
+class _DocumentoPdfium:
+    def __init__(self, documento):
+        self.documento = documento
+        self.paginas = len(documento)
+
+    def texto(self, indice):
+        pagina = self.documento[indice]
+        texto_pagina = pagina.get_textpage()
+        try:
+            return texto_pagina.get_text_range().replace("\r\n", "\n")
+        finally:
+            texto_pagina.close()
+            pagina.close()
+
+
+class LectorPdfium(LectorPDF):
+    nombre = "pdfium"
+    modulo = "pypdfium2"
+    distribucion = "pypdfium2"
+
+    @contextmanager
+    def abrir(self, pdf_file):
+        import pypdfium2
+        documento = pypdfium2.PdfDocument(pdf_file if es_ruta(pdf_file) else leer_bytes(pdf_file))
+        try:
+            yield _DocumentoPdfium(documento)
+        finally:
+            documento.close()
+
+
+class _DocumentoPyMuPDF:
+    def __init__(self, documento):
+        self.documento = documento
+        self.paginas = documento.page_count
+
+    def texto(self, indice):
+        return self.documento.load_page(indice).get_text()
+
+
+class LectorPyMuPDF(LectorPDF):
+    nombre = "pymupdf"
+    modulo = "pymupdf"
+    distribucion = "PyMuPDF"
+
+    @contextmanager
+    def abrir(self, pdf_file):
+        import pymupdf
+        if es_ruta(pdf_file):
+            documento = pymupdf.open(pdf_file)
+        else:
+            documento = pymupdf.open(stream=leer_bytes(pdf_file), filetype="pdf")
+        try:
+            yield _DocumentoPyMuPDF(documento)
+        finally:
+            documento.close()
+
+
+# Orden de respaldo: el de referencia primero, después los demás instalados
+LECTORES = {lector.nombre: lector for lector in (LectorPyPDF2(), LectorPdfium(), LectorPyMuPDF(), LectorPypdf())}
+
+
+def disponibles():
+    return [nombre for nombre, lector in LECTORES.items() if lector.disponible()]
+
+
+def cadena_lectores(principal):
+    """El lector principal seguido de los demás disponibles, en el orden en que se prueban como respaldo"""
+    return [principal] + [nombre for nombre in disponibles() if nombre != principal]
+
+
+def contar_paginas(pdf_file, lector=LECTOR_REFERENCIA):
+    with LECTORES[lector].abrir(pdf_file) as documento:
+        return documento.paginas
+
+
+# ============================================
+# VIGILANTE: LECTURA EN UN PROCESO TRABAJADOR
+# ============================================
+
+def _trabajador(conexion):
+    """Bucle del proceso trabajador: lee rangos de páginas y envía cada una en cuanto la tiene.
+
+    Mensajes: ("paginas", n), ("pagina", i, texto, segundos), ("error", i, mensaje, segundos), ("fin",)
+    o ("error_apertura", mensaje). Entre páginas atiende ("cancelar",).
+    """
+    while True:
+        try:
+            orden = conexion.recv()
+        except (EOFError, OSError):
+            return
+        if orden[0] != "leer":
+            continue
+        _, nombre, pdf_file, inicio, fin = orden
+        try:
+            with LECTORES[nombre].abrir(pdf_file) as documento:
+                conexion.send(("paginas", documento.paginas))
+                fin = documento.paginas if fin is None else min(fin, documento.paginas)
+                for indice in range(inicio, fin):
+                    comienzo = time.perf_counter()
+                    try:
+                        conexion.send(("pagina", indice, documento.texto(indice), time.perf_counter() - comienzo))
+                    except Exception as e:
+                        conexion.send(("error", indice, f"{type(e).__name__}: {e}", time.perf_counter() - comienzo))
+                    if conexion.poll() and conexion.recv()[0] == "cancelar":
+                        break
+        except Exception as e:
+            conexion.send(("error_apertura", f"{type(e).__name__}: {e}"))
+            continue
+        conexion.send(("fin",))
+
+
+class Vigilante:
+    """Proceso trabajador reutilizable; se mata si una página no termina a tiempo"""
+
+    def __init__(self):
+        contexto = multiprocessing.get_context("spawn")
+        self.conexion, hija = contexto.Pipe()
+        self.proceso = contexto.Process(target=_trabajador, args=(hija,), daemon=True, name="ddc-lector-pdf")
+        self.proceso.start()
+        hija.close()
+
+    def vivo(self):
+        return self.proceso.is_alive() and not self.conexion.closed
+
+    def matar(self):
+        self.proceso.kill()
+        self.proceso.join(1)
+        self.conexion.close()
+
+    def cerrar(self):
+        self.conexion.close()  # el trabajador termina al ver el fin de la tubería
+        self.proceso.join(1)
+
+    def leer(self, nombre, pdf_file, inicio, fin, timeout):
+        """Genera los mensajes del trabajador; si algo no llega a tiempo o el trabajador se cae, lo mata y
+        termina con ("timeout", i) o ("caido", i), con i la página pendiente (None si no llegó a abrir el PDF)"""
+        self.conexion.send(("leer", nombre, pdf_file, inicio, fin))
+        pendiente = None
+        terminado = False
+        try:
+            while True:
+                try:
+                    if not self.conexion.poll(timeout):
+                        terminado = True
+                        self.matar()
+                        yield "timeout", pendiente
+                        return
+                    mensaje = self.conexion.recv()
+                except (EOFError, OSError):
+                    terminado = True
+                    self.matar()
+                    yield "caido", pendiente
+                    return
+                if mensaje[0] in ("fin", "error_apertura"):
+                    terminado = True
+                    if mensaje[0] == "error_apertura":
+                        yield mensaje
+                    return
+                pendiente = inicio if mensaje[0] == "paginas" else mensaje[1] + 1
+                yield mensaje
+        finally:
+            if not terminado:
+                self._cancelar()
+
+    def _cancelar(self):
+        """El consumidor dejó de leer a medias: se pide al trabajador que pare y se descartan sus mensajes"""
+        try:
+            self.conexion.send(("cancelar",))
+            while self.conexion.poll(ESPERA_CANCELACION):
+                if self.conexion.recv()[0] in ("fin", "error_apertura"):
+                    return
+        except (EOFError, OSError):
+            pass
+        self.matar()
+
+
+_vigilantes = []
+_vigilantes_lock = threading.Lock()
+
+
+@contextmanager
+def _vigilante():
+    """Un trabajador libre (o uno nuevo); None si este proceso no puede crear procesos hijos"""
+    with _vigilantes_lock:
+        vigilante = _vigilantes.pop() if _vigilantes else None
+    if vigilante is None or not vigilante.vivo():
+        try:
+            vigilante = Vigilante()
+        except (AssertionError, OSError):
+            vigilante = None  # p. ej. dentro de un proceso daemon
+    try:
+        yield vigilante
+    finally:
+        if vigilante is not None and vigilante.vivo():
+            with _vigilantes_lock:
+                if len(_vigilantes) < MAX_VIGILANTES_LIBRES:
+                    _vigilantes.append(vigilante)
+                    vigilante = None
+            if vigilante is not None:
+                vigilante.cerrar()
+
+
+@atexit.register
+def cerrar_vigilantes():
+    with _vigilantes_lock:
+        for vigilante in _vigilantes:
+            vigilante.cerrar()
+        _vigilantes.clear()
+
+
+# ============================================
+# LECTURA CON RESPALDO E INFORME
+# ============================================
+
+def _anotar_pagina(informe, nombre, segundos):
+    informe["paginas"] = informe.get("paginas", 0) + 1
+    por_lector = informe.setdefault("ms_por_lector", {})
+    por_lector[nombre] = round(por_lector.get(nombre, 0.0) + segundos * 1000, 3)
+    registro().observar(f"pagina_pdf_{nombre}", segundos)
+    registro().sumar("paginas_pdf", lector=nombre)
+
+
+def _anotar_fallo(informe, nombre, pagina, motivo):
+    informe.setdefault("fallos", []).append({"pagina": None if pagina is None else pagina + 1,
+                                             "lector": nombre, "motivo": motivo})
+    registro().sumar("fallos_lector_pdf", lector=nombre, motivo=motivo.split(":")[0])
+
+
+def _anotar_respaldo(informe, nombre):
+    respaldos = informe.setdefault("respaldos", {})
+    respaldos[nombre] = respaldos.get(nombre, 0) + 1
+    registro().sumar("respaldos_lector_pdf", lector=nombre)
+
+
+def _motivo(mensaje):
+    if mensaje[0] == "error":
+        return f"error: {mensaje[2]}"
+    if mensaje[0] == "error_apertura":
+        return f"error: {mensaje[1]}"
+    return mensaje[0]  # "timeout" o "caido"
+
+
+def _pagina_vigilada(nombre, pdf_file, pagina, timeout):
+    """(texto, segundos) de una sola página leída en un trabajador; (None, motivo) si falla"""
+    with _vigilante() as vigilante:
+        if vigilante is None:
+            return _pagina_en_proceso(nombre, pdf_file, pagina)
+        mensajes = vigilante.leer(nombre, pdf_file, pagina, pagina + 1, timeout)
+        try:
+            for mensaje in mensajes:
+                if mensaje[0] == "pagina":
+                    return mensaje[2], mensaje[3]
+                if mensaje[0] != "paginas":
+                    return None, _motivo(mensaje)
+        finally:
+            mensajes.close()
+    return None, "error: página fuera del documento"
+
+
+def _pagina_en_proceso(nombre, pdf_file, pagina):
+    try:
+        with LECTORES[nombre].abrir(pdf_file) as documento:
+            comienzo = time.perf_counter()
+            return documento.texto(pagina), time.perf_counter() - comienzo
+    except Exception as e:
+        return None, f"error: {type(e).__name__}: {e}"
+
+
+def _respaldo(pdf_file, pagina, lectores, timeout, informe):
+    """Texto de una página que falló, con el primero de `lectores` que la lee ("" si ninguno)"""
+    for nombre in lectores:
+        if timeout > 0:
+            texto, dato = _pagina_vigilada(nombre, pdf_file, pagina, timeout)
+        else:
+            texto, dato = _pagina_en_proceso(nombre, pdf_file, pagina)
+        if texto is None:
+            _anotar_fallo(informe, nombre, pagina, dato)
+            continue
+        _anotar_pagina(informe, nombre, dato)
+        _anotar_respaldo(informe, nombre)
+        return texto
+    return ""
+
+
+def _iter_en_proceso(pdf_file, inicio, fin, cadena, informe):
+    """Lectura sin vigilante (DDC_TIMEOUT_PAGINA=0 o sin procesos hijos): solo respalda las excepciones"""
+    for posicion, nombre in enumerate(cadena):
+        entregadas = False
+        try:
+            with LECTORES[nombre].abrir(pdf_file) as documento:
+                final = documento.paginas if fin is None else min(fin, documento.paginas)
+                for indice in range(inicio, final):
+                    comienzo = time.perf_counter()
+                    try:
+                        texto = documento.texto(indice)
+                    except Exception as e:
+                        _anotar_fallo(informe, nombre, indice, f"error: {type(e).__name__}: {e}")
+                        texto = _respaldo(pdf_file, indice, cadena[posicion + 1:], 0, informe)
+                    else:
+                        _anotar_pagina(informe, nombre, time.perf_counter() - comienzo)
+                    entregadas = True
+                    yield texto
+            return
+        except Exception as e:
+            if entregadas:
+                raise
+            _anotar_fallo(informe, nombre, None, f"error: {type(e).__name__}: {e}")
+    raise ErrorLectura(f"Ningún lector pudo abrir el PDF: {informe.get('fallos')}")
+
+
+def iter_paginas(pdf_file, inicio=0, fin=None, lector=None, informe=None, timeout=None, respaldo=True):
+    """Genera el texto de las páginas [inicio, fin) en orden, con el lector indicado (o el elegido).
+
+    Cada página tiene `timeout` segundos en el proceso trabajador (DDC_TIMEOUT_PAGINA por defecto); la que
+    falla se lee con el siguiente lector disponible (con respaldo=False queda vacía). informe: dict que se
+    rellena con el lector, las páginas, los milisegundos por lector, los fallos y los respaldos.
+    """
+    timeout = TIMEOUT_PAGINA if timeout is None else timeout
+    if not es_ruta(pdf_file) and not isinstance(pdf_file, (bytes, bytearray)):
+        pdf_file = leer_bytes(pdf_file)
+    principal = lector or lector_elegido()
+    cadena = cadena_lectores(principal) if respaldo else [principal]
+    informe = {} if informe is None else informe
+    informe.setdefault("lector", cadena[0])
+    if timeout <= 0:
+        yield from _iter_en_proceso(pdf_file, inicio, fin, cadena, informe)
+        return
+    pagina = inicio
+    while cadena and (fin is None or pagina < fin):
+        with _vigilante() as vigilante:
+            if vigilante is None:
+                yield from _iter_en_proceso(pdf_file, pagina, fin, cadena, informe)
+                return
+            mensajes = vigilante.leer(cadena[0], pdf_file, pagina, fin, timeout)
+            interrumpida = False
+            try:
+                for mensaje in mensajes:
+                    if mensaje[0] == "paginas":
+                        fin = mensaje[1] if fin is None else min(fin, mensaje[1])
+                    elif mensaje[0] == "pagina":
+                        _anotar_pagina(informe, cadena[0], mensaje[3])
+                        pagina = mensaje[1] + 1
+                        yield mensaje[2]
+                    elif mensaje[0] == "error":
+                        _anotar_fallo(informe, cadena[0], mensaje[1], _motivo(mensaje))
+                        pagina = mensaje[1] + 1
+                        yield _respaldo(pdf_file, mensaje[1], cadena[1:], timeout, informe)
+                    elif mensaje[0] == "error_apertura" or mensaje[1] is None:
+                        # El lector no abre este PDF: el resto lo lee el siguiente
+                        _anotar_fallo(informe, cadena[0], None, _motivo(mensaje))
+                        cadena = cadena[1:]
+                        interrumpida = True
+                    else:
+                        # Página colgada o trabajador caído: esa página con respaldo y se sigue con otro trabajador
+                        _anotar_fallo(informe, cadena[0], mensaje[1], _motivo(mensaje))
+                        pagina = mensaje[1] + 1
+                        interrumpida = True
+                        yield _respaldo(pdf_file, mensaje[1], cadena[1:], timeout, informe)
+            finally:
+                mensajes.close()
+        if not interrumpida:
+            return
+    if not cadena:
+        raise ErrorLectura(f"Ningún lector pudo abrir el PDF: {informe.get('fallos')}")
+
+
+def sumar_informes(destino, parcial):
+    """Acumula en `destino` el informe de un rango de páginas"""
+    destino.setdefault("lector", parcial.get("lector"))
+    destino["paginas"] = destino.get("paginas", 0) + parcial.get("paginas", 0)
+    for clave in ("ms_por_lector", "respaldos"):
+        for nombre, valor in parcial.get(clave, {}).items():
+            destino.setdefault(clave, {})[nombre] = round(destino.get(clave, {}).get(nombre, 0) + valor, 3)
+    if parcial.get("fallos"):
+        destino.setdefault("fallos", []).extend(parcial["fallos"])
+
+
+# ============================================
+# CALIBRACIÓN (BENCHMARK INTEGRADO)
+# ============================================
+
+_elegido = None  # (mtime del archivo de calibración, lector) de la última comprobación
+_calibracion_lock = threading.Lock()
+
+
+def versiones():
+    return {nombre: LECTORES[nombre].version() for nombre in disponibles()}
+
+
+def calibrar(muestras, paginas=PAGINAS_CALIBRACION, timeout=None):
+    """Mide cada lector disponible en las primeras `paginas` páginas de las muestras y elige el más rápido
+    que saca al menos CALIDAD_MINIMA de las palabras del lector de referencia.
+
+    Devuelve {"elegido", "valida", "versiones", "lectores": {nombre: {"ms_por_pagina", "palabras", "fallos",
+    "apto"}}}. No es válida (ni se puede guardar) si el de referencia falló o no sacó ninguna palabra:
+    muestras ilegibles o solo con imágenes no sirven para comparar.
+    """
+    timeout = TIMEOUT_PAGINA if timeout is None else timeout
+    lectores = {}
+    for nombre in disponibles():
+        ms = palabras = leidas = 0
+        fallos = []
+        for muestra in muestras:
+            for pasada in range(2):  # la primera calienta el trabajador (importa el lector)
+                informe = {}
+                comienzo = time.perf_counter()
+                try:
+                    textos = list(iter_paginas(muestra, 0, paginas, lector=nombre, informe=informe,
+                                               timeout=timeout, respaldo=False))
+                except ErrorLectura as e:
+                    textos = []
+                    informe.setdefault("fallos", []).append({"pagina": None, "lector": nombre, "motivo": str(e)})
+                segundos = time.perf_counter() - comienzo
+            ms += segundos * 1000
+            leidas += len(textos)
+            palabras += sum(len(PALABRA_RE.findall(texto)) for texto in textos)
+            fallos += [fallo for fallo in informe.get("fallos", []) if fallo["lector"] == nombre]
+        lectores[nombre] = {"ms_por_pagina": round(ms / leidas, 3) if leidas else None, "palabras": palabras,
+                            "fallos": len(fallos)}
+    referencia = lectores[LECTOR_REFERENCIA]
+    valida = referencia["fallos"] == 0 and referencia["palabras"] > 0
+    for datos in lectores.values():
+        datos["apto"] = (valida and datos["fallos"] == 0 and datos["ms_por_pagina"] is not None
+                         and datos["palabras"] >= CALIDAD_MINIMA * referencia["palabras"])
+    aptos = [nombre for nombre, datos in lectores.items() if datos["apto"]]
+    elegido = min(aptos, key=lambda nombre: lectores[nombre]["ms_por_pagina"]) if aptos else LECTOR_REFERENCIA
+    return {"elegido": elegido, "valida": valida, "versiones": versiones(), "lectores": lectores}
+
+
+def cargar_calibracion(ruta=CALIBRACION_DEFAULT):
+    """Calibración guardada, si sigue valiendo para los lectores instalados ahora"""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            calibracion = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not calibracion.get("valida") or calibracion.get("versiones") != versiones()
+            or calibracion.get("elegido") not in disponibles()):
+        return None
+    return calibracion
+
+
+def guardar_calibracion(calibracion, ruta=CALIBRACION_DEFAULT):
+    if not calibracion.get("valida"):
+        raise ValueError("el lector de referencia falló o no sacó texto de las muestras: calibración no válida")
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(calibracion, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def lector_elegido():
+    """Lector principal: el de DDC_LECTOR_PDF o, en auto, el de la calibración guardada (el de referencia si
+    no la hay). La calibración se vuelve a cargar si cambia el archivo, sin reiniciar el proceso."""
+    global _elegido
+    if LECTOR_PDF != "auto":
+        return LECTOR_PDF if LECTOR_PDF in disponibles() else LECTOR_REFERENCIA
+    try:
+        mtime = os.path.getmtime(CALIBRACION_DEFAULT)
+    except OSError:
+        return LECTOR_REFERENCIA
+    with _calibracion_lock:
+        if _elegido is None or _elegido[0] != mtime:
+            calibracion = cargar_calibracion()
+            _elegido = (mtime, calibracion["elegido"] if calibracion else LECTOR_REFERENCIA)
+        return _elegido[1]
+
+
+def informe_lectores():
+    """Páginas, mediana por página, fallos y respaldos de cada lector disponible en este proceso"""
+    resumen = registro().resumen()
+    informe = {"elegido": lector_elegido(), "lectores": {}}
+    for nombre in disponibles():
+        serie = resumen.get(f"pagina_pdf_{nombre}", {})
+        informe["lectores"][nombre] = {
+            "paginas": registro().contador("paginas_pdf", lector=nombre),
+            "ms_p50": round(serie["p50"] * 1000, 3) if serie else None,
+            "fallos": registro().contador("fallos_lector_pdf", lector=nombre),
+            "respaldos": registro().contador("respaldos_lector_pdf", lector=nombre),
+        }
+    return informe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lectores de texto de PDF: disponibles y calibración")
+    subparsers = parser.add_subparsers(dest="orden", required=True)
+    subparsers.add_parser("disponibles", help="Lectores instalados y sus versiones")
+    sub = subparsers.add_parser("calibrar", help="Mide los lectores con unos PDF de muestra")
+    sub.add_argument("muestras", nargs="+", help="PDF de muestra")
+    sub.add_argument("--paginas", type=int, default=PAGINAS_CALIBRACION, help="Páginas por muestra")
+    sub.add_argument("--guardar", action="store_true", help=f"Guarda la elección en {CALIBRACION_DEFAULT}")
+    args = parser.parse_args(argv)
+    if args.orden == "disponibles":
+        json.dump(versiones(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    calibracion = calibrar(args.muestras, args.paginas)
+    for nombre, datos in calibracion["lectores"].items():
+        print(f"{nombre:8} {datos['ms_por_pagina'] or '-':>10} ms/página · {datos['palabras']} palabras · "
+              f"{datos['fallos']} fallos{'' if datos['apto'] else ' · no apto'}")
+    print(f"Elegido: {calibracion['elegido']}")
+    if args.guardar:
+        if not calibracion["valida"]:
+            print(f"No se guarda: {LECTOR_REFERENCIA} falló o no sacó texto de las muestras", file=sys.stderr)
+            return 1
+        guardar_calibracion(calibracion)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from ddc.cliente import crear_cliente_async
+from ddc.duplicados import resumen_duplicado
+from ddc.enrutador import MODELOS_ENRUTADOS
+from ddc.extractor import extract_pages_from_pdf
+from ddc.metricas import medir, registro
+from ddc.reduccion import reducir_paginas
+from ddc.reglas import extraer_campos_hibrido_async
+
+# ============================================
+# PROCESAMIENTO POR LOTES
+# ============================================
+
+CONCURRENCIA_DEFAULT = 4
+
+
+def crear_pool_procesos(procesos=None):
+    """Pool de procesos para el parseo de PDF (spawn: seguro dentro del servidor de Streamlit)"""
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+
+
+def preparar_texto(fuente, corte_temprano=False):
+    """Parsea un PDF (bytes o ruta en disco) y reduce su texto: devuelve (texto, reporte).
+
+    El reporte lleva en "lectura" el lector usado, sus tiempos y las páginas que fallaron.
+    """
+    informe = {}
+    paginas = extract_pages_from_pdf(fuente, paralelo=False, corte_temprano=corte_temprano, informe=informe)
+    texto, reporte = reducir_paginas(paginas)
+    reporte["lectura"] = informe
+    return texto, reporte
+
+
+async def procesar_documento(doc_id, fuente, client, pool, semaforo, al_avanzar=None, preparado=None,
+                             corte_temprano=False, duplicados=None, sha=None):
+    """Parsea y reduce un PDF (bytes o ruta) en el pool de procesos y extrae sus campos con un cupo del semáforo.
+
+    preparado: (texto, reporte) ya calculado por preparar_texto, para no volver a parsear.
+    duplicados: IndiceDuplicados para reutilizar los campos de un casi duplicado ya extraído (sha: el del
+    propio PDF, que no cuenta como duplicado).
+    """
+    loop = asyncio.get_running_loop()
+    texto = None
+    uso = {}
+    try:
+        if preparado is None:
+            # Incluye la espera por un proceso libre del pool
+            with medir("texto_lote", uso):
+                preparado = await loop.run_in_executor(pool, preparar_texto, fuente, corte_temprano)
+            if al_avanzar:
+                al_avanzar(doc_id, "texto", preparado)
+        texto = preparado[0]
+        coincidencia = duplicados.buscar(texto, excluir=sha) if duplicados else None
+        if coincidencia and al_avanzar:
+            al_avanzar(doc_id, "duplicado", resumen_duplicado(coincidencia))
+        async with semaforo:
+            if al_avanzar:
+                al_avanzar(doc_id, "extrayendo", None)
+            detalle = {}
+            fields, origen = await extraer_campos_hibrido_async(
+                texto, client, metricas=uso, detalle=detalle,
+                reutilizables=coincidencia["campos"] if coincidencia else None
+            )
+        registro().registrar_documento(doc_id, uso, MODELOS_ENRUTADOS)
+    except Exception as e:
+        if al_avanzar:
+            al_avanzar(doc_id, "error", e)
+        return doc_id, texto, None, e
+    if al_avanzar:
+        if detalle:
+            al_avanzar(doc_id, "fragmentos", detalle)
+        al_avanzar(doc_id, "origen", origen)
+        al_avanzar(doc_id, "uso", uso)
+        al_avanzar(doc_id, "campos", fields)
+    return doc_id, texto, fields, None
+
+
+async def procesar_lote(documentos, api_key, concurrencia=CONCURRENCIA_DEFAULT, procesos=None, al_avanzar=None,
+                        corte_temprano=False, duplicados=None):
+    """Procesa varios PDF: parseo en paralelo y llamadas a la API concurrentes (como máximo `concurrencia`).
+
+    documentos: lista de (doc_id, fuente, preparado_o_None), con fuente la ruta del PDF (o sus bytes). Si el texto ya se conoce no se vuelve a parsear.
+    al_avanzar(doc_id, etapa, dato) se llama en el hilo del bucle con etapa "texto", "duplicado" (casi
+    duplicado encontrado), "extrayendo", "fragmentos" (plan del modo por fragmentos, solo en textos muy
+    largos), "origen", "uso" (tokens de la respuesta), "campos" o "error".
+    duplicados: IndiceDuplicados opcional; los doc_id se toman como el sha del PDF.
+    Devuelve {doc_id: (texto, fields, error)}.
+    """
+    semaforo = asyncio.Semaphore(concurrencia)
+    resultados = {}
+    async with crear_cliente_async(api_key) as client:
+        with crear_pool_procesos(procesos) as pool:
+            tareas = [
+                procesar_documento(doc_id, fuente, client, pool, semaforo, al_avanzar, preparado, corte_temprano,
+                                   duplicados, doc_id)
+                for doc_id, fuente, preparado in documentos
+            ]
+            for tarea in asyncio.as_completed(tareas):
+                doc_id, texto, fields, error = await tarea
+                resultados[doc_id] = (texto, fields, error)
+    return resultados
@@ -0,0 +1,334 @@
+"""Extracción masiva con la Message Batches API: más rendimiento y la mitad de coste, sin baja latencia.
+
+Uso:
+    python -m ddc.lotes_api enviar RUTA_PDFS --estado lotes.json [--corte-temprano] [--procesos 4]
+    python -m ddc.lotes_api estado --estado lotes.json
+    python -m ddc.lotes_api recoger --estado lotes.json --salida resultados.jsonl [--formato csv] [--esperar]
+
+"enviar" parsea los PDF, resuelve por reglas lo que pueda y envía el resto (el mismo prompt que
+extract_fields_with_ai) en lotes de como máximo MAX_PETICIONES_POR_LOTE peticiones. Cada petición usa
+como custom_id el SHA-256 del PDF, así que los archivos idénticos se piden una sola vez y los resultados
+se asignan a todos. El archivo de estado guarda los IDs de los lotes y lo necesario para combinar la
+respuesta: volver a ejecutar "enviar" solo envía los archivos nuevos o los que fallaron.
+
+"recoger" consulta los lotes, descarga los terminados, aplica el mismo postproceso que el modo interactivo
+(herramienta del esquema, reglas, validación y limpiezas de construir_registro), escribe la salida y guarda
+cada resultado en la caché de extracciones y en el almacén de búsqueda (ddc.almacen). Con --base-url se puede probar contra ddc.mock_api.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from ddc.almacen import ALMACEN_DEFAULT, AlmacenResultados
+from ddc.cache import CACHE_DIR_DEFAULT, ExtractionCache, cache_key, sha256_archivo
+from ddc.cli import EscritorSalida, listar_pdfs
+from ddc.cliente import get_client
+from ddc.esquema import CAMPOS, validar_campos
+from ddc.extractor import (
+    MODEL_NAME,
+    PROMPT_VERSION,
+    ExtractionError,
+    build_request,
+    campos_de_respuesta,
+    construir_registro,
+    registrar_uso,
+)
+from ddc.lote import crear_pool_procesos, preparar_texto
+from ddc.metricas import registro
+from ddc.reduccion import VERSION_REDUCCION
+from ddc.reglas import combinar, extraer_campos_por_reglas, resumen_origen
+
+MAX_PETICIONES_POR_LOTE = 10_000
+MAX_BYTES_POR_LOTE = 200 * 1024 * 1024  # la API admite 256 MB por lote
+SEGUNDOS_ENTRE_CONSULTAS = 60
+FACTOR_PRECIO_LOTES = 0.5
+# Error con el que se guarda un documento hasta que su petición está en un lote (o no la necesita):
+# si "enviar" se corta antes, la siguiente ejecución lo vuelve a intentar
+SIN_ENVIAR = "sin enviar"
+
+
+class EstadoLotes:
+    """Lotes enviados y documentos pendientes, en un archivo JSON reescrito de forma atómica"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.datos = {"opciones": {}, "lotes": {}, "documentos": {}}
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                self.datos = json.load(f)
+
+    @property
+    def lotes(self):
+        return self.datos["lotes"]
+
+    @property
+    def documentos(self):
+        return self.datos["documentos"]
+
+    @property
+    def opciones(self):
+        return self.datos["opciones"]
+
+    def guardar(self):
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+
+
+def _clave_cache(sha, opciones):
+    return cache_key(sha, opciones["prompt_version"], opciones["modelo"],
+                     corte="corte" if opciones["corte_temprano"] else "", reduccion=VERSION_REDUCCION)
+
+
+def _enviar_lote(client, estado, peticiones):
+    """Crea un lote con las peticiones acumuladas y lo anota en el estado"""
+    lote = client.messages.batches.create(requests=peticiones)
+    estado.lotes[lote.id] = {"creado": time.time(), "estado": lote.processing_status, "peticiones": len(peticiones),
+                             "recogido": False}
+    for peticion in peticiones:
+        estado.documentos[peticion["custom_id"]]["lote"] = lote.id
+        estado.documentos[peticion["custom_id"]].pop("error", None)
+    estado.guardar()
+    print(f"📦 Lote {lote.id}: {len(peticiones)} peticiones", file=sys.stderr)
+
+
+def enviar(args, client):
+    """Parsea los PDF nuevos y envía sus peticiones en uno o varios lotes"""
+    estado = EstadoLotes(args.estado)
+    estado.opciones.setdefault("corte_temprano", args.corte_temprano)
+    estado.opciones.setdefault("modelo", MODEL_NAME)
+    estado.opciones.setdefault("prompt_version", PROMPT_VERSION)
+    cache = None if args.sin_cache else ExtractionCache(args.cache_dir)
+
+    # Agrupa por contenido: los archivos idénticos comparten documento y petición
+    nuevos = {}
+    for ruta in listar_pdfs(args.ruta):
+        archivo = os.path.relpath(ruta, args.ruta)
+        sha = sha256_archivo(ruta)
+        documento = estado.documentos.get(sha)
+        if documento and not documento.get("error"):
+            if archivo not in documento["archivos"]:
+                documento["archivos"].append(archivo)
+            continue
+        nuevos.setdefault(sha, {"ruta": ruta, "archivos": []})["archivos"].append(archivo)
+
+    pendientes = []
+    for sha, nuevo in nuevos.items():
+        documento = {"archivos": nuevo["archivos"], "lote": None, "por_reglas": {}, "campos": [], "recogido": False}
+        if cache and cache.get(_clave_cache(sha, estado.opciones)) is not None:
+            documento["en_cache"] = True
+        else:
+            documento["error"] = SIN_ENVIAR
+            pendientes.append((sha, nuevo["ruta"]))
+        estado.documentos[sha] = documento
+    estado.guardar()
+
+    peticiones = []
+    bytes_lote = 0
+    fallidos = 0
+    with crear_pool_procesos(args.procesos) as pool:
+        futuros = [(sha, pool.submit(preparar_texto, ruta, estado.opciones["corte_temprano"])) for sha, ruta in pendientes]
+        for sha, futuro in futuros:
+            documento = estado.documentos[sha]
+            try:
+                texto, _ = futuro.result()
+            except Exception as e:
+                # Un PDF ilegible no detiene a los demás; queda con su error y se reintenta en el próximo envío
+                documento["error"] = f"{type(e).__name__}: {e}"
+                fallidos += 1
+                print(f"❌ {documento['archivos'][0]}: {documento['error']}", file=sys.stderr)
+                continue
+            documento["por_reglas"] = extraer_campos_por_reglas(texto)
+            documento["campos"] = [campo for campo in CAMPOS if campo not in documento["por_reglas"]]
+            if not documento["campos"]:
+                documento.pop("error")
+                continue  # todo resuelto por reglas: no hace falta pedirlo
+            peticion = {"custom_id": sha, "params": build_request(texto, documento["campos"])}
+            tamano = len(json.dumps(peticion, ensure_ascii=False).encode("utf-8"))
+            if peticiones and (len(peticiones) >= MAX_PETICIONES_POR_LOTE or bytes_lote + tamano > MAX_BYTES_POR_LOTE):
+                _enviar_lote(client, estado, peticiones)
+                peticiones, bytes_lote = [], 0
+            peticiones.append(peticion)
+            bytes_lote += tamano
+    if peticiones:
+        _enviar_lote(client, estado, peticiones)
+    estado.guardar()
+    print(f"Documentos nuevos: {len(nuevos)} ({len(pendientes) - fallidos} parseados, {fallidos} con error, "
+          f"{len(nuevos) - len(pendientes)} ya en caché)", file=sys.stderr)
+    return 1 if fallidos else 0
+
+
+def consultar(client, estado):
+    """Actualiza el estado de los lotes sin terminar; devuelve cuántos siguen en curso"""
+    en_curso = 0
+    for lote_id, lote in estado.lotes.items():
+        if lote["estado"] == "ended":
+            continue
+        respuesta = client.messages.batches.retrieve(lote_id)
+        lote["estado"] = respuesta.processing_status
+        lote["cuentas"] = respuesta.request_counts.model_dump()
+        if lote["estado"] != "ended":
+            en_curso += 1
+    estado.guardar()
+    return en_curso
+
+
+def _escribir_documento(escritor, cache, almacen, estado, sha, fields, origen=None, uso=None):
+    documento = estado.documentos[sha]
+    for archivo in documento["archivos"]:
+        fila = construir_registro(archivo, fields)
+        escritor.escribir({"archivo": archivo, "sha256": sha, **fila, "desde_cache": origen is None})
+        if almacen:
+            almacen.guardar(sha, fila["Título"], fields, archivo=archivo, modelo=estado.opciones["modelo"],
+                            prompt_version=estado.opciones["prompt_version"])
+    if cache and origen is not None:
+        cache.put(_clave_cache(sha, estado.opciones), fields, archivo=documento["archivos"][0],
+                  modelo=estado.opciones["modelo"], lote=documento["lote"])
+    if uso is not None:
+        registro().registrar_documento(sha, uso, estado.opciones["modelo"], factor_precio=FACTOR_PRECIO_LOTES)
+    if origen is not None:
+        documento["origen"] = resumen_origen(origen)
+    documento["recogido"] = True
+
+
+def recoger(args, client):
+    """Descarga los lotes terminados y escribe sus resultados; con --esperar, consulta hasta que acaben todos"""
+    estado = EstadoLotes(args.estado)
+    cache = None if args.sin_cache else ExtractionCache(args.cache_dir)
+    almacen = None if args.sin_almacen else AlmacenResultados(args.almacen)
+    escritor = EscritorSalida(args.salida, args.formato)
+    correctos = errores = 0
+    try:
+        # Documentos que no necesitaban la API: en caché o resueltos del todo por reglas
+        for sha, documento in estado.documentos.items():
+            if documento["recogido"] or documento["lote"]:
+                continue
+            if documento.get("error"):
+                # No se pudo parsear o enviar: hay que volver a ejecutar "enviar"
+                errores += 1
+                print(f"❌ {documento['archivos'][0]}: {documento['error']}", file=sys.stderr)
+            elif documento.get("en_cache"):
+                fields = cache.get(_clave_cache(sha, estado.opciones)) if cache else None
+                if fields is None and almacen:
+                    # Sin caché (--sin-cache o entrada expulsada): sirve el registro del almacén si es de este estado
+                    guardado = almacen.obtener(sha)
+                    if (guardado and guardado["prompt_version"] == estado.opciones["prompt_version"]
+                            and guardado["modelo"] == estado.opciones["modelo"]):
+                        fields = guardado["campos"]
+                if fields is not None:
+                    _escribir_documento(escritor, cache, almacen, estado, sha, fields)
+                    correctos += 1
+                else:
+                    # Se vuelve a pedir en el próximo "enviar"
+                    documento.pop("en_cache")
+                    documento["error"] = "ya no está en la caché; vuelve a ejecutar enviar"
+                    errores += 1
+                    print(f"❌ {documento['archivos'][0]}: {documento['error']}", file=sys.stderr)
+            elif documento["por_reglas"] and not documento["campos"]:
+                fields, origen = combinar(documento["por_reglas"], {})
+                _escribir_documento(escritor, cache, almacen, estado, sha, fields, origen)
+                correctos += 1
+        estado.guardar()
+
+        while True:
+            en_curso = consultar(client, estado)
+            for lote_id, lote in estado.lotes.items():
+                if lote["estado"] != "ended" or lote["recogido"]:
+                    continue
+                for entrada in client.messages.batches.results(lote_id):
+                    sha = entrada.custom_id
+                    documento = estado.documentos.get(sha)
+                    if documento is None or documento["recogido"]:
+                        continue
+                    if entrada.result.type != "succeeded":
+                        documento["error"] = entrada.result.type
+                        errores += 1
+                        print(f"❌ {documento['archivos'][0]}: {entrada.result.type}", file=sys.stderr)
+                        continue
+                    uso = {}
+                    registrar_uso(entrada.result.message.usage, uso)
+                    try:
+                        por_modelo = campos_de_respuesta(entrada.result.message)
+                    except ExtractionError as e:
+                        documento["error"] = str(e)
+                        errores += 1
+                        print(f"❌ {documento['archivos'][0]}: {e}", file=sys.stderr)
+                        continue
+                    invalidos = validar_campos(por_modelo, documento["campos"])
+                    fields, origen = combinar(documento["por_reglas"], por_modelo, invalidos=invalidos)
+                    _escribir_documento(escritor, cache, almacen, estado, sha, fields, origen, uso)
+                    correctos += 1
+                lote["recogido"] = True
+                estado.guardar()
+            if not args.esperar or not en_curso:
+                break
+            print(f"⏳ {en_curso} lote(s) en curso; nueva consulta en {args.intervalo:.0f} s", file=sys.stderr)
+            time.sleep(args.intervalo)
+    finally:
+        escritor.close()
+        estado.guardar()
+        if almacen:
+            almacen.close()
+    pendientes = sum(1 for lote in estado.lotes.values() if not lote["recogido"])
+    print(f"Recogidos: {correctos} correctos, {errores} con error, {pendientes} lote(s) pendientes", file=sys.stderr)
+    return 1 if errores else 0
+
+
+def mostrar_estado(args, client):
+    estado = EstadoLotes(args.estado)
+    consultar(client, estado)
+    for lote_id, lote in estado.lotes.items():
+        recogido = "recogido" if lote["recogido"] else lote["estado"]
+        print(f"{lote_id}: {lote['peticiones']} peticiones, {recogido} {lote.get('cuentas', '')}")
+    sin_lote = sum(1 for documento in estado.documentos.values() if not documento["lote"] and not documento.get("error"))
+    con_error = sum(1 for documento in estado.documentos.values() if not documento["lote"] and documento.get("error"))
+    print(f"Documentos: {len(estado.documentos)} ({sin_lote} sin lote: en caché o resueltos por reglas; "
+          f"{con_error} sin enviar por error)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extracción masiva con la Message Batches API")
+    parser.add_argument("--api-key", default=os.environ.get("ANTHROPIC_API_KEY", ""))
+    parser.add_argument("--base-url", default=None, help="Otro servidor de la API (por ejemplo, ddc.mock_api)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR_DEFAULT, help="Directorio de la caché de extracciones")
+    parser.add_argument("--sin-cache", action="store_true", help="No leer ni escribir la caché de extracciones")
+    parser.add_argument("--almacen", default=ALMACEN_DEFAULT, help="Base de datos SQLite del almacén de búsqueda")
+    parser.add_argument("--sin-almacen", action="store_true", help="No guardar los resultados en el almacén")
+    subparsers = parser.add_subparsers(dest="orden", required=True)
+
+    p_enviar = subparsers.add_parser("enviar", help="Parsea los PDF y envía los lotes")
+    p_enviar.add_argument("ruta", help="Directorio con los PDF (se recorre recursivamente)")
+    p_enviar.add_argument("--estado", required=True, help="Archivo JSON con los lotes enviados")
+    p_enviar.add_argument("--procesos", type=int, default=None, help="Procesos para parsear PDF (por defecto, núcleos)")
+    p_enviar.add_argument("--corte-temprano", action="store_true",
+                          help="Deja de leer cada PDF cuando ya aparecieron las secciones del prompt (omite anexos)")
+
+    p_estado = subparsers.add_parser("estado", help="Muestra el estado de los lotes")
+    p_estado.add_argument("--estado", required=True)
+
+    p_recoger = subparsers.add_parser("recoger", help="Descarga los lotes terminados y escribe los resultados")
+    p_recoger.add_argument("--estado", required=True)
+    p_recoger.add_argument("--salida", required=True, help="Archivo de resultados (.jsonl o .csv)")
+    p_recoger.add_argument("--formato", choices=["jsonl", "csv"], help="Por defecto según la extensión de --salida")
+    p_recoger.add_argument("--esperar", action="store_true", help="Consulta hasta que terminen todos los lotes")
+    p_recoger.add_argument("--intervalo", type=float, default=SEGUNDOS_ENTRE_CONSULTAS,
+                           help="Segundos entre consultas con --esperar")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("falta la API key (--api-key o ANTHROPIC_API_KEY)")
+    if args.orden == "recoger" and not args.formato:
+        args.formato = "csv" if args.salida.lower().endswith(".csv") else "jsonl"
+    client = get_client(args.api_key, args.base_url)
+    ordenes = {"enviar": enviar, "estado": mostrar_estado, "recoger": recoger}
+    return ordenes[args.orden](args, client)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+# ============================================
+# MEMORIA ACOTADA: SUBIDAS EN DISCO Y RESULTADOS POR SESIÓN
+# ============================================
+# Configuración por variables de entorno:
+#   DDC_TMP_DIR                 directorio de los PDF subidos (por defecto, <tmp>/ddc-subidas)
+#   DDC_MEMORIA_SESION_MB       presupuesto de resultados por sesión (32)
+#   DDC_SESION_INACTIVA_SEGUNDOS  se vacían los resultados de sesiones inactivas más tiempo (1800)
+
+BLOQUE_COPIA = 1024 * 1024
+ANTIGUEDAD_TEMPORALES = 6 * 3600  # segundos; subidas huérfanas de sesiones que ya no existen
+
+
+def directorio_temporal():
+    return os.environ.get("DDC_TMP_DIR") or os.path.join(tempfile.gettempdir(), "ddc-subidas")
+
+
+def volcar_a_disco(archivo, directorio=None):
+    """Copia por bloques un archivo subido (o cualquier objeto con read) a un temporal y devuelve su ruta"""
+    directorio = directorio or directorio_temporal()
+    os.makedirs(directorio, exist_ok=True)
+    limpiar_temporales(directorio)
+    ruta = os.path.join(directorio, f"{uuid.uuid4().hex}.pdf")
+    archivo.seek(0)
+    with open(ruta, "wb") as f:
+        shutil.copyfileobj(archivo, f, BLOQUE_COPIA)
+    archivo.seek(0)
+    return ruta
+
+
+def borrar_temporal(ruta):
+    if ruta:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def limpiar_temporales(directorio, antiguedad=ANTIGUEDAD_TEMPORALES):
+    """Borra subidas más antiguas que `antiguedad` (de sesiones cerradas o procesos interrumpidos)"""
+    limite = time.time() - antiguedad
+    try:
+        entradas = list(os.scandir(directorio))
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+        except OSError:
+            continue  # otro proceso la borró o sigue escribiéndola
+
+
+def tamano_aproximado(valor, _vistos=None):
+    """Bytes aproximados de un valor y de todo lo que contiene (dict, list, tuple, set)"""
+    vistos = _vistos if _vistos is not None else set()
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+    tamano = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        tamano += sum(tamano_aproximado(k, vistos) + tamano_aproximado(v, vistos) for k, v in valor.items())
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        tamano += sum(tamano_aproximado(elemento, vistos) for elemento in valor)
+    return tamano
+
+
+class ResultadosSesion(dict):
+    """Resultados de una sesión, fuera de st.session_state para que el registro pueda vaciarlos.
+
+    Cada clave recuerda su último acceso; las claves de un mismo grupo se expulsan juntas.
+    """
+
+    def __init__(self, grupos=None):
+        super().__init__()
+        self.grupos = grupos or {}
+        self.accesos = {}
+        self.ultima_actividad = time.time()
+        self.expulsados = []
+
+    def _grupo(self, clave):
+        for nombre, claves in self.grupos.items():
+            if clave in claves:
+                return nombre
+        return clave
+
+    def __setitem__(self, clave, valor):
+        super().__setitem__(clave, valor)
+        self.tocar(clave)
+
+    def tocar(self, clave):
+        """Marca el grupo de la clave como usado ahora"""
+        self.accesos[self._grupo(clave)] = time.time()
+        self.ultima_actividad = time.time()
+
+    def tamanos(self):
+        """{grupo: bytes aproximados}"""
+        por_grupo = {}
+        for clave, valor in list(self.items()):
+            grupo = self._grupo(clave)
+            por_grupo[grupo] = por_grupo.get(grupo, 0) + tamano_aproximado(valor)
+        return por_grupo
+
+    def expulsar(self, grupo):
+        for clave in self.grupos.get(grupo, (grupo,)):
+            self.pop(clave, None)
+        self.accesos.pop(grupo, None)
+        self.expulsados.append(grupo)
+
+    def vaciar(self):
+        for grupo in list(self.tamanos()):
+            self.expulsar(grupo)
+
+
+class RegistroSesiones:
+    """Resultados de todas las sesiones del proceso con presupuesto por sesión y caducidad por inactividad"""
+
+    def __init__(self, limite_bytes=None, inactividad_segundos=None, grupos=None):
+        self.limite_bytes = limite_bytes or int(float(os.environ.get("DDC_MEMORIA_SESION_MB", 32)) * 1024 * 1024)
+        self.inactividad_segundos = inactividad_segundos or float(
+            os.environ.get("DDC_SESION_INACTIVA_SEGUNDOS", 1800)
+        )
+        self.grupos = grupos or {}
+        # Débil: cuando Streamlit descarta la sesión, sus resultados desaparecen del registro
+        self._sesiones = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+
+    def de_sesion(self, sesion_id, actual=None):
+        """Resultados de la sesión (el objeto guardado en su session_state o uno nuevo) ya registrados"""
+        resultados = actual if isinstance(actual, ResultadosSesion) else ResultadosSesion(self.grupos)
+        resultados.ultima_actividad = time.time()
+        with self.lock:
+            self._sesiones[sesion_id] = resultados
+        return resultados
+
+    def aplicar_presupuesto(self, resultados, protegidos=()):
+        """Expulsa los grupos usados hace más tiempo hasta volver al presupuesto; devuelve los expulsados"""
+        tamanos = resultados.tamanos()
+        total = sum(tamanos.values())
+        expulsados = []
+        candidatos = sorted(
+            (grupo for grupo in tamanos if grupo not in protegidos),
+            key=lambda grupo: resultados.accesos.get(grupo, 0)
+        )
+        for grupo in candidatos:
+            if total <= self.limite_bytes:
+                break
+            total -= tamanos[grupo]
+            resultados.expulsar(grupo)
+            expulsados.append(grupo)
+        return expulsados
+
+    def purgar_inactivas(self):
+        """Vacía los resultados de las sesiones sin actividad reciente; devuelve cuántas se vaciaron"""
+        limite = time.time() - self.inactividad_segundos
+        with self.lock:
+            sesiones = list(self._sesiones.values())
+        vaciadas = 0
+        for resultados in sesiones:
+            if resultados and resultados.ultima_actividad < limite:
+                resultados.vaciar()
+                vaciadas += 1
+        return vaciadas
+
+    def informe(self):
+        """Memoria aproximada por sesión: [{sesion, bytes, grupos, inactiva_segundos}], de mayor a menor"""
+        with self.lock:
+            sesiones = list(self._sesiones.items())
+        ahora = time.time()
+        filas = []
+        for sesion_id, resultados in sesiones:
+            tamanos = resultados.tamanos()
+            filas.append({
+                "sesion": sesion_id,
+                "bytes": sum(tamanos.values()),
+                "grupos": tamanos,
+                "inactiva_segundos": round(ahora - resultados.ultima_actividad),
+            })
+        return sorted(filas, key=lambda fila: -fila["bytes"])
@@ -0,0 +1,257 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================
+# MÉTRICAS DE TIEMPOS, TOKENS Y COSTE
+# ============================================
+# Configuración por variables de entorno:
+#   DDC_METRICS_LOG    registro JSONL, una línea por documento (.cache/metricas/documentos.jsonl; vacío = no escribir)
+#   DDC_METRICS_LOG_MB tamaño a partir del cual el JSONL se rota a <archivo>.1, que se sobrescribe (10)
+#   DDC_METRICS_FILE   archivo con las métricas en texto Prometheus, reescrito tras cada documento (opcional)
+#   DDC_METRICS_PORT   puerto de un endpoint HTTP /metrics en texto Prometheus (opcional)
+
+METRICAS_LOG_DEFAULT = os.path.join(".cache", "metricas", "documentos.jsonl")
+MAX_BYTES_LOG = int(float(os.environ.get("DDC_METRICS_LOG_MB", 10)) * 1024 * 1024)
+MAX_MUESTRAS = 2048  # por etapa, para los cuantiles
+CUANTILES = (0.5, 0.95)
+
+TIPOS_TOKEN = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+# USD por millón de tokens (entrada, salida, escritura y lectura de la caché de prompt)
+PRECIOS_POR_MILLON = {
+    "claude-sonnet-4-20250514": {
+        "input_tokens": 3.0, "output_tokens": 15.0,
+        "cache_creation_input_tokens": 3.75, "cache_read_input_tokens": 0.30,
+    },
+    "claude-3-5-haiku-20241022": {
+        "input_tokens": 0.80, "output_tokens": 4.0,
+        "cache_creation_input_tokens": 1.0, "cache_read_input_tokens": 0.08,
+    },
+}
+
+
+def coste_estimado(uso, modelo):
+    """Coste en USD de los tokens de `uso` según la tabla de precios (0 si el modelo no está en la tabla).
+
+    Si `uso` trae tokens por modelo ("<tipo>@<modelo>", enrutamiento por niveles), cada uno se cobra a su modelo.
+    """
+    por_modelo = {}
+    for nombre, valor in uso.items():
+        if "@" in nombre:
+            tipo, _, otro = nombre.partition("@")
+            por_modelo.setdefault(otro, {})[tipo] = valor
+    if not por_modelo:
+        por_modelo = {modelo: uso}
+    return sum(
+        tokens.get(tipo, 0) * PRECIOS_POR_MILLON.get(otro, {}).get(tipo, 0.0)
+        for otro, tokens in por_modelo.items() for tipo in TIPOS_TOKEN
+    ) / 1_000_000
+
+
+def percentil(valores, q):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, max(0, int(round(q * len(valores))) - 1))
+    return valores[indice]
+
+
+class RegistroMetricas:
+    """Acumula duraciones por etapa, tokens y coste por documento; exporta a JSONL y texto Prometheus"""
+
+    def __init__(self, ruta_log=None, ruta_prometheus=None, max_bytes_log=MAX_BYTES_LOG):
+        self.ruta_log = ruta_log
+        self.max_bytes_log = max_bytes_log
+        self.ruta_prometheus = ruta_prometheus
+        self.muestras = {}  # serie -> deque de valores recientes
+        self.sumas = {}
+        self.cuentas = {}
+        self.tokens = dict.fromkeys(TIPOS_TOKEN, 0)
+        self.documentos = 0
+        self.contadores = {}  # (nombre, ((etiqueta, valor), ...)) -> total
+        self.lock = threading.Lock()
+
+    def observar(self, serie, valor):
+        """Añade una muestra (segundos de una etapa, o USD en 'coste_documento')"""
+        with self.lock:
+            if serie not in self.muestras:
+                self.muestras[serie] = deque(maxlen=MAX_MUESTRAS)
+                self.sumas[serie] = 0.0
+                self.cuentas[serie] = 0
+            self.muestras[serie].append(valor)
+            self.sumas[serie] += valor
+            self.cuentas[serie] += 1
+
+    def sumar(self, contador, valor=1, **etiquetas):
+        """Suma a un contador con etiquetas (se exporta como ddc_<contador>_total)"""
+        clave = (contador, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def contador(self, contador, **etiquetas):
+        """Total del contador en las combinaciones de etiquetas que incluyen las indicadas"""
+        with self.lock:
+            return sum(
+                valor for (nombre, claves), valor in self.contadores.items()
+                if nombre == contador and set(etiquetas.items()) <= set(claves)
+            )
+
+    def registrar_documento(self, documento, uso, modelo, factor_precio=1.0, **extra):
+        """Cierra un documento: suma sus tokens, observa su coste y lo anota en el JSONL.
+
+        factor_precio: descuento sobre la tabla (0.5 en la Message Batches API).
+        """
+        coste = coste_estimado(uso, modelo) * factor_precio
+        self.observar("coste_documento", coste)
+        with self.lock:
+            self.documentos += 1
+            for tipo in TIPOS_TOKEN:
+                self.tokens[tipo] += uso.get(tipo, 0)
+        registro = {"ts": time.time(), "documento": documento, "modelo": modelo, **uso, "coste_usd": coste, **extra}
+        if self.ruta_log:
+            os.makedirs(os.path.dirname(self.ruta_log) or ".", exist_ok=True)
+            with self.lock:
+                self._rotar_log()
+                with open(self.ruta_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        if self.ruta_prometheus:
+            self.escribir_prometheus(self.ruta_prometheus)
+        return registro
+
+    def _rotar_log(self):
+        """Con el JSONL por encima de max_bytes_log, lo mueve a <archivo>.1 (el anterior se pierde)"""
+        try:
+            if os.path.getsize(self.ruta_log) >= self.max_bytes_log:
+                os.replace(self.ruta_log, f"{self.ruta_log}.1")
+        except OSError:
+            pass  # todavía no existe
+
+    def resumen(self):
+        """{serie: {n, p50, p95, media}} de las muestras recientes"""
+        with self.lock:
+            series = {serie: (sorted(valores), self.sumas[serie], self.cuentas[serie])
+                      for serie, valores in self.muestras.items()}
+        return {
+            serie: {
+                "n": cuenta,
+                "p50": percentil(valores, 0.5),
+                "p95": percentil(valores, 0.95),
+                "media": suma / cuenta if cuenta else 0.0,
+            }
+            for serie, (valores, suma, cuenta) in sorted(series.items())
+        }
+
+    def texto_prometheus(self):
+        """Métricas en formato de exposición de texto de Prometheus"""
+        with self.lock:
+            series = {serie: (sorted(valores), self.sumas[serie], self.cuentas[serie])
+                      for serie, valores in self.muestras.items()}
+            tokens = dict(self.tokens)
+            documentos = self.documentos
+            contadores = dict(self.contadores)
+        lineas = [
+            "# HELP ddc_etapa_segundos Duración de cada etapa (cuantiles sobre las muestras recientes)",
+            "# TYPE ddc_etapa_segundos summary",
+        ]
+        coste = series.pop("coste_documento", None)
+        for serie, (valores, suma, cuenta) in sorted(series.items()):
+            for q in CUANTILES:
+                lineas.append(f'ddc_etapa_segundos{{etapa="{serie}",quantile="{q}"}} {percentil(valores, q):.6f}')
+            lineas.append(f'ddc_etapa_segundos_sum{{etapa="{serie}"}} {suma:.6f}')
+            lineas.append(f'ddc_etapa_segundos_count{{etapa="{serie}"}} {cuenta}')
+        lineas += [
+            "# HELP ddc_documento_coste_usd Coste estimado de la API por documento",
+            "# TYPE ddc_documento_coste_usd summary",
+        ]
+        if coste:
+            valores, suma, cuenta = coste
+            for q in CUANTILES:
+                lineas.append(f'ddc_documento_coste_usd{{quantile="{q}"}} {percentil(valores, q):.6f}')
+            lineas.append(f"ddc_documento_coste_usd_sum {suma:.6f}")
+            lineas.append(f"ddc_documento_coste_usd_count {cuenta}")
+        lineas += ["# HELP ddc_tokens_total Tokens facturados por tipo", "# TYPE ddc_tokens_total counter"]
+        lineas += [f'ddc_tokens_total{{tipo="{tipo}"}} {valor}' for tipo, valor in tokens.items()]
+        lineas += [
+            "# HELP ddc_documentos_total Documentos extraídos con la API",
+            "# TYPE ddc_documentos_total counter",
+            f"ddc_documentos_total {documentos}",
+        ]
+        for nombre in sorted({nombre for nombre, _ in contadores}):
+            lineas.append(f"# TYPE ddc_{nombre}_total counter")
+            for (otro, claves), valor in sorted(contadores.items()):
+                if otro == nombre:
+                    etiquetas = ",".join(f'{clave}="{dato}"' for clave, dato in claves)
+                    lineas.append(f"ddc_{nombre}_total{{{etiquetas}}} {valor}" if etiquetas else f"ddc_{nombre}_total {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def escribir_prometheus(self, ruta):
+        """Reescribe el archivo de forma atómica (apto para el textfile collector de node_exporter)"""
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporal, ruta)
+
+
+def iniciar_servidor_metricas(registro_metricas, puerto):
+    """Sirve GET /metrics en un hilo; devuelve el servidor"""
+
+    class Manejador(BaseHTTPRequestHandler):
+        def log_message(self, formato, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            datos = registro_metricas.texto_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def registro():
+    """Registro de métricas del proceso (se crea al primer uso; el endpoint solo en el proceso principal)"""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = RegistroMetricas(
+                ruta_log=os.environ.get("DDC_METRICS_LOG", METRICAS_LOG_DEFAULT) or None,
+                ruta_prometheus=os.environ.get("DDC_METRICS_FILE") or None,
+            )
+            puerto = os.environ.get("DDC_METRICS_PORT")
+            if puerto and multiprocessing.parent_process() is None:
+                try:
+                    iniciar_servidor_metricas(_registro, int(puerto))
+                except OSError:
+                    pass  # otro proceso de la aplicación ya sirve el endpoint
+    return _registro
+
+
+@contextmanager
+def medir(etapa, destino=None):
+    """Mide la duración del bloque y la observa en el registro; con destino, la guarda en destino['segundos_<etapa>']"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        registro().observar(etapa, segundos)
+        if destino is not None:
+            destino[f"segundos_{etapa}"] = segundos
@@ -0,0 +1,351 @@
+"""Servidor local que imita la Messages API de Anthropic, para pruebas y benchmarks sin red.
+
+Uso:
+    python -m ddc.mock_api --puerto 8765 --latencia 0.5
+
+y después apuntar el cliente al servidor:
+    client = anthropic.Anthropic(api_key="simulada", base_url="http://127.0.0.1:8765")
+    extract_fields_with_ai(texto, "simulada", client=client)
+
+Admite "stream": true (eventos SSE como la API real). Si la petición trae "tools", responde con un bloque
+tool_use para la primera herramienta (en streaming, con eventos input_json_delta). Simula la caché de prompt: la primera vez que llega un bloque de sistema con cache_control
+se cuenta como cache_creation_input_tokens y las siguientes como cache_read_input_tokens.
+
+Los modelos "haiku" responden con FACTOR_LATENCIA_RAPIDO de la latencia y dejan vacíos los campos de
+--fallos-rapido, para probar el enrutamiento por niveles (ddc.enrutador).
+
+Con --limite-rpm, cada modelo tiene un saldo de ese número de peticiones que se repone de forma continua
+(como la API real, que no usa ventanas fijas de un minuto): las respuestas llevan las cabeceras anthropic-ratelimit-requests-* y las que sobran reciben un 429 con
+retry-after, para probar el gobernador de límites (ddc.gobernador).
+
+También imita la Message Batches API (POST /v1/messages/batches, GET /v1/messages/batches/{id} y
+/v1/messages/batches/{id}/results): un lote queda "ended" cuando pasan --latencia-lote segundos desde su creación.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ddc.esquema import CAMPOS
+from ddc.reduccion import estimar_tokens
+
+# Caracteres por evento content_block_delta en las respuestas en streaming
+TAMANO_FRAGMENTO = 16
+FACTOR_LATENCIA_RAPIDO = 0.4
+
+VALORES_SIMULADOS = {
+    "Ciclo": "Ciclo VI - Secundaria",
+    "Grado": "1° de secundaria",
+    "Duración": "05:30",
+    "URL": "https://ejemplo.org/recurso",
+    "Orientación de uso": "**Familiarización con el problema**\n\n- Presentar la situación problemática",
+}
+
+
+def campos_pedidos(texto_usuario):
+    """Campos que pide el turno del usuario (todos si no hay subconjunto)"""
+    if "extrae SOLO estos campos" not in texto_usuario:
+        return list(CAMPOS)
+    bloque = texto_usuario.split("TEXTO DEL PDF:")[0].split("\n\n")[0]
+    return [linea[2:].strip() for linea in bloque.splitlines() if linea.startswith("- ")]
+
+
+def _texto(contenido):
+    """Texto plano de un campo content/system (str o lista de bloques)"""
+    if isinstance(contenido, str):
+        return contenido
+    return "".join(bloque.get("text", "") for bloque in contenido or [])
+
+
+class EstadoSimulado:
+    """Contadores y bloques cacheados del servidor simulado"""
+
+    def __init__(self, latencia=0.0, latencia_por_token=0.0, latencia_lote=0.0, fallos_rapido=(), limite_rpm=0):
+        self.latencia = latencia
+        self.latencia_por_token = latencia_por_token
+        self.latencia_lote = latencia_lote
+        self.fallos_rapido = set(fallos_rapido)
+        self.limite_rpm = limite_rpm
+        self.saldos = {}  # modelo -> (peticiones disponibles, instante de la última reposición)
+        self.rechazadas = 0
+        self.peticiones = 0
+        self.cacheados = set()
+        self.lotes = {}  # id -> {"creado": time.time(), "peticiones": [...]}
+        self.lock = threading.Lock()
+
+    def latencias(self, modelo):
+        """(segundos fijos, segundos por token) de las respuestas de ese modelo"""
+        factor = FACTOR_LATENCIA_RAPIDO if es_rapido(modelo) else 1.0
+        return self.latencia * factor, self.latencia_por_token * factor
+
+    def admitir(self, modelo):
+        """(admitida, cabeceras) según --limite-rpm; sin límite siempre se admite y no hay cabeceras"""
+        if not self.limite_rpm:
+            return True, {}
+        ahora = time.monotonic()
+        with self.lock:
+            saldo, instante = self.saldos.get(modelo, (float(self.limite_rpm), ahora))
+            saldo = min(float(self.limite_rpm), saldo + (ahora - instante) * self.limite_rpm / 60)
+            admitida = saldo >= 1
+            if admitida:
+                saldo -= 1
+            else:
+                self.rechazadas += 1
+            self.saldos[modelo] = (saldo, ahora)
+        cabeceras = {
+            "anthropic-ratelimit-requests-limit": str(self.limite_rpm),
+            "anthropic-ratelimit-requests-remaining": str(int(saldo)),
+        }
+        if not admitida:
+            cabeceras["retry-after"] = str(int((1 - saldo) * 60 / self.limite_rpm) + 1)
+        return admitida, cabeceras
+
+    def uso_de_entrada(self, system):
+        """Reparte los tokens de sistema entre escritura y lectura de caché como haría la API"""
+        creados = leidos = normales = 0
+        bloques = [system] if isinstance(system, str) else (system or [])
+        for bloque in bloques:
+            texto = bloque if isinstance(bloque, str) else bloque.get("text", "")
+            tokens = estimar_tokens(texto)
+            if isinstance(bloque, dict) and bloque.get("cache_control"):
+                clave = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+                with self.lock:
+                    if clave in self.cacheados:
+                        leidos += tokens
+                    else:
+                        self.cacheados.add(clave)
+                        creados += tokens
+            else:
+                normales += tokens
+        return creados, leidos, normales
+
+
+def es_rapido(modelo):
+    return "haiku" in (modelo or "")
+
+
+def construir_respuesta(peticion, estado):
+    """Mensaje de respuesta con los campos simulados (JSON en texto o llamada a herramienta) y el uso de tokens"""
+    texto_usuario = "".join(_texto(m.get("content")) for m in peticion.get("messages", []) if m.get("role") == "user")
+    fields = {campo: VALORES_SIMULADOS.get(campo, f"valor simulado de {campo}") for campo in campos_pedidos(texto_usuario)}
+    if es_rapido(peticion.get("model")):
+        fields.update({campo: "" for campo in fields if campo in estado.fallos_rapido})
+    salida = json.dumps(fields, ensure_ascii=False, indent=4)
+    creados, leidos, normales = estado.uso_de_entrada(peticion.get("system"))
+    herramientas = peticion.get("tools") or []
+    if herramientas:
+        normales += estimar_tokens(json.dumps(herramientas, ensure_ascii=False))
+        contenido = {"type": "tool_use", "id": f"toolu_simulado_{uuid.uuid4().hex[:24]}",
+                     "name": herramientas[0]["name"], "input": fields}
+    else:
+        contenido = {"type": "text", "text": salida}
+    return {
+        "id": f"msg_simulado_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": peticion.get("model", ""),
+        "content": [contenido],
+        "stop_reason": "tool_use" if herramientas else "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": normales + estimar_tokens(texto_usuario),
+            "output_tokens": estimar_tokens(salida),
+            "cache_creation_input_tokens": creados,
+            "cache_read_input_tokens": leidos,
+        },
+    }
+
+
+def _fecha(segundos):
+    return datetime.datetime.fromtimestamp(segundos, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def objeto_lote(lote_id, lote, url_base):
+    """Objeto MessageBatch con el estado según el tiempo transcurrido"""
+    terminado = time.time() - lote["creado"] >= lote["latencia"]
+    total = len(lote["peticiones"])
+    return {
+        "id": lote_id,
+        "type": "message_batch",
+        "processing_status": "ended" if terminado else "in_progress",
+        "request_counts": {
+            "processing": 0 if terminado else total,
+            "succeeded": total if terminado else 0,
+            "errored": 0, "canceled": 0, "expired": 0,
+        },
+        "created_at": _fecha(lote["creado"]),
+        "expires_at": _fecha(lote["creado"] + 24 * 3600),
+        "ended_at": _fecha(lote["creado"] + lote["latencia"]) if terminado else None,
+        "cancel_initiated_at": None,
+        "archived_at": None,
+        "results_url": f"{url_base}/v1/messages/batches/{lote_id}/results" if terminado else None,
+    }
+
+
+class ManejadorSimulado(BaseHTTPRequestHandler):
+    estado = None  # se asigna al crear el servidor
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo, cabeceras=None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer_json(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(largo) or b"{}")
+
+    def _no_encontrado(self):
+        self._responder(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+    def do_GET(self):
+        ruta = self.path.split("?")[0]
+        if ruta == "/mock/estadisticas":
+            self._responder(200, {"peticiones": self.estado.peticiones, "bloques_cacheados": len(self.estado.cacheados),
+                                  "lotes": len(self.estado.lotes), "rechazadas": self.estado.rechazadas})
+        elif ruta.startswith("/v1/messages/batches/"):
+            self._get_lote(ruta[len("/v1/messages/batches/"):])
+        else:
+            self._no_encontrado()
+
+    def _get_lote(self, resto):
+        lote_id, _, sufijo = resto.partition("/")
+        lote = self.estado.lotes.get(lote_id)
+        if lote is None or sufijo not in ("", "results"):
+            self._no_encontrado()
+            return
+        objeto = objeto_lote(lote_id, lote, self.server.url)
+        if not sufijo:
+            self._responder(200, objeto)
+            return
+        if objeto["processing_status"] != "ended":
+            self._no_encontrado()
+            return
+        lineas = []
+        for peticion in lote["peticiones"]:
+            mensaje = construir_respuesta(peticion["params"], self.estado)
+            lineas.append(json.dumps({"custom_id": peticion["custom_id"],
+                                      "result": {"type": "succeeded", "message": mensaje}}, ensure_ascii=False))
+        datos = ("\n".join(lineas) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _crear_lote(self, cuerpo):
+        lote_id = f"msgbatch_simulado_{uuid.uuid4().hex[:24]}"
+        lote = {"creado": time.time(), "latencia": self.estado.latencia_lote, "peticiones": cuerpo.get("requests", [])}
+        with self.estado.lock:
+            self.estado.lotes[lote_id] = lote
+        self._responder(200, objeto_lote(lote_id, lote, self.server.url))
+
+    def do_POST(self):
+        ruta = self.path.split("?")[0]
+        if ruta == "/v1/messages/batches":
+            self._crear_lote(self._leer_json())
+            return
+        if ruta != "/v1/messages":
+            self._no_encontrado()
+            return
+        peticion = self._leer_json()
+        admitida, cabeceras = self.estado.admitir(peticion.get("model"))
+        if not admitida:
+            self._responder(429, {"type": "error", "error": {"type": "rate_limit_error",
+                                                             "message": "Límite de solicitudes simulado"}}, cabeceras)
+            return
+        with self.estado.lock:
+            self.estado.peticiones += 1
+        respuesta = construir_respuesta(peticion, self.estado)
+        if peticion.get("stream"):
+            self._responder_stream(respuesta, cabeceras)
+            return
+        latencia, por_token = self.estado.latencias(respuesta["model"])
+        time.sleep(latencia + por_token * respuesta["usage"]["output_tokens"])
+        self._responder(200, respuesta, cabeceras)
+
+    def _evento(self, tipo, datos):
+        self.wfile.write(f"event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _responder_stream(self, respuesta, cabeceras=None):
+        """Envía la respuesta como eventos SSE, repartiendo la latencia por token entre los fragmentos"""
+        bloque = respuesta["content"][0]
+        if bloque["type"] == "tool_use":
+            texto = json.dumps(bloque["input"], ensure_ascii=False)
+            inicio_bloque = dict(bloque, input={})
+            delta = lambda fragmento: {"type": "input_json_delta", "partial_json": fragmento}
+        else:
+            texto = bloque["text"]
+            inicio_bloque = {"type": "text", "text": ""}
+            delta = lambda fragmento: {"type": "text_delta", "text": fragmento}
+        uso = respuesta["usage"]
+        latencia, por_token = self.estado.latencias(respuesta["model"])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        time.sleep(latencia)
+        inicial = dict(respuesta, content=[], stop_reason=None, usage=dict(uso, output_tokens=1))
+        self._evento("message_start", {"type": "message_start", "message": inicial})
+        self._evento("content_block_start", {"type": "content_block_start", "index": 0,
+                                             "content_block": inicio_bloque})
+        for i in range(0, len(texto), TAMANO_FRAGMENTO):
+            fragmento = texto[i:i + TAMANO_FRAGMENTO]
+            time.sleep(por_token * estimar_tokens(fragmento))
+            self._evento("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                 "delta": delta(fragmento)})
+        self._evento("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._evento("message_delta", {"type": "message_delta",
+                                       "delta": {"stop_reason": respuesta["stop_reason"], "stop_sequence": None},
+                                       "usage": {"output_tokens": uso["output_tokens"]}})
+        self._evento("message_stop", {"type": "message_stop"})
+
+
+def iniciar_servidor(puerto=0, latencia=0.0, latencia_por_token=0.0, latencia_lote=0.0, fallos_rapido=(),
+                     limite_rpm=0):
+    """Arranca el servidor en un hilo; devuelve el servidor (con .url y .estado). Detener con .shutdown()"""
+    estado = EstadoSimulado(latencia, latencia_por_token, latencia_lote, fallos_rapido, limite_rpm)
+    manejador = type("Manejador", (ManejadorSimulado,), {"estado": estado})
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), manejador)
+    servidor.daemon_threads = True
+    servidor.estado = estado
+    servidor.url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita la Messages API de Anthropic")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos fijos por respuesta")
+    parser.add_argument("--latencia-por-token", type=float, default=0.0, help="Segundos extra por token de salida")
+    parser.add_argument("--latencia-lote", type=float, default=5.0, help="Segundos hasta que un lote termina")
+    parser.add_argument("--fallos-rapido", nargs="*", default=[], metavar="CAMPO",
+                        help="Campos que el modelo rápido devuelve vacíos")
+    parser.add_argument("--limite-rpm", type=int, default=0, help="Peticiones por minuto y modelo (0: sin límite)")
+    args = parser.parse_args(argv)
+    servidor = iniciar_servidor(args.puerto, args.latencia, args.latencia_por_token, args.latencia_lote,
+                                args.fallos_rapido, args.limite_rpm)
+    print(f"Servidor simulado en {servidor.url} (Ctrl+C para salir)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import re
+from collections import Counter
+
+# ============================================
+# REDUCCIÓN DEL TEXTO ANTES DEL PROMPT
+# ============================================
+# Cambia VERSION_REDUCCION al modificar las reglas: forma parte de la clave de la caché de extracciones
+VERSION_REDUCCION = "r2"
+
+# Líneas que el prompt ya pide ignorar y números de página con rótulo. Los códigos como 18107 no se
+# quitan aquí (un año o un valor numérico tiene la misma forma): si se repiten en cada página, caen
+# con las cabeceras y pies
+BOILERPLATE = [
+    re.compile(r"PIP\s+Mejoramiento\s+de\s+las\s+oportunidades", re.IGNORECASE),
+    re.compile(r"^p[áa]g(ina)?\.?\s*\d{1,4}(\s*(de|/)\s*\d{1,4})?$", re.IGNORECASE),
+]
+# Números de página sin rótulo ("7", "7 de 12", "7/12"): solo en las líneas del borde de la página
+NUMERO_PAGINA = re.compile(r"^\d{1,3}(\s*(de|/)\s*\d{1,4})?$")
+
+# Secciones que no aportan a ninguno de los 18 campos: se omiten hasta el siguiente encabezado relevante
+SECCION_IRRELEVANTE = re.compile(
+    r"^(referencias(\s+bibliogr[áa]ficas)?|bibliograf[íi]a|[íi]ndice|tabla\s+de\s+contenidos?|glosario|anexos?\b.*)\s*:?$",
+    re.IGNORECASE,
+)
+SECCION_RELEVANTE = re.compile(
+    r"^(área|ciclo|grado|nivel|descripci[óo]n|competencias?|capacidad(es)?|desempeños?|orientaci[óo]n|"
+    r"tipo\s+de|idioma|etiquetas|duraci[óo]n|url|enlace|autor|proveedor|publicador|licencia)\b",
+    re.IGNORECASE,
+)
+
+ESPACIOS = re.compile(r"[ \t ]+")
+DIGITOS = re.compile(r"\d+")
+
+# Cabeceras/pies: se buscan en las primeras y últimas líneas de cada página
+LINEAS_BORDE = 3
+MIN_PAGINAS_REPETICION = 3
+FRACCION_REPETICION = 0.5
+
+CARACTERES_POR_TOKEN = 3.5
+
+
+def estimar_tokens(texto):
+    """Estimación rápida de tokens (sin llamar a la API)"""
+    return int(len(texto) / CARACTERES_POR_TOKEN) + 1 if texto else 0
+
+
+def _normalizar(linea):
+    """Línea comparable entre páginas: sin espacios extra y con los números igualados"""
+    return DIGITOS.sub("#", ESPACIOS.sub(" ", linea).strip().lower())
+
+
+def detectar_cabeceras_pies(paginas):
+    """Devuelve las líneas normalizadas que se repiten en el borde de muchas páginas"""
+    if len(paginas) < MIN_PAGINAS_REPETICION:
+        return set()
+    conteo = Counter()
+    for texto in paginas:
+        lineas = [linea for linea in texto.splitlines() if linea.strip()]
+        borde = lineas[:LINEAS_BORDE] + lineas[-LINEAS_BORDE:]
+        conteo.update({_normalizar(linea) for linea in borde})
+    minimo = max(MIN_PAGINAS_REPETICION, int(len(paginas) * FRACCION_REPETICION))
+    return {linea for linea, veces in conteo.items() if veces >= minimo and linea}
+
+
+def reducir_paginas(paginas):
+    """Limpia el texto de las páginas para el prompt y devuelve (texto, reporte)"""
+    repetidas = detectar_cabeceras_pies(paginas)
+    lineas_salida = []
+    omitidas = Counter()
+    secciones_omitidas = []
+    en_seccion_irrelevante = False
+    vistas = set()
+
+    for texto in paginas:
+        lineas = [ESPACIOS.sub(" ", linea).strip() for linea in texto.splitlines()]
+        con_texto = [i for i, linea in enumerate(lineas) if linea]
+        borde = set(con_texto[:LINEAS_BORDE] + con_texto[-LINEAS_BORDE:])
+        for i, linea in enumerate(lineas):
+            if not linea:
+                if lineas_salida and lineas_salida[-1]:
+                    lineas_salida.append("")
+                continue
+            if repetidas:
+                normalizada = _normalizar(linea)
+                if normalizada in repetidas:
+                    # Se conserva la primera aparición: a veces la cabecera lleva el Área o el Grado
+                    if normalizada in vistas:
+                        omitidas["cabecera_pie"] += 1
+                        continue
+                    vistas.add(normalizada)
+            if any(patron.search(linea) for patron in BOILERPLATE) or (i in borde and NUMERO_PAGINA.match(linea)):
+                omitidas["boilerplate"] += 1
+                continue
+            if SECCION_IRRELEVANTE.match(linea):
+                en_seccion_irrelevante = True
+                secciones_omitidas.append(linea)
+                continue
+            if en_seccion_irrelevante:
+                if not SECCION_RELEVANTE.match(linea):
+                    omitidas["seccion_irrelevante"] += 1
+                    continue
+                en_seccion_irrelevante = False
+            lineas_salida.append(linea)
+
+    texto_reducido = "\n".join(lineas_salida).strip()
+    texto_original = "".join(paginas)
+    tokens_antes = estimar_tokens(texto_original)
+    tokens_despues = estimar_tokens(texto_reducido)
+    reporte = {
+        "caracteres_antes": len(texto_original),
+        "caracteres_despues": len(texto_reducido),
+        "tokens_antes": tokens_antes,
+        "tokens_despues": tokens_despues,
+        "ahorro": 1 - tokens_despues / tokens_antes if tokens_antes else 0.0,
+        "lineas_omitidas": dict(omitidas),
+        "cabeceras_pies": sorted(repetidas),
+        "secciones_omitidas": secciones_omitidas,
+    }
+    return texto_reducido, reporte
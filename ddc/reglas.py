@@ -0,0 +1,227 @@
+import re
+import time
+
+from ddc.enrutador import modelo_inicial, plan_escalado, registrar_llamada
+from ddc.esquema import CAMPOS, DURACION_RE, URL_RE, errores_de_forma, validar_campos
+from ddc.extractor import clean_nivel, extract_fields_with_ai, extract_fields_with_ai_async
+from ddc.fragmentos import extraer_por_fragmentos, extraer_por_fragmentos_async, usar_fragmentos
+
+# ============================================
+# EXTRACCIÓN POR REGLAS (líneas "Etiqueta: valor")
+# ============================================
+
+# Etiquetas aceptadas por campo; el valor es el resto de la línea
+ETIQUETAS = {
+    "Área": r"[áa]rea(\s+curricular)?",
+    "Ciclo": r"ciclo|nivel(\s+educativo)?",
+    "Grado": r"grados?",
+    "URL": r"url|enlace|link",
+    "Duración": r"duraci[óo]n|tiempo(\s+de\s+duraci[óo]n)?",
+    "Autor": r"autor(es|a)?",
+    "Proveedor": r"proveedor",
+    "Publicador": r"publicador|editor(ial)?",
+    "Licencia": r"licencia",
+    "Idioma": r"idioma|lengua",
+}
+
+PATRONES = {
+    campo: re.compile(rf"^[ \t•\-*]*(?:{etiqueta})[ \t]*:[ \t]*(?P<valor>\S.*?)[ \t]*$", re.IGNORECASE | re.MULTILINE)
+    for campo, etiqueta in ETIQUETAS.items()
+}
+
+GRADO_RE = re.compile(r"\d\s*[°º.]?|primer|segundo|tercer|cuarto|quinto|sexto", re.IGNORECASE)
+MAX_LARGO_VALOR = 150
+
+
+def _valido(campo, valor):
+    """Valida el valor encontrado para el campo; los no válidos se dejan al modelo"""
+    if not valor or len(valor) > MAX_LARGO_VALOR:
+        return False
+    if campo == "Ciclo":
+        return clean_nivel(valor) in ("Primaria", "Secundaria")
+    if campo == "Duración":
+        return bool(DURACION_RE.match(valor))
+    if campo == "URL":
+        return bool(URL_RE.match(valor))
+    if campo == "Grado":
+        return bool(GRADO_RE.search(valor))
+    return True
+
+
+def extraer_campos_por_reglas(texto):
+    """Busca los campos de etiqueta fija; devuelve solo los encontrados y válidos"""
+    campos = {}
+    for campo, patron in PATRONES.items():
+        for coincidencia in patron.finditer(texto):
+            valor = coincidencia.group("valor").strip()
+            if _valido(campo, valor):
+                campos[campo] = valor
+                break
+    return campos
+
+
+def combinar(por_reglas, por_modelo, reintentados=(), invalidos=(), escalados=(), reutilizados=()):
+    """Une ambos resultados en el orden de CAMPOS y anota el origen de cada campo"""
+    fields = {}
+    origen = {}
+    for campo in CAMPOS:
+        if campo in por_reglas:
+            fields[campo] = por_reglas[campo]
+            origen[campo] = "reglas"
+        else:
+            fields[campo] = por_modelo.get(campo, "")
+            if campo in reutilizados:
+                origen[campo] = "reutilizado"
+            elif campo in invalidos:
+                origen[campo] = "inválido"
+            elif campo in escalados:
+                origen[campo] = "escalado"
+            elif campo in reintentados:
+                origen[campo] = "reintento"
+            else:
+                origen[campo] = "modelo"
+    return fields, origen
+
+
+def _aplicar_reintento(por_modelo, invalidos, corregidos, campos=None):
+    """Toma de la segunda llamada solo los valores válidos: devuelve (reemplazados, siguen_invalidos).
+
+    campos: los pedidos en la segunda llamada (por defecto, los inválidos); al escalar el documento entero
+    también se reemplazan los campos que ya eran válidos.
+    """
+    campos = list(campos or invalidos)
+    no_validos = validar_campos(corregidos, campos)
+    reemplazados = [campo for campo in campos if campo not in no_validos]
+    for campo in reemplazados:
+        por_modelo[campo] = corregidos[campo]
+    return reemplazados, [campo for campo in invalidos if campo in no_validos]
+
+
+def _separar_origen(motivo, reemplazados):
+    """(reintentados, escalados) según el motivo de la segunda llamada"""
+    return (reemplazados, []) if motivo == "reintento" else ([], reemplazados)
+
+
+def _pedir_al_modelo(pdf_text, api_key, campos, metricas, client, modelo, al_recibir_campo=None,
+                     correcciones=None, detalle=None, inicial=False):
+    """Una llamada con todo el texto o, si el texto es muy largo, una por fragmento relevante"""
+    parcial = {}
+    inicio = time.perf_counter()
+    if not usar_fragmentos(pdf_text):
+        fields = extract_fields_with_ai(
+            pdf_text, api_key, campos, metricas=parcial, client=client, al_recibir_campo=al_recibir_campo,
+            correcciones=correcciones, modelo=modelo
+        )
+    else:
+        fields = extraer_por_fragmentos(
+            pdf_text, api_key, campos, metricas=parcial, client=client, correcciones=correcciones,
+            detalle=detalle, modelo=modelo
+        )
+        if al_recibir_campo:
+            for campo in campos:
+                al_recibir_campo(campo, fields.get(campo, ""))
+    registrar_llamada(modelo, parcial, time.perf_counter() - inicio, metricas, inicial)
+    return fields
+
+
+async def _pedir_al_modelo_async(pdf_text, client, campos, metricas, modelo, correcciones=None, detalle=None,
+                                 inicial=False):
+    parcial = {}
+    inicio = time.perf_counter()
+    if not usar_fragmentos(pdf_text):
+        fields = await extract_fields_with_ai_async(
+            pdf_text, client, campos, metricas=parcial, correcciones=correcciones, modelo=modelo
+        )
+    else:
+        fields = await extraer_por_fragmentos_async(
+            pdf_text, client, campos, metricas=parcial, correcciones=correcciones, detalle=detalle, modelo=modelo
+        )
+    registrar_llamada(modelo, parcial, time.perf_counter() - inicio, metricas, inicial)
+    return fields
+
+
+def _separar_reutilizables(por_reglas, reutilizables):
+    """Campos de un casi duplicado que se usan tal cual (los de reglas, del propio texto, tienen prioridad)"""
+    return {campo: valor for campo, valor in (reutilizables or {}).items() if campo not in por_reglas}
+
+
+def extraer_campos_hibrido(pdf_text, api_key, metricas=None, client=None, al_recibir_campo=None, detalle=None,
+                           reutilizables=None):
+    """Resuelve por reglas lo que se pueda y pide a Claude solo el resto: devuelve (fields, origen).
+
+    El resto va primero al modelo rápido; lo que no pasa la validación se pide al modelo grande
+    (ver ddc.enrutador). Con al_recibir_campo, los campos de reglas se entregan al instante y los del
+    modelo en streaming. detalle: dict opcional con el plan de fragmentos cuando el texto es demasiado
+    largo para una llamada. reutilizables: {campo: valor} de un casi duplicado (ddc.duplicados) que no
+    se vuelven a pedir.
+    """
+    por_reglas = extraer_campos_por_reglas(pdf_text)
+    reutilizados = _separar_reutilizables(por_reglas, reutilizables)
+    if al_recibir_campo:
+        for campo, valor in {**por_reglas, **reutilizados}.items():
+            al_recibir_campo(campo, valor)
+    faltantes = [campo for campo in CAMPOS if campo not in por_reglas and campo not in reutilizados]
+    por_modelo = dict(reutilizados)
+    reintentados = escalados = siguen = []
+    if faltantes:
+        modelo = modelo_inicial(pdf_text)
+        # La herramienta devuelve los 18 campos: los no pedidos llegan vacíos y no deben pisar a los ya resueltos
+        def al_recibir_pedido(campo, valor):
+            if campo in faltantes:
+                al_recibir_campo(campo, valor)
+
+        respuesta = _pedir_al_modelo(
+            pdf_text, api_key, faltantes, metricas, client, modelo,
+            al_recibir_campo=al_recibir_pedido if al_recibir_campo else None, detalle=detalle, inicial=True
+        )
+        por_modelo.update({campo: respuesta.get(campo, "") for campo in faltantes})
+        # Una sola llamada más: los campos inválidos (o todo el documento) al modelo grande
+        invalidos = validar_campos(por_modelo, faltantes)
+        if invalidos:
+            siguiente, campos, motivo = plan_escalado(modelo, invalidos, faltantes)
+            corregidos = _pedir_al_modelo(
+                pdf_text, api_key, campos, metricas, client, siguiente, correcciones=errores_de_forma(invalidos)
+            )
+            reemplazados, siguen = _aplicar_reintento(por_modelo, invalidos, corregidos, campos)
+            reintentados, escalados = _separar_origen(motivo, reemplazados)
+            if al_recibir_campo:
+                for campo in reemplazados:
+                    al_recibir_campo(campo, por_modelo[campo])
+    return combinar(por_reglas, por_modelo, reintentados, siguen, escalados, reutilizados)
+
+
+async def extraer_campos_hibrido_async(pdf_text, client, metricas=None, detalle=None, reutilizables=None):
+    """Versión asíncrona de extraer_campos_hibrido con un cliente AsyncAnthropic compartido"""
+    por_reglas = extraer_campos_por_reglas(pdf_text)
+    reutilizados = _separar_reutilizables(por_reglas, reutilizables)
+    faltantes = [campo for campo in CAMPOS if campo not in por_reglas and campo not in reutilizados]
+    por_modelo = dict(reutilizados)
+    reintentados = escalados = siguen = []
+    if faltantes:
+        modelo = modelo_inicial(pdf_text)
+        respuesta = await _pedir_al_modelo_async(
+            pdf_text, client, faltantes, metricas, modelo, detalle=detalle, inicial=True
+        )
+        por_modelo.update({campo: respuesta.get(campo, "") for campo in faltantes})
+        invalidos = validar_campos(por_modelo, faltantes)
+        if invalidos:
+            siguiente, campos, motivo = plan_escalado(modelo, invalidos, faltantes)
+            corregidos = await _pedir_al_modelo_async(
+                pdf_text, client, campos, metricas, siguiente, correcciones=errores_de_forma(invalidos)
+            )
+            reemplazados, siguen = _aplicar_reintento(por_modelo, invalidos, corregidos, campos)
+            reintentados, escalados = _separar_origen(motivo, reemplazados)
+    return combinar(por_reglas, por_modelo, reintentados, siguen, escalados, reutilizados)
+
+
+def resumen_origen(origen):
+    """Campos resueltos por reglas, reutilizados de un casi duplicado, por el modelo, por el reintento
+    dirigido, por el modelo grande tras escalar y los que siguen sin validar"""
+    return {
+        "reglas": [campo for campo, fuente in origen.items() if fuente == "reglas"],
+        "reutilizado": [campo for campo, fuente in origen.items() if fuente == "reutilizado"],
+        "modelo": [campo for campo, fuente in origen.items() if fuente == "modelo"],
+        "reintento": [campo for campo, fuente in origen.items() if fuente == "reintento"],
+        "escalado": [campo for campo, fuente in origen.items() if fuente == "escalado"],
+        "inválido": [campo for campo, fuente in origen.items() if fuente == "inválido"],
+    }
@@ -0,0 +1,123 @@
+import json
+
+# ============================================
+# PARSER JSON INCREMENTAL
+# ============================================
+
+
+class ParserJSONIncremental:
+    """Lee un objeto JSON que llega por fragmentos y entrega cada miembro de primer nivel en cuanto se cierra.
+
+    Ignora lo que venga antes de la primera llave (por ejemplo, un ```json que el modelo añada).
+    Los valores anidados (objetos o listas) se entregan completos al cerrarse.
+    """
+
+    def __init__(self):
+        self._estado = "antes"      # antes, clave, en_clave, dos_puntos, valor, en_valor, coma, fin
+        self._buffer = []
+        self._clave = None
+        self._en_string = False
+        self._escape = False
+        self._profundidad = 0
+        self._es_string = False
+
+    @property
+    def terminado(self):
+        return self._estado == "fin"
+
+    def feed(self, fragmento):
+        """Procesa un fragmento y devuelve la lista de (clave, valor) completados en él"""
+        completados = []
+        for c in fragmento:
+            estado = self._estado
+            if estado == "antes":
+                if c == "{":
+                    self._estado = "clave"
+            elif estado == "clave":
+                if c == '"':
+                    self._estado = "en_clave"
+                    self._buffer = []
+                elif c == "}":
+                    self._estado = "fin"
+            elif estado == "en_clave":
+                if self._escape:
+                    self._escape = False
+                    self._buffer.append(c)
+                elif c == "\\":
+                    self._escape = True
+                    self._buffer.append(c)
+                elif c == '"':
+                    self._clave = json.loads('"' + "".join(self._buffer) + '"')
+                    self._estado = "dos_puntos"
+                else:
+                    self._buffer.append(c)
+            elif estado == "dos_puntos":
+                if c == ":":
+                    self._estado = "valor"
+            elif estado == "valor":
+                if c.isspace():
+                    continue
+                self._buffer = [c]
+                self._estado = "en_valor"
+                self._es_string = c == '"'
+                self._en_string = self._es_string
+                self._escape = False
+                self._profundidad = 1 if c in "{[" else 0
+            elif estado == "en_valor":
+                cierre = self._consumir_valor(c, completados)
+                if cierre == "separador" and c == "}":
+                    self._estado = "fin"
+                elif cierre == "separador" and c == ",":
+                    self._estado = "clave"
+                elif cierre:
+                    self._estado = "coma"
+            elif estado == "coma":
+                if c == ",":
+                    self._estado = "clave"
+                elif c == "}":
+                    self._estado = "fin"
+        return completados
+
+    def _consumir_valor(self, c, completados):
+        """Añade un carácter al valor actual.
+
+        Devuelve None si el valor sigue abierto, "propio" si lo cerró su último carácter
+        (comilla, llave o corchete) o "separador" si lo cerró un carácter que ya no le pertenece.
+        """
+        if self._en_string:
+            self._buffer.append(c)
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._en_string = False
+                if self._es_string and self._profundidad == 0:
+                    self._cerrar(completados)
+                    return "propio"
+            return None
+
+        if self._profundidad == 0:
+            # Escalar (número, true, false, null): termina en separador
+            if c in ",}" or c.isspace():
+                self._cerrar(completados)
+                return "separador"
+            self._buffer.append(c)
+            return None
+
+        self._buffer.append(c)
+        if c == '"':
+            self._en_string = True
+        elif c in "{[":
+            self._profundidad += 1
+        elif c in "}]":
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                self._cerrar(completados)
+                return "propio"
+        return None
+
+    def _cerrar(self, completados):
+        valor = json.loads("".join(self._buffer))
+        completados.append((self._clave, valor))
+        self._buffer = []
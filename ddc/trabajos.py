@@ -0,0 +1,276 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from ddc.duplicados import resumen_duplicado
+from ddc.extractor import PROMPT_VERSION
+from ddc.gobernador import contexto_api
+from ddc.metricas import registro
+from ddc.reglas import extraer_campos_hibrido, resumen_origen
+
+# ============================================
+# TRABAJOS DE EXTRACCIÓN EN SEGUNDO PLANO
+# ============================================
+# Las extracciones de la interfaz se encolan en SQLite y las ejecuta un pool de hilos del proceso,
+# fuera del script de Streamlit: recargar la página no las corta y la sesión vuelve a engancharse por
+# su id. Dos envíos del mismo PDF con la misma clave mientras uno sigue activo comparten trabajo.
+# Si el proceso se reinicia, los trabajos que quedaron en curso vuelven a la cola.
+# Configuración por variables de entorno:
+#   DDC_TRABAJOS             base de datos de la cola (.cache/trabajos.sqlite3); una por proceso servidor
+#   DDC_TRABAJADORES         hilos que ejecutan trabajos (2)
+#   DDC_TRABAJOS_DIAS        días que se conservan los trabajos terminados (7)
+
+COLA_DEFAULT = os.environ.get("DDC_TRABAJOS", os.path.join(".cache", "trabajos.sqlite3"))
+TRABAJADORES_DEFAULT = int(os.environ.get("DDC_TRABAJADORES", 2))
+DIAS_CONSERVACION = float(os.environ.get("DDC_TRABAJOS_DIAS", 7))
+MAX_INTENTOS = 3  # un trabajo interrumpido más veces se da por fallido
+ESPERA_SIN_TRABAJO = 5.0  # segundos; los envíos despiertan antes a los hilos
+
+FINALES = ("terminado", "error")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    clave TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    texto TEXT NOT NULL,
+    resultado TEXT,
+    error TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    creado REAL NOT NULL,
+    iniciado REAL,
+    actualizado REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS trabajos_activos ON trabajos (clave) WHERE estado IN ('pendiente', 'en_curso');
+CREATE INDEX IF NOT EXISTS trabajos_estado ON trabajos (estado, creado);
+"""
+
+COLUMNAS = "id, clave, estado, datos, resultado, error, intentos, creado, iniciado, actualizado"
+
+
+class ColaTrabajos:
+    """Cola durable de trabajos en SQLite (una conexión compartida, serializada con un lock)"""
+
+    def __init__(self, ruta=COLA_DEFAULT):
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self.ruta = ruta
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.row_factory = sqlite3.Row
+        with self.lock, self.conexion:
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.executescript(ESQUEMA)
+
+    def _activo(self, clave):
+        fila = self.conexion.execute(
+            "SELECT id FROM trabajos WHERE clave = ? AND estado IN ('pendiente', 'en_curso')", (clave,)
+        ).fetchone()
+        return fila["id"] if fila else None
+
+    def enviar(self, clave, texto, datos):
+        """Encola un trabajo y devuelve (id, nuevo); si ya hay uno activo con esa clave, devuelve el suyo"""
+        ahora = time.time()
+        trabajo_id = uuid.uuid4().hex
+        with self.lock, self.conexion:
+            existente = self._activo(clave)
+            if existente:
+                return existente, False
+            try:
+                self.conexion.execute(
+                    "INSERT INTO trabajos (id, clave, estado, datos, texto, creado, actualizado) "
+                    "VALUES (?, ?, 'pendiente', ?, ?, ?, ?)",
+                    (trabajo_id, clave, json.dumps(datos, ensure_ascii=False), texto, ahora, ahora)
+                )
+            except sqlite3.IntegrityError:
+                return self._activo(clave), False  # otro proceso lo encoló entre la consulta y el INSERT
+        return trabajo_id, True
+
+    def tomar(self):
+        """Marca en curso el trabajo pendiente más antiguo y lo devuelve con su texto, o None"""
+        with self.lock, self.conexion:
+            while True:
+                fila = self.conexion.execute(
+                    "SELECT id FROM trabajos WHERE estado = 'pendiente' ORDER BY creado LIMIT 1"
+                ).fetchone()
+                if fila is None:
+                    return None
+                ahora = time.time()
+                tomado = self.conexion.execute(
+                    "UPDATE trabajos SET estado = 'en_curso', intentos = intentos + 1, iniciado = ?, actualizado = ? "
+                    "WHERE id = ? AND estado = 'pendiente'", (ahora, ahora, fila["id"])
+                ).rowcount
+                if tomado:
+                    break
+            fila = self.conexion.execute(f"SELECT {COLUMNAS}, texto FROM trabajos WHERE id = ?",
+                                         (fila["id"],)).fetchone()
+        return self._trabajo(fila)
+
+    def terminar(self, trabajo_id, resultado):
+        """Guarda el resultado; el texto ya no hace falta y se borra"""
+        with self.lock, self.conexion:
+            self.conexion.execute(
+                "UPDATE trabajos SET estado = 'terminado', resultado = ?, texto = '', actualizado = ? WHERE id = ?",
+                (json.dumps(resultado, ensure_ascii=False), time.time(), trabajo_id)
+            )
+
+    def fallar(self, trabajo_id, error):
+        """error: {"tipo", "mensaje", "respuesta"} para que la interfaz lo muestre como antes"""
+        with self.lock, self.conexion:
+            self.conexion.execute(
+                "UPDATE trabajos SET estado = 'error', error = ?, texto = '', actualizado = ? WHERE id = ?",
+                (json.dumps(error, ensure_ascii=False), time.time(), trabajo_id)
+            )
+
+    def obtener(self, trabajo_id):
+        """Estado, datos y resultado del trabajo (sin el texto), o None"""
+        with self.lock:
+            fila = self.conexion.execute(f"SELECT {COLUMNAS} FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        return self._trabajo(fila) if fila else None
+
+    def posicion(self, trabajo_id):
+        """Trabajos pendientes por delante de este más él mismo (0 si ya no está pendiente)"""
+        with self.lock:
+            fila = self.conexion.execute(
+                "SELECT COUNT(*) FROM trabajos WHERE estado = 'pendiente' AND creado <= "
+                "(SELECT creado FROM trabajos WHERE id = ? AND estado = 'pendiente')", (trabajo_id,)
+            ).fetchone()
+        return fila[0]
+
+    def reanudar_interrumpidos(self):
+        """Devuelve a la cola los trabajos que el proceso anterior dejó en curso; devuelve cuántos"""
+        ahora = time.time()
+        with self.lock, self.conexion:
+            self.conexion.execute(
+                "UPDATE trabajos SET estado = 'error', texto = '', actualizado = ?, error = ? "
+                "WHERE estado = 'en_curso' AND intentos >= ?",
+                (ahora, json.dumps({"tipo": "Interrumpido", "mensaje": "El trabajo se interrumpió demasiadas veces",
+                                    "respuesta": None}), MAX_INTENTOS)
+            )
+            return self.conexion.execute(
+                "UPDATE trabajos SET estado = 'pendiente', actualizado = ? WHERE estado = 'en_curso'", (ahora,)
+            ).rowcount
+
+    def purgar(self, dias=DIAS_CONSERVACION):
+        """Borra los trabajos terminados o fallidos hace más de `dias`"""
+        with self.lock, self.conexion:
+            return self.conexion.execute(
+                "DELETE FROM trabajos WHERE estado IN ('terminado', 'error') AND actualizado < ?",
+                (time.time() - dias * 86400,)
+            ).rowcount
+
+    def contar(self):
+        """{estado: número de trabajos}"""
+        with self.lock:
+            filas = self.conexion.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado").fetchall()
+        return {estado: numero for estado, numero in filas}
+
+    def _trabajo(self, fila):
+        trabajo = dict(fila)
+        trabajo["datos"] = json.loads(trabajo["datos"])
+        for columna in ("resultado", "error"):
+            trabajo[columna] = json.loads(trabajo[columna]) if trabajo[columna] else None
+        return trabajo
+
+    def close(self):
+        self.conexion.close()
+
+
+class PoolTrabajos:
+    """Hilos del proceso que vacían la cola con `ejecutar(trabajo, al_recibir_campo) -> resultado`.
+
+    Los campos que llegan en streaming se guardan en memoria por trabajo para la vista en vivo.
+    """
+
+    def __init__(self, cola, ejecutar, hilos=TRABAJADORES_DEFAULT):
+        self.cola = cola
+        self.ejecutar = ejecutar
+        self.aviso = threading.Event()
+        self.lock = threading.Lock()
+        self.parciales = {}  # id -> {campo: valor}
+        self.reanudados = cola.reanudar_interrumpidos()
+        cola.purgar()
+        self.hilos = [threading.Thread(target=self._bucle, name=f"ddc-trabajo-{numero}", daemon=True)
+                      for numero in range(hilos)]
+        for hilo in self.hilos:
+            hilo.start()
+
+    def enviar(self, clave, texto, datos):
+        """Encola (o se une a un trabajo activo con la misma clave) y despierta a los hilos; devuelve (id, nuevo)"""
+        trabajo_id, nuevo = self.cola.enviar(clave, texto, datos)
+        if nuevo:
+            registro().sumar("trabajos_enviados")
+        else:
+            registro().sumar("trabajos_unidos")
+        self.aviso.set()
+        return trabajo_id, nuevo
+
+    def progreso(self, trabajo_id):
+        """Campos recibidos hasta ahora por un trabajo en curso"""
+        with self.lock:
+            return dict(self.parciales.get(trabajo_id, {}))
+
+    def _bucle(self):
+        while True:
+            self.aviso.clear()
+            trabajo = self.cola.tomar()
+            if trabajo is None:
+                self.aviso.wait(ESPERA_SIN_TRABAJO)
+                continue
+            self._ejecutar(trabajo)
+
+    def _ejecutar(self, trabajo):
+        trabajo_id = trabajo["id"]
+        registro().observar("espera_trabajo", trabajo["iniciado"] - trabajo["creado"])
+        with self.lock:
+            self.parciales[trabajo_id] = {}
+
+        def al_recibir_campo(campo, valor):
+            with self.lock:
+                self.parciales.setdefault(trabajo_id, {})[campo] = valor
+
+        try:
+            resultado = self.ejecutar(trabajo, al_recibir_campo)
+        except Exception as e:
+            registro().sumar("trabajos_fallidos")
+            self.cola.fallar(trabajo_id, {"tipo": type(e).__name__, "mensaje": str(e),
+                                          "respuesta": getattr(e, "respuesta", None)})
+        else:
+            self.cola.terminar(trabajo_id, resultado)
+        finally:
+            with self.lock:
+                self.parciales.pop(trabajo_id, None)
+
+
+def extraer_trabajo(api_key, almacen, extraction_cache, indice_duplicados, modelo, trabajo, al_recibir_campo=None):
+    """Extracción completa de un trabajo: casi duplicados, reglas + API, y guardado en caché y almacén.
+
+    datos del trabajo: {"clave", "archivo", "titulo", "sha256", "forzar", "sesion"}. Las llamadas a la API
+    esperan turno en ddc.gobernador con prioridad interactiva, a nombre de la sesión que envió el trabajo.
+    """
+    datos = trabajo["datos"]
+    texto = trabajo["texto"]
+    coincidencia = None if datos.get("forzar") else indice_duplicados.buscar(texto, excluir=datos["sha256"])
+    uso = {}
+    detalle = {}
+    with contexto_api(cliente=datos.get("sesion") or trabajo["id"], etiqueta=trabajo["id"], prioridad="interactiva"):
+        fields, origen = extraer_campos_hibrido(
+            texto, api_key, metricas=uso, al_recibir_campo=al_recibir_campo, detalle=detalle,
+            reutilizables=coincidencia["campos"] if coincidencia else None
+        )
+    almacen.guardar_firma(datos["sha256"], texto)
+    extraction_cache.put(datos["clave"], fields, archivo=datos["archivo"], modelo=modelo)
+    almacen.guardar(datos["sha256"], datos["titulo"], fields, archivo=datos["archivo"], modelo=modelo,
+                    prompt_version=PROMPT_VERSION)
+    registro().registrar_documento(datos["archivo"], uso, modelo, sha256=datos["sha256"])
+    return {
+        "fields": fields,
+        "origen": resumen_origen(origen),
+        "uso": uso,
+        "fragmentos": detalle,
+        "duplicado": resumen_duplicado(coincidencia) if coincidencia else None,
+    }
@@ -0,0 +1,312 @@
+import json
+import re
+
+from ddc.extractor import clean_nivel, limpiar_orientacion
+
+# ============================================
+# PALETA DE COLORES
+# ============================================
+COLOR_PRIMARY = "#1F0050"      # Morado oscuro - principal
+COLOR_SECONDARY = "#00E6DA"    # Cyan brillante - secundario
+COLOR_ACCENT_1 = "#00849D"     # Azul oscuro
+COLOR_ACCENT_2 = "#049A19"     # Verde oscuro
+COLOR_SUCCESS = "#6AE081"      # Verde claro - éxito
+COLOR_INFO = "#A23F97"         # Morado medio - info
+COLOR_WARNING = "#F39107"      # Naranja - advertencias
+COLOR_TEXT = "#FFFFFF"         # Blanco - texto sobre fondos oscuros
+
+def markdown_simple_a_html(texto):
+    """Convierte Markdown simple a HTML para que se copie limpio"""
+    if not texto:
+        return texto
+    
+    # Convertir **texto** a <strong>texto</strong>
+    texto = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', texto)
+    
+    # Convertir saltos de línea a <br>
+    texto = texto.replace('\n', '<br>')
+    
+    # Convertir listas con * en viñetas (•)
+    texto = re.sub(r'<br>\* ', '<br>• ', texto)
+    texto = re.sub(r'^(\* )', r'• ', texto)
+    
+    return texto
+
+def create_copy_button_simple(text, field_id):
+    """Botón con colores de la paleta y texto más grande"""
+    safe_text = text.replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n').replace('\r', '')
+    
+    html_code = f"""
+    <div style="margin-top: 5px; margin-bottom: 10px;">
+        <button onclick="copyText_{field_id}()" style="
+            background-color: {COLOR_SECONDARY};
+            color: {COLOR_PRIMARY};
+            border: none;
+            padding: 12px 24px;
+            border-radius: 8px;
+            cursor: pointer;
+            font-size: 16px;
+            font-weight: bold;
+            box-shadow: 0 3px 6px rgba(0,0,0,0.3);
+            transition: all 0.3s;
+        " onmouseover="this.style.backgroundColor='{COLOR_ACCENT_1}'; this.style.color='{COLOR_TEXT}';" 
+           onmouseout="this.style.backgroundColor='{COLOR_SECONDARY}'; this.style.color='{COLOR_PRIMARY}';">
+            📋 Copiar texto
+        </button>
+        
+        <span id="status_{field_id}" style="
+            margin-left: 15px;
+            color: {COLOR_SUCCESS};
+            font-size: 15px;
+            display: none;
+            font-weight: 600;
+        ">✅ ¡Copiado!</span>
+    </div>
+    
+    <script>
+    function copyText_{field_id}() {{
+        const text = '{safe_text}';
+        
+        const textarea = document.createElement('textarea');
+        textarea.value = text;
+        textarea.style.position = 'fixed';
+        textarea.style.opacity = '0';
+        document.body.appendChild(textarea);
+        textarea.select();
+        textarea.setSelectionRange(0, 99999);
+        
+        try {{
+            const success = document.execCommand('copy');
+            document.body.removeChild(textarea);
+            
+            if (success) {{
+                const status = document.getElementById('status_{field_id}');
+                status.style.display = 'inline';
+                setTimeout(() => {{
+                    status.style.display = 'none';
+                }}, 3000);
+            }} else {{
+                alert('No se pudo copiar. Intenta seleccionar manualmente.');
+            }}
+        }} catch (err) {{
+            document.body.removeChild(textarea);
+            alert('Error al copiar. Por favor, selecciona el texto manualmente.');
+        }}
+    }}
+    </script>
+    """
+    
+    return html_code
+
+# ============================================
+# VISTA DE RESULTADOS EN UN SOLO COMPONENTE
+# ============================================
+
+def construir_payload(fields, title):
+    """Datos de los Bloques 1 a 6 en el mismo orden y con las mismas limpiezas que la vista clásica"""
+    duracion = (fields.get("Duración", "") or "").replace(":", ".")
+    orientacion = limpiar_orientacion(fields.get("Orientación de uso", "")) or "No encontrado"
+    
+    def copiable(etiqueta, valor, field_id):
+        return {"tipo": "copiable", "etiqueta": etiqueta, "valor": valor or "No encontrado", "id": field_id}
+    
+    def info(etiqueta, valor):
+        return {"tipo": "info", "etiqueta": etiqueta, "valor": valor or "No encontrado"}
+    
+    def fijo(etiqueta, *valores):
+        return {"tipo": "fijo", "etiqueta": etiqueta, "valores": list(valores)}
+    
+    return {"bloques": [
+        {"titulo": "📑 Bloque 1", "items": [
+            copiable("Título", title, "titulo"),
+            copiable("Enlace", fields.get("URL", ""), "url"),
+            copiable("Tipo de contenido", fields.get("Tipo de recurso", ""), "tipo_contenido"),
+            fijo("¿Requiere edición?", ["NO", COLOR_ACCENT_2]),
+        ]},
+        {"titulo": "📋 Bloque 2: Información Básica", "items": [
+            info("Nivel", clean_nivel(fields.get("Ciclo", ""))),
+            info("Grado", fields.get("Grado", "")),
+            info("Área", fields.get("Área", "")),
+            copiable("Descripción del recurso educativo curado", fields.get("Descripción", ""), "descripcion"),
+        ]},
+        {"titulo": "📚 Bloque 3: Información Curricular", "items": [
+            info("Competencia", fields.get("Competencia", "")),
+            info("Capacidad", fields.get("Capacidad", "")),
+            info("Desempeño", fields.get("Desempeño", "")),
+        ]},
+        {"titulo": "📖 Bloque 4: Orientación Pedagógica", "items": [
+            fijo("Requerimientos", ["TRABAJO EN GRUPOS", COLOR_ACCENT_2]),
+            {"tipo": "orientacion", "etiqueta": "Orientación de uso", "html": markdown_simple_a_html(orientacion),
+             "valor": orientacion, "id": "orientacion"},
+        ]},
+        {"titulo": "🏷️ Bloque 5: Información Técnica", "items": [
+            info("Tipo de Recurso", fields.get("Tipo de recurso", "")),
+            fijo("Tipo de actividad", ["VIDEO = Observar y Escuchar", COLOR_WARNING],
+                 ["PDF = Leer y Reflexionar", COLOR_ACCENT_1]),
+            fijo("Idioma", ["ESPAÑOL", COLOR_ACCENT_2]),
+            copiable("Etiquetas", fields.get("Etiquetas", ""), "etiquetas"),
+            copiable("Duración", duracion, "duracion"),
+        ]},
+        {"titulo": "👤 Bloque 6: Fuente", "items": [
+            copiable("Autor", fields.get("Autor", ""), "autor"),
+            copiable("Proveedor", fields.get("Proveedor", ""), "proveedor"),
+            copiable("Publicador", fields.get("Publicador", ""), "publicador"),
+            fijo("Licencia", ["Dominio Público", COLOR_ACCENT_2]),
+        ]},
+    ]}
+
+def estimar_altura(payload):
+    """Altura aproximada del iframe (px) según la cantidad de texto de cada campo"""
+    altura = 40
+    for bloque in payload["bloques"]:
+        altura += 70
+        for item in bloque["items"]:
+            altura += 50
+            if item["tipo"] == "fijo":
+                altura += 55
+            elif item["tipo"] == "orientacion":
+                altura += 120 + 30 * (item["valor"].count("\n") + len(item["valor"]) // 90)
+            else:
+                altura += 40 + 26 * (len(item["valor"]) // 90)
+                if item["tipo"] == "copiable":
+                    altura += 55
+    return altura
+
+PLANTILLA_RESULTADOS = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<style>
+body { margin: 0; font-family: "Source Sans Pro", sans-serif; color: __COLOR_TEXT__; background: transparent; }
+h3 { color: __COLOR_SECONDARY__; font-size: 24px; margin: 28px 0 8px; }
+h4 { color: __COLOR_SECONDARY__; font-size: 20px; margin: 18px 0 8px; }
+hr { border: none; border-top: 1px solid rgba(250,250,250,0.2); margin: 24px 0; }
+.valor { background: rgba(250,250,250,0.08); padding: 12px; border-radius: 8px; font-size: 16px;
+         line-height: 1.6; white-space: pre-wrap; word-break: break-word; }
+.info { background: __COLOR_INFO__; color: __COLOR_TEXT__; padding: 15px; border-radius: 8px; font-size: 17px;
+        line-height: 1.6; border-left: 5px solid __COLOR_SECONDARY__; white-space: pre-wrap; }
+.fijos { display: flex; gap: 12px; }
+.fijo { flex: 1; color: white; padding: 15px; border-radius: 8px; font-size: 17px; font-weight: bold; }
+.copiar { margin: 5px 0 10px; background: __COLOR_SECONDARY__; color: __COLOR_PRIMARY__; border: none;
+          padding: 12px 24px; border-radius: 8px; cursor: pointer; font-size: 16px; font-weight: bold;
+          box-shadow: 0 3px 6px rgba(0,0,0,0.3); transition: all 0.3s; }
+.copiar:hover { background: __COLOR_ACCENT_1__; color: __COLOR_TEXT__; }
+.estado { margin-left: 15px; color: __COLOR_SUCCESS__; font-size: 15px; font-weight: 600; visibility: hidden; }
+.aviso { background: __COLOR_INFO__; padding: 12px; border-radius: 6px; font-size: 15px; }
+.orientacion { background: #FFFFFF; color: #000000; padding: 25px; border-radius: 10px; margin: 15px 0;
+               border-left: 6px solid __COLOR_SECONDARY__; font-size: 17px; line-height: 1.8; }
+.pie { color: rgba(250,250,250,0.5); font-size: 12px; margin-top: 16px; }
+</style></head>
+<body>
+<div id="raiz"></div>
+<div class="pie" id="pie"></div>
+<script id="datos" type="application/json">__PAYLOAD__</script>
+<script>
+const inicio = performance.now();
+const datos = JSON.parse(document.getElementById("datos").textContent);
+const raiz = document.getElementById("raiz");
+const valores = {};
+
+function nodo(tag, clase, texto) {
+    const el = document.createElement(tag);
+    if (clase) el.className = clase;
+    if (texto !== undefined) el.textContent = texto;
+    return el;
+}
+
+datos.bloques.forEach((bloque, i) => {
+    if (i > 0) raiz.appendChild(nodo("hr"));
+    raiz.appendChild(nodo("h3", "", bloque.titulo));
+    bloque.items.forEach(item => {
+        raiz.appendChild(nodo("h4", "", item.etiqueta));
+        if (item.tipo === "copiable") {
+            raiz.appendChild(nodo("div", "valor", item.valor));
+            const fila = nodo("div");
+            const boton = nodo("button", "copiar", "📋 Copiar texto");
+            boton.dataset.id = item.id;
+            const estado = nodo("span", "estado", "✅ ¡Copiado!");
+            estado.id = "estado_" + item.id;
+            fila.appendChild(boton);
+            fila.appendChild(estado);
+            raiz.appendChild(fila);
+            valores[item.id] = item.valor;
+        } else if (item.tipo === "info") {
+            raiz.appendChild(nodo("div", "info", item.valor));
+        } else if (item.tipo === "fijo") {
+            const fila = nodo("div", "fijos");
+            item.valores.forEach(([texto, color]) => {
+                const caja = nodo("div", "fijo", texto);
+                caja.style.backgroundColor = color;
+                if (item.valores.length > 1) caja.style.textAlign = "center";
+                fila.appendChild(caja);
+            });
+            raiz.appendChild(fila);
+        } else if (item.tipo === "orientacion") {
+            raiz.appendChild(nodo("div", "aviso", "💡 Opción 1: Selecciona el texto de abajo y copia con Ctrl+C"));
+            const caja = nodo("div", "orientacion");
+            caja.innerHTML = item.html;
+            raiz.appendChild(caja);
+        }
+    });
+});
+
+function copiarFallback(texto) {
+    const textarea = document.createElement("textarea");
+    textarea.value = texto;
+    textarea.style.position = "fixed";
+    textarea.style.opacity = "0";
+    document.body.appendChild(textarea);
+    textarea.select();
+    textarea.setSelectionRange(0, 99999);
+    let ok = false;
+    try { ok = document.execCommand("copy"); } catch (err) { ok = false; }
+    document.body.removeChild(textarea);
+    return ok;
+}
+
+function mostrarCopiado(id) {
+    const estado = document.getElementById("estado_" + id);
+    estado.style.visibility = "visible";
+    setTimeout(() => { estado.style.visibility = "hidden"; }, 3000);
+}
+
+// Un único manejador para todos los botones de copiar
+raiz.addEventListener("click", ev => {
+    const boton = ev.target.closest("button.copiar");
+    if (!boton) return;
+    const id = boton.dataset.id;
+    const texto = valores[id];
+    const fallback = () => {
+        if (copiarFallback(texto)) mostrarCopiado(id);
+        else alert("No se pudo copiar. Intenta seleccionar manualmente.");
+    };
+    if (navigator.clipboard && window.isSecureContext) {
+        navigator.clipboard.writeText(texto).then(() => mostrarCopiado(id), fallback);
+    } else {
+        fallback();
+    }
+});
+
+requestAnimationFrame(() => requestAnimationFrame(() => {
+    const render = performance.now() - inicio;
+    document.getElementById("pie").textContent =
+        "⏱️ Pintado en " + performance.now().toFixed(0) + " ms desde la carga del componente (render " + render.toFixed(0) + " ms)";
+}));
+</script>
+</body></html>
+"""
+
+def render_resultados_html(fields, title):
+    """HTML autocontenido con todos los campos y sus botones de copiar; devuelve (html, altura_px)"""
+    payload = construir_payload(fields, title)
+    # Evita que un "</script>" dentro de los valores cierre la etiqueta de datos
+    payload_json = json.dumps(payload, ensure_ascii=False).replace("</", "<\\/")
+    html = PLANTILLA_RESULTADOS
+    for nombre, valor in (
+        ("__COLOR_PRIMARY__", COLOR_PRIMARY),
+        ("__COLOR_SECONDARY__", COLOR_SECONDARY),
+        ("__COLOR_ACCENT_1__", COLOR_ACCENT_1),
+        ("__COLOR_SUCCESS__", COLOR_SUCCESS),
+        ("__COLOR_INFO__", COLOR_INFO),
+        ("__COLOR_TEXT__", COLOR_TEXT),
+    ):
+        html = html.replace(nombre, valor)
+    return html.replace("__PAYLOAD__", payload_json), estimar_altura(payload)
@@ -0,0 +1,19 @@
+import pytest
+
+from ddc.mock_api import iniciar_servidor
+
+
+@pytest.fixture
+def mock_api():
+    """Arranca ddc.mock_api en un puerto libre; se llama con las opciones de iniciar_servidor"""
+    servidores = []
+
+    def iniciar(**opciones):
+        servidor = iniciar_servidor(**opciones)
+        servidores.append(servidor)
+        return servidor
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,30 @@
+from ddc.cache import cache_key
+
+SHA = "a" * 64
+
+
+def test_cache_key_es_determinista():
+    assert cache_key(SHA, "v5", "modelo", corte="", reduccion="r2") == \
+        cache_key(SHA, "v5", "modelo", reduccion="r2", corte="")
+
+
+def test_cache_key_cambia_con_cada_parte():
+    base = cache_key(SHA, "v5", "modelo", corte="", reduccion="r2")
+    variantes = [
+        cache_key("b" * 64, "v5", "modelo", corte="", reduccion="r2"),
+        cache_key(SHA, "v4", "modelo", corte="", reduccion="r2"),
+        cache_key(SHA, "v5", "otro", corte="", reduccion="r2"),
+        cache_key(SHA, "v5", "modelo", corte="corte", reduccion="r2"),
+        cache_key(SHA, "v5", "modelo", corte="", reduccion="r1"),
+    ]
+    assert len({base, *variantes}) == len(variantes) + 1
+
+
+def test_cache_key_distingue_opciones_vacias_por_nombre():
+    # Las opciones vacías cuentan: no se confunden con otra opción ni con su ausencia
+    assert cache_key(SHA, "v5", "modelo", corte="x", reduccion="") != cache_key(SHA, "v5", "modelo", corte="", reduccion="x")
+    assert cache_key(SHA, "v5", "modelo", corte="") != cache_key(SHA, "v5", "modelo")
+
+
+def test_cache_key_acepta_tuplas_de_modelos():
+    assert cache_key(SHA, "v5", ("rapido", "grande")) != cache_key(SHA, "v5", ("grande", "rapido"))
@@ -0,0 +1,55 @@
+import json
+import time
+
+import httpx
+
+from ddc.cliente import TransporteConReintentos
+from ddc.gobernador import Gobernador
+
+MODELO = "claude-sonnet-4-20250514"
+
+
+def _peticion(client, url):
+    cuerpo = {"model": MODELO, "max_tokens": 100, "messages": [{"role": "user", "content": "hola"}]}
+    return client.post(f"{url}/v1/messages", content=json.dumps(cuerpo), headers={"content-type": "application/json"})
+
+
+def _agotar(servidor):
+    """Deja al modelo sin saldo de solicitudes en el servidor simulado"""
+    servidor.estado.saldos[MODELO] = (0.0, time.monotonic())
+
+
+def test_429_espera_el_retry_after_y_reintenta(mock_api):
+    # 120 por minuto: con el saldo agotado, retry-after de 1 s
+    servidor = mock_api(limite_rpm=120)
+    _agotar(servidor)
+    with httpx.Client(transport=TransporteConReintentos(httpx.HTTPTransport(), 2)) as client:
+        inicio = time.monotonic()
+        response = _peticion(client, servidor.url)
+    assert response.status_code == 200
+    assert time.monotonic() - inicio >= 1.0
+    assert servidor.estado.rechazadas == 1
+    assert servidor.estado.peticiones == 1
+
+
+def test_429_pausa_el_gobernador(mock_api):
+    servidor = mock_api(limite_rpm=120)
+    _agotar(servidor)
+    gobernador = Gobernador({"solicitudes": 1000, "entrada": 1e6, "salida": 1e6})
+    with httpx.Client(transport=TransporteConReintentos(httpx.HTTPTransport(), 2, gobernador)) as client:
+        inicio = time.monotonic()
+        response = _peticion(client, servidor.url)
+    assert response.status_code == 200
+    assert time.monotonic() - inicio >= 1.0
+    assert gobernador.pausa_hasta > 0
+    # Las cabeceras de la respuesta corrigen el límite del gobernador
+    assert gobernador.cubetas[MODELO]["solicitudes"].capacidad == 120
+
+
+def test_sin_reintentos_devuelve_el_429(mock_api):
+    servidor = mock_api(limite_rpm=120)
+    _agotar(servidor)
+    with httpx.Client(transport=TransporteConReintentos(httpx.HTTPTransport(), 0)) as client:
+        response = _peticion(client, servidor.url)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,36 @@
+from ddc.cliente import get_client
+from ddc.esquema import CAMPOS
+from ddc.extractor import extract_fields_with_ai
+from ddc.mock_api import VALORES_SIMULADOS
+
+TEXTO = "Área: Matemática\nGrado: 1° de secundaria\nResolvemos problemas de proporcionalidad"
+
+
+def test_extraccion_por_herramienta_y_cache_de_prompt(mock_api):
+    servidor = mock_api()
+    client = get_client("simulada", base_url=servidor.url)
+
+    primera = {}
+    fields = extract_fields_with_ai(TEXTO, "simulada", client=client, metricas=primera)
+    assert set(fields) == set(CAMPOS)
+    assert fields["Duración"] == VALORES_SIMULADOS["Duración"]
+    assert primera["cache_creation_input_tokens"] > 0
+    assert primera["cache_read_input_tokens"] == 0
+
+    # El bloque de sistema con cache_control ya está en la caché del servidor
+    segunda = {}
+    extract_fields_with_ai(TEXTO, "simulada", client=client, metricas=segunda)
+    assert segunda["cache_creation_input_tokens"] == 0
+    assert segunda["cache_read_input_tokens"] == primera["cache_creation_input_tokens"]
+    assert servidor.estado.peticiones == 2
+
+
+def test_extraccion_en_streaming_entrega_cada_campo(mock_api):
+    servidor = mock_api()
+    client = get_client("simulada", base_url=servidor.url)
+    recibidos = {}
+
+    fields = extract_fields_with_ai(TEXTO, "simulada", client=client, campos=["Área", "URL"],
+                                    al_recibir_campo=recibidos.__setitem__)
+    assert recibidos == fields
+    assert fields["URL"] == VALORES_SIMULADOS["URL"]
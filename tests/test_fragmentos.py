@@ -0,0 +1,34 @@
+from ddc.fragmentos import combinar_respuestas
+
+
+def test_gana_el_fragmento_con_mayor_puntaje():
+    respuestas = {0: {"Área": "Comunicación"}, 1: {"Área": "Matemática"}}
+    puntajes = {0: {"Área": 1}, 1: {"Área": 3}}
+    detalle = {}
+    assert combinar_respuestas(respuestas, ["Área"], puntajes, detalle) == {"Área": "Matemática"}
+    assert detalle["conflictos"]["Área"] == {"elegido": "Matemática", "descartados": ["Comunicación"]}
+
+
+def test_a_igual_puntaje_gana_el_fragmento_anterior():
+    respuestas = {1: {"Área": "Matemática"}, 0: {"Área": "Comunicación"}}
+    puntajes = {0: {"Área": 2}, 1: {"Área": 2}}
+    assert combinar_respuestas(respuestas, ["Área"], puntajes) == {"Área": "Comunicación"}
+
+
+def test_un_valor_valido_gana_a_uno_invalido_con_mas_puntaje():
+    respuestas = {0: {"URL": "ver anexo"}, 1: {"URL": "https://ejemplo.org/recurso"}}
+    puntajes = {0: {"URL": 5}, 1: {"URL": 1}}
+    assert combinar_respuestas(respuestas, ["URL"], puntajes) == {"URL": "https://ejemplo.org/recurso"}
+
+
+def test_un_opcional_encontrado_gana_al_vacio():
+    respuestas = {0: {"Autor": ""}, 1: {"Autor": "Equipo pedagógico"}}
+    puntajes = {0: {"Autor": 4}, 1: {"Autor": 0}}
+    detalle = {}
+    assert combinar_respuestas(respuestas, ["Autor"], puntajes, detalle) == {"Autor": "Equipo pedagógico"}
+    assert "conflictos" not in detalle
+
+
+def test_campo_sin_respuesta_queda_vacio():
+    assert combinar_respuestas({0: {"Área": "Arte"}}, ["Área", "Grado"], {0: {"Área": 1, "Grado": 0}}) == \
+        {"Área": "Arte", "Grado": ""}
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from ddc.gobernador import Gobernador, contexto_api
+
+MODELO = "claude-sonnet-4-20250514"
+COSTE = {"solicitudes": 1, "entrada": 10, "salida": 100}
+
+
+def _sin_saldo(gobernador, limite=1):
+    """Deja el modelo sin solicitudes disponibles y con `limite` por minuto"""
+    gobernador.actualizar(MODELO, {"anthropic-ratelimit-requests-limit": str(limite),
+                                   "anthropic-ratelimit-requests-remaining": "0"})
+
+
+async def _encolar(gobernador, llamadas, admitidas=None):
+    """Registra las llamadas (cliente, etiqueta, prioridad) en ese orden de llegada"""
+    tareas = []
+    for cliente, etiqueta, prioridad in llamadas:
+        async def llamar(etiqueta=etiqueta):
+            await gobernador.adquirir_async(MODELO, COSTE)
+            if admitidas is not None:
+                admitidas.append(etiqueta)
+
+        with contexto_api(cliente, etiqueta, prioridad):
+            tareas.append(asyncio.create_task(llamar()))
+        await asyncio.sleep(0)
+    return tareas
+
+
+def test_cola_por_prioridad_y_cliente_menos_atendido():
+    async def escenario():
+        gobernador = Gobernador({"solicitudes": 100, "entrada": 1e6, "salida": 1e6})
+        # A ya fue atendido; B y C no
+        with contexto_api("A", "previa"):
+            await gobernador.adquirir_async(MODELO, COSTE)
+        _sin_saldo(gobernador)
+        tareas = await _encolar(gobernador, [("A", "A1", "lote"), ("A", "A2", "lote"), ("B", "B1", "lote"),
+                                             ("C", "C1", "interactiva")])
+        try:
+            cola = sorted(gobernador.en_espera(), key=lambda fila: fila["posicion"])
+            return [fila["etiqueta"] for fila in cola]
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    assert asyncio.run(escenario()) == ["C1", "B1", "A1", "A2"]
+
+
+def test_admision_alterna_entre_clientes():
+    async def escenario():
+        gobernador = Gobernador({"solicitudes": 100, "entrada": 1e6, "salida": 1e6})
+        _sin_saldo(gobernador, limite=1200)  # una solicitud cada 0,05 s
+        admitidas = []
+        tareas = await _encolar(gobernador, [("A", "A1", "lote"), ("A", "A2", "lote"), ("A", "A3", "lote"),
+                                             ("B", "B1", "lote"), ("B", "B2", "lote")], admitidas)
+        await asyncio.wait_for(asyncio.gather(*tareas), 10)
+        return admitidas
+
+    assert asyncio.run(escenario()) == ["A1", "B1", "A2", "B2", "A3"]
+
+
+def test_cancelar_una_llamada_la_saca_de_la_cola():
+    async def escenario():
+        gobernador = Gobernador()
+        _sin_saldo(gobernador)
+        (tarea,) = await _encolar(gobernador, [("A", "A1", "lote")])
+        assert len(gobernador.en_espera()) == 1
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+        return gobernador.en_espera()
+
+    assert asyncio.run(escenario()) == []
+
+
+def test_liquidar_devuelve_la_reserva_no_usada():
+    gobernador = Gobernador({"solicitudes": 100, "entrada": 1e6, "salida": 4000})
+    gobernador.adquirir(MODELO, {"solicitudes": 1, "entrada": 10, "salida": 2000})
+    salida = gobernador.cubetas[MODELO]["salida"]
+    assert salida.nivel == pytest.approx(2000, abs=5)
+
+    gobernador.liquidar(MODELO, 2000, 300)
+    assert salida.nivel == pytest.approx(3700, abs=5)
+    # Usar más de lo reservado no descuenta nada, y la cubeta no pasa de su capacidad
+    gobernador.liquidar(MODELO, 2000, 2500)
+    assert salida.nivel == pytest.approx(3700, abs=5)
+    gobernador.liquidar(MODELO, 2000, 0)
+    assert salida.nivel == 4000
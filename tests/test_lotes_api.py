@@ -0,0 +1,37 @@
+import json
+import os
+
+from benchmarks.corpus import generar_pdf
+from ddc.cache import sha256_archivo
+from ddc.lotes_api import main
+
+
+def test_enviar_y_recoger_por_hash_de_contenido(mock_api, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    servidor = mock_api()
+    pdfs = tmp_path / "pdfs"
+    (pdfs / "sub").mkdir(parents=True)
+    datos = generar_pdf(2)
+    (pdfs / "a.pdf").write_bytes(datos)
+    (pdfs / "sub" / "copia.pdf").write_bytes(datos)
+    (pdfs / "otro.pdf").write_bytes(generar_pdf(3))
+    opciones = ["--api-key", "simulada", "--base-url", servidor.url, "--cache-dir", "cache", "--almacen", "almacen.db"]
+
+    assert main(opciones + ["enviar", str(pdfs), "--estado", "lotes.json", "--procesos", "1"]) == 0
+    estado = json.loads((tmp_path / "lotes.json").read_text(encoding="utf-8"))
+    sha = sha256_archivo(pdfs / "a.pdf")
+    assert sorted(estado["documentos"][sha]["archivos"]) == ["a.pdf", os.path.join("sub", "copia.pdf")]
+    # Los archivos idénticos comparten petición, con el hash como custom_id
+    (lote,) = servidor.estado.lotes.values()
+    assert sorted(peticion["custom_id"] for peticion in lote["peticiones"]) == sorted(estado["documentos"])
+
+    assert main(opciones + ["recoger", "--estado", "lotes.json", "--salida", "salida.jsonl"]) == 0
+    filas = [json.loads(linea) for linea in (tmp_path / "salida.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert sorted(fila["archivo"] for fila in filas) == sorted(["a.pdf", "otro.pdf", os.path.join("sub", "copia.pdf")])
+    copias = [fila for fila in filas if fila["sha256"] == sha]
+    assert len(copias) == 2
+    assert copias[0]["Descripción"] == copias[1]["Descripción"]
+
+    # Un segundo envío no vuelve a pedir nada
+    assert main(opciones + ["enviar", str(pdfs), "--estado", "lotes.json", "--procesos", "1"]) == 0
+    assert len(servidor.estado.lotes) == 1
@@ -0,0 +1,55 @@
+import json
+import random
+
+import pytest
+
+from ddc.stream_json import ParserJSONIncremental
+
+OBJETO = {
+    "Título": "Fracciones {equivalentes}, parte 1",
+    "Descripción": 'Cita: "a, b}" y una barra \\ al final\\',
+    "Orientación de uso": "**Inicio**\n\n- Paso 1: {x, y}\n- Paso 2:\t[fin]",
+    "clave \"rara\"": "áéí \U0001F4DA  ",
+    "Etiquetas": ["uno, dos", "}", {"anidado": [1, 2.5, {"más": "}]"}]}],
+    "Metadatos": {"a": {"b": "c,}"}, "vacío": {}, "lista": []},
+    "Número": -12.5e3,
+    "Entero": 7,
+    "Sí": True,
+    "No": False,
+    "Nada": None,
+    "Vacío": "",
+}
+
+
+def _trozos(texto, rng):
+    i = 0
+    while i < len(texto):
+        tamano = rng.randint(1, 12)
+        yield texto[i:i + tamano]
+        i += tamano
+
+
+@pytest.mark.parametrize("semilla", range(200))
+def test_trozos_aleatorios(semilla):
+    rng = random.Random(semilla)
+    texto = json.dumps(OBJETO, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2, 4]))
+    if rng.random() < 0.5:
+        texto = "```json\n" + texto + "\n```"
+    parser = ParserJSONIncremental()
+    completados = []
+    for trozo in _trozos(texto, rng):
+        completados += parser.feed(trozo)
+    assert completados == list(OBJETO.items())
+    assert parser.terminado
+
+
+def test_entrega_cada_miembro_al_cerrarse():
+    parser = ParserJSONIncremental()
+    assert parser.feed('{"Área": "Matemática", "Grado": "1°') == [("Área", "Matemática")]
+    assert parser.feed('"') == [("Grado", "1°")]
+    assert parser.feed(', "Lista": ["a", {"b": 1}') == []
+    assert parser.feed("]") == [("Lista", ["a", {"b": 1}])]
+    # Un escalar se cierra con el separador que lo sigue
+    assert parser.feed(', "n": 42') == []
+    assert parser.feed("}") == [("n", 42)]
+    assert parser.terminado
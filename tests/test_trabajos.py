@@ -0,0 +1,38 @@
+from ddc.trabajos import ColaTrabajos
+
+
+def test_misma_clave_activa_devuelve_el_mismo_trabajo(tmp_path):
+    cola = ColaTrabajos(str(tmp_path / "cola.db"))
+    try:
+        trabajo_id, nuevo = cola.enviar("clave", "texto", {"titulo": "a"})
+        assert nuevo
+        assert cola.enviar("clave", "texto", {"titulo": "b"}) == (trabajo_id, False)
+        otro_id, nuevo = cola.enviar("otra", "texto", {})
+        assert nuevo and otro_id != trabajo_id
+
+        # En curso sigue contando como activo
+        assert cola.tomar()["id"] == trabajo_id
+        assert cola.enviar("clave", "texto", {}) == (trabajo_id, False)
+
+        # Terminado, la misma clave vuelve a encolarse
+        cola.terminar(trabajo_id, {"campos": {}})
+        repetido_id, nuevo = cola.enviar("clave", "texto", {})
+        assert nuevo and repetido_id != trabajo_id
+        assert cola.obtener(trabajo_id)["estado"] == "terminado"
+    finally:
+        cola.close()
+
+
+def test_dedup_entre_conexiones(tmp_path):
+    # Dos procesos (aquí, dos conexiones) comparten el índice único de trabajos activos
+    ruta = str(tmp_path / "cola.db")
+    primera, segunda = ColaTrabajos(ruta), ColaTrabajos(ruta)
+    try:
+        trabajo_id, _ = primera.enviar("clave", "texto", {})
+        assert segunda.enviar("clave", "texto", {}) == (trabajo_id, False)
+        primera.fallar(trabajo_id, {"tipo": "Error", "mensaje": "x", "respuesta": None})
+        assert segunda.enviar("clave", "texto", {})[1]
+        assert segunda.contar() == {"error": 1, "pendiente": 1}
+    finally:
+        primera.close()
+        segunda.close()